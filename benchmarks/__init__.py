@@ -0,0 +1,16 @@
+"""
+Benchmarks of the GROBID client, run offline against a local stand-in for GROBID.
+
+- mock_server: a mock GROBID server with configurable latency, busy (503) and timeout rates
+  and response sizes
+- throughput: end-to-end throughput of GrobidClient.process over a synthetic corpus
+  (docs/s, CPU, peak RSS), `python -m benchmarks.throughput --help`
+- converters: time per MB and peak memory of the TEI converters and of the JSON reference
+  validator, compared with stored baselines, `python -m benchmarks.converters --check`
+- soak: memory soak tests of the client and of the converters, failing when the memory grows
+  with the number of documents, `python -m benchmarks.soak --help`
+- tei_generator: synthetic GROBID TEI documents at any scale
+- measure: RSS and CPU sampling of the benchmark process
+
+The benchmarks are run from the root of the repository and are not part of the package.
+"""
@@ -0,0 +1,223 @@
+"""
+Micro-benchmarks of the format converters and of the JSON reference validator.
+
+Each preset of benchmarks.tei_generator.PRESETS is generated in memory and converted with
+TEI2LossyJSONConverter (lossy_json) and TEI2MarkdownConverter (markdown); the JSON document is
+then checked by JSONReferenceValidator (validator). For each preset and benchmark the best
+time of --repeat runs is reported per MB of input (the TEI, or the JSON for the validator), and
+the peak memory allocated while converting one document is measured with tracemalloc, in a
+separate run since tracing slows the conversion down.
+
+Times depend on the machine: every run also times a fixed calibration workload, and the stored
+times are scaled by the ratio of the calibration times before being compared. Memory is compared
+as is. Regressions beyond the tolerances make --check exit with status 1:
+
+    python -m benchmarks.converters --check
+    python -m benchmarks.converters --preset dense_refs --benchmark lossy_json --update-baseline
+"""
+import argparse
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from benchmarks.tei_generator import PRESETS, generate_preset
+
+BENCHMARKS = ("lossy_json", "markdown", "validator")
+BASELINE = Path(__file__).resolve().parent / "baselines" / "converters.json"
+MB = 1e6
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Return the best time of a fixed pure Python workload, the unit of the stored times."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index = {}
+        for i in range(200000):
+            key = f"b{i % 5000}"
+            index[key] = index.get(key, 0) + len(key)
+        json.loads(json.dumps([{"text": str(i), "refs": [i, i + 1]} for i in range(20000)]))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(run: Callable[[], object], repeat: int = 3, memory: bool = True) -> Tuple[float, Optional[int]]:
+    """Return the best wall time of `repeat` calls of run() and the peak memory it allocates, in bytes."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def run_converter_benchmarks(
+        presets: Optional[Iterable[str]] = None,
+        benchmarks: Iterable[str] = BENCHMARKS,
+        repeat: int = 3,
+        memory: bool = True,
+        seed: int = 0
+) -> Dict:
+    """Run the benchmarks on the generated presets and return {"calibration_seconds", "results"}.
+
+    results maps "preset/benchmark" to input_mb, seconds, seconds_per_mb and peak_memory_mb
+    (None without memory measurement).
+    """
+    from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+    from grobid_client.format.TEI2Markdown import TEI2MarkdownConverter
+    from grobid_client.format.validate_json_refs import JSONReferenceValidator
+
+    benchmarks = list(benchmarks)
+    results = {}
+    temp_dir = tempfile.mkdtemp(prefix="grobid-converter-benchmark-")
+    try:
+        for preset in presets or PRESETS:
+            tei = generate_preset(preset, seed).encode("utf-8")
+            runs = {
+                "lossy_json": (len(tei), lambda: TEI2LossyJSONConverter().convert_tei_file(io.BytesIO(tei))),
+                "markdown": (len(tei), lambda: TEI2MarkdownConverter().convert_tei_file(io.BytesIO(tei))),
+            }
+            if "validator" in benchmarks:
+                json_path = os.path.join(temp_dir, f"{preset}.json")
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(TEI2LossyJSONConverter().convert_tei_file(io.BytesIO(tei)), f)
+                runs["validator"] = (os.path.getsize(json_path),
+                                     lambda: JSONReferenceValidator().validate_directory(json_path))
+            for benchmark in benchmarks:
+                size, run = runs[benchmark]
+                seconds, peak = measure(run, repeat, memory)
+                results[f"{preset}/{benchmark}"] = {
+                    "input_mb": round(size / MB, 3),
+                    "seconds": round(seconds, 4),
+                    "seconds_per_mb": round(seconds / (size / MB), 4),
+                    "peak_memory_mb": round(peak / MB, 2) if peak is not None else None,
+                }
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {"calibration_seconds": round(calibrate(), 4), "results": results}
+
+
+def load_baseline(path: os.PathLike = BASELINE) -> Dict:
+    """Return the stored baselines, {"preset/benchmark": {seconds_per_mb, peak_memory_mb, calibration_seconds}}."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["baselines"]
+    except FileNotFoundError:
+        return {}
+
+
+def update_baseline(run: Dict, path: os.PathLike = BASELINE) -> None:
+    """Store the results of a run as the baselines of its presets and benchmarks, keeping the others."""
+    baselines = load_baseline(path)
+    for key, result in run["results"].items():
+        baselines[key] = {"seconds_per_mb": result["seconds_per_mb"],
+                          "peak_memory_mb": result["peak_memory_mb"] or baselines.get(key, {}).get("peak_memory_mb"),
+                          "calibration_seconds": run["calibration_seconds"]}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"python": platform.python_version(), "baselines": dict(sorted(baselines.items()))}, f, indent=2)
+        f.write("\n")
+
+
+def check_regressions(
+        run: Dict,
+        baselines: Dict,
+        time_tolerance: float = 1.5,
+        memory_tolerance: float = 1.2
+) -> List[str]:
+    """Return a message for each result slower or larger than its baseline beyond the tolerances.
+
+    Baseline times are scaled by the ratio of the calibration times of the run and of the baseline.
+    Results without a baseline are not checked.
+    """
+    regressions = []
+    for key, result in run["results"].items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        expected = baseline["seconds_per_mb"] * run["calibration_seconds"] / baseline["calibration_seconds"]
+        if result["seconds_per_mb"] > expected * time_tolerance:
+            regressions.append(f"{key}: {result['seconds_per_mb']:.3f} s/MB, expected at most "
+                               f"{expected * time_tolerance:.3f} (baseline {expected:.3f} on this machine)")
+        peak, expected_peak = result["peak_memory_mb"], baseline.get("peak_memory_mb")
+        if peak is not None and expected_peak and peak > expected_peak * memory_tolerance:
+            regressions.append(f"{key}: peak memory {peak:.1f} MB, expected at most "
+                               f"{expected_peak * memory_tolerance:.1f} (baseline {expected_peak:.1f})")
+    return regressions
+
+
+def format_results(run: Dict, baselines: Dict) -> str:
+    """Return the results of a run as a table, with the times relative to the baselines."""
+    lines = [f"{'benchmark':<26} {'MB':>8} {'s/MB':>9} {'vs base':>8} {'peak MB':>9} {'vs base':>8}"]
+    for key, result in run["results"].items():
+        baseline = baselines.get(key) or {}
+        relative_time = relative_memory = ""
+        if baseline:
+            expected = baseline["seconds_per_mb"] * run["calibration_seconds"] / baseline["calibration_seconds"]
+            relative_time = f"{result['seconds_per_mb'] / expected:.2f}x"
+            if result["peak_memory_mb"] is not None and baseline.get("peak_memory_mb"):
+                relative_memory = f"{result['peak_memory_mb'] / baseline['peak_memory_mb']:.2f}x"
+        peak = result["peak_memory_mb"]
+        lines.append(f"{key:<26} {result['input_mb']:>8.3f} {result['seconds_per_mb']:>9.3f} {relative_time:>8} "
+                     f"{'' if peak is None else f'{peak:.1f}':>9} {relative_memory:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TEI converters and the JSON reference validator on "
+                                                 "synthetic documents")
+    parser.add_argument("--preset", action="append", choices=sorted(PRESETS),
+                        help="Generated document to benchmark, repeatable (default: all)")
+    parser.add_argument("--benchmark", action="append", choices=BENCHMARKS,
+                        help="Converter or validator to benchmark, repeatable (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark, the best is kept (default: 3)")
+    parser.add_argument("--no-memory", action="store_true", help="Do not measure the peak memory")
+    parser.add_argument("--baseline", default=str(BASELINE), help=f"Baseline file (default: {BASELINE})")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baselines")
+    parser.add_argument("--time-tolerance", type=float, default=1.5,
+                        help="Allowed ratio of the time to the baseline time (default: 1.5)")
+    parser.add_argument("--memory-tolerance", type=float, default=1.2,
+                        help="Allowed ratio of the peak memory to the baseline (default: 1.2)")
+    parser.add_argument("--results", default=None, help="JSON Lines file to which the results are appended")
+    args = parser.parse_args(argv)
+
+    run = run_converter_benchmarks(args.preset, args.benchmark or BENCHMARKS, args.repeat, not args.no_memory)
+    baselines = load_baseline(args.baseline)
+    print(format_results(run, baselines))
+    if args.results:
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict({"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                                     "python": platform.python_version()}, **run)) + "\n")
+    if args.update_baseline:
+        update_baseline(run, args.baseline)
+        print(f"Baselines updated in {args.baseline}")
+        return 0
+    regressions = check_regressions(run, baselines, args.time_tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Resource measurements of the benchmark process: resident memory and CPU time.
+
+RSS is read from /proc/self/statm on Linux, the peak RSS from getrusage (not available on
+Windows, where the values are None). ResourceMonitor samples the RSS from a background thread
+during a run, so that the peak of a run is known even when the process ran something else before.
+"""
+import os
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+def rss_bytes() -> Optional[int]:
+    """Return the current resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Return the peak resident set size of this process since it started, in bytes."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def cpu_seconds() -> float:
+    """Return the user + system CPU time of this process, in seconds."""
+    times = os.times()
+    return times.user + times.system
+
+
+class ResourceMonitor:
+    """Sample the RSS of this process every `interval` seconds and measure the CPU and wall time of a run."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_wall = 0.0
+        self._start_cpu = 0.0
+
+    def start(self) -> "ResourceMonitor":
+        self._start_wall = time.perf_counter()
+        self._start_cpu = cpu_seconds()
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="benchmark-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self) -> None:
+        rss = rss_bytes()
+        if rss is not None:
+            self.samples.append((time.perf_counter() - self._start_wall, rss))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def stop(self) -> "ResourceMonitor":
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        self.wall_seconds = time.perf_counter() - self._start_wall
+        self.cpu_seconds = cpu_seconds() - self._start_cpu
+        return self
+
+    @property
+    def peak_rss(self) -> Optional[int]:
+        return max((rss for _, rss in self.samples), default=None)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,305 @@
+"""
+A local stand-in for a GROBID server.
+
+MockGrobidServer answers the GROBID REST API the client uses, without doing any work:
+
+- GET /api/isalive and /api/version
+- POST /api/processFulltextDocument, processHeaderDocument, processReferences and the patent
+  services: a synthetic TEI document of `response_size` bytes
+- POST /api/processCitationList: a listBibl with one biblStruct per citation sent
+
+The request body is read entirely, as GROBID does, then the server waits for a `latency`
+drawn from a distribution, returns 503 (server busy, immediately) with probability `busy_rate`,
+and simulates a timeout with probability `timeout_rate` by answering only after `timeout_delay`
+seconds. Responses are gzip-compressed when the client accepts it, like GROBID behind its
+default Jetty configuration.
+
+Distributions are given as strings: "0.05" or "fixed:0.05", "uniform:0.01,0.2", "exp:0.1" (mean),
+"normal:0.1,0.02" and "lognormal:0.1,0.5" (median, sigma), clamped at 0. Sizes use the same syntax.
+
+The server runs in a background thread (MockGrobidServer) or as a separate process:
+
+    python -m benchmarks.mock_server --port 8070 --latency lognormal:0.5,0.4 --busy-rate 0.02
+"""
+import argparse
+import collections
+import gzip
+import http.server
+import math
+import random
+import sys
+import threading
+import urllib.parse
+from typing import Callable, Dict, Optional, Union
+
+DOCUMENT_SERVICES = (
+    "processFulltextDocument",
+    "processHeaderDocument",
+    "processReferences",
+    "processCitationPatentST36",
+    "processCitationPatentPDF",
+)
+
+TEI_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<TEI xml:space="preserve" xmlns="http://www.tei-c.org/ns/1.0">
+<teiHeader xml:lang="en"><fileDesc><titleStmt><title level="a" type="main">Synthetic document</title></titleStmt>
+<publicationStmt><publisher/><availability status="unknown"><licence/></availability></publicationStmt>
+<sourceDesc><biblStruct><analytic><author><persName><forename type="first">Ada</forename><surname>Lovelace</surname>
+</persName></author><title level="a" type="main">Synthetic document</title></analytic><monogr><imprint/></monogr>
+</biblStruct></sourceDesc></fileDesc><profileDesc><abstract><div><p>A synthetic abstract.</p></div></abstract>
+</profileDesc></teiHeader>
+<text xml:lang="en"><body><div><head n="1">Introduction</head>
+"""
+TEI_FOOTER = "</div></body><back/></text>\n</TEI>\n"
+PARAGRAPH = ("<p>Synthetic paragraph of a benchmark document, with enough words to look like the text of a "
+             "scientific article and to give the converters some work to do.</p>\n")
+
+
+def parse_distribution(spec: Union[str, float]) -> Callable[[random.Random], float]:
+    """Parse a distribution spec ('0.1', 'fixed:0.1', 'uniform:a,b', 'exp:mean', 'normal:mean,sd',
+    'lognormal:median,sigma') into a function drawing a non-negative value from a random generator."""
+    spec = str(spec)
+    kind, _, values = spec.partition(":")
+    if not values:
+        kind, values = "fixed", kind
+    try:
+        params = [float(value) for value in values.split(",")]
+    except ValueError:
+        raise ValueError(f"Invalid distribution {spec}")
+    expected = {"fixed": 1, "uniform": 2, "exp": 1, "normal": 2, "lognormal": 2}
+    if expected.get(kind) != len(params):
+        raise ValueError(f"Invalid distribution {spec}, expected one of fixed:v, uniform:a,b, exp:mean, "
+                         f"normal:mean,sd or lognormal:median,sigma")
+    if kind == "fixed":
+        return lambda rng: max(0.0, params[0])
+    if kind == "uniform":
+        return lambda rng: max(0.0, rng.uniform(*params))
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / params[0]) if params[0] > 0 else 0.0
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(*params))
+    return lambda rng: rng.lognormvariate(math.log(params[0]), params[1]) if params[0] > 0 else 0.0
+
+
+def synthetic_tei(size: int) -> bytes:
+    """Return a well-formed TEI document of about `size` bytes."""
+    header, footer, paragraph = TEI_HEADER.encode(), TEI_FOOTER.encode(), PARAGRAPH.encode()
+    count = max(1, (size - len(header) - len(footer)) // len(paragraph))
+    return header + paragraph * count + footer
+
+
+def citation_list_tei(count: int) -> bytes:
+    """Return the TEI answer of processCitationList for `count` citations."""
+    entries = "".join(
+        f'<biblStruct xml:id="b{i}"><analytic><title level="a" type="main">Cited work {i}</title>'
+        f'<author><persName><surname>Author{i}</surname></persName></author></analytic>'
+        f'<monogr><title level="j">Journal</title><imprint><date type="published" when="2020"/></imprint>'
+        f'</monogr></biblStruct>\n'
+        for i in range(count))
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<TEI xmlns="http://www.tei-c.org/ns/1.0"><text><back>'
+            f'<div type="references"><listBibl>\n{entries}</listBibl></div></back></text></TEI>\n').encode()
+
+
+class MockGrobidServer:
+    """A mock GROBID server answering from a background thread (port 0 picks a free port)."""
+
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            latency: Union[str, float] = 0,
+            busy_rate: float = 0.0,
+            timeout_rate: float = 0.0,
+            timeout_delay: float = 30.0,
+            response_size: Union[str, float] = 20000,
+            seed: Optional[int] = None,
+            compress: bool = True
+    ):
+        self.latency = parse_distribution(latency)
+        self.response_size = parse_distribution(response_size)
+        self.busy_rate = busy_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.compress = compress
+        self.requests: Dict[tuple, int] = collections.Counter()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._responses: Dict[tuple, bytes] = {}
+        self._closing = threading.Event()
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "MockGrobidServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-grobid", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def close(self) -> None:
+        # answers delayed to simulate timeouts are abandoned
+        self._closing.set()
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def count(self, service: Optional[str] = None, status: Optional[int] = None) -> int:
+        """Return the number of requests answered, for a service and/or a status."""
+        with self._lock:
+            return sum(n for (s, code), n in self.requests.items()
+                       if (service is None or s == service) and (status is None or code == status))
+
+    def _draw(self):
+        """Draw the outcome of a request: (status, delay, response size)."""
+        with self._lock:
+            if self._random.random() < self.busy_rate:
+                return 503, 0.0, 0
+            if self._random.random() < self.timeout_rate:
+                return 200, self.timeout_delay, int(self.response_size(self._random))
+            return 200, self.latency(self._random), int(self.response_size(self._random))
+
+    def _response(self, kind: str, amount: int, gzipped: bool) -> bytes:
+        # sizes are rounded to the kilobyte so that the cache stays small
+        key = (kind, amount if kind == "citations" else max(1, round(amount / 1024)), gzipped)
+        body = self._responses.get(key)
+        if body is None:
+            body = citation_list_tei(amount) if kind == "citations" else synthetic_tei(key[1] * 1024)
+            if gzipped:
+                body = gzip.compress(body, compresslevel=6)
+            with self._lock:
+                self._responses[key] = body
+        return body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: bytes, content_type: str = "text/plain", gzipped: bool = False):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if gzipped:
+                    self.send_header("Content-Encoding", "gzip")
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_sent += len(body)
+
+            def _read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    chunks = []
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0], 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return b"".join(chunks)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_GET(self):
+                if self.path.startswith("/api/isalive"):
+                    self._send(200, b"true")
+                elif self.path.startswith("/api/version"):
+                    self._send(200, b"0.8.2-mock")
+                else:
+                    self._send(404, b"Not found")
+
+            def do_POST(self):
+                body = self._read_body()
+                service = urllib.parse.urlparse(self.path).path.rsplit("/", 1)[-1]
+                with server._lock:
+                    server.bytes_received += len(body)
+                if service != "processCitationList" and service not in DOCUMENT_SERVICES:
+                    self._send(404, b"Not found")
+                    return
+
+                status, delay, size = server._draw()
+                if delay and server._closing.wait(delay):
+                    return
+                with server._lock:
+                    server.requests[(service, status)] += 1
+                if status == 503:
+                    self._send(503, b"Service Unavailable")
+                    return
+                gzipped = server.compress and "gzip" in self.headers.get("Accept-Encoding", "")
+                if service == "processCitationList":
+                    count = len(urllib.parse.parse_qs(body.decode("utf-8", "replace")).get("citations", []))
+                    self._send(200, server._response("citations", count, gzipped), "application/xml", gzipped)
+                else:
+                    self._send(200, server._response("tei", size, gzipped), "application/xml", gzipped)
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle_one_request(self):
+                try:
+                    super().handle_one_request()
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up (timeout) before the answer
+                    self.close_connection = True
+
+        return Handler
+
+
+def add_server_arguments(parser) -> None:
+    """Add the options of the mock server to a parser."""
+    parser.add_argument("--latency", default="0.05",
+                        help="Processing time distribution in seconds (default: 0.05), e.g. uniform:0.1,0.5, "
+                             "exp:0.2 or lognormal:0.5,0.4")
+    parser.add_argument("--busy-rate", type=float, default=0.0,
+                        help="Probability of a 503 (server busy) answer (default: 0)")
+    parser.add_argument("--timeout-rate", type=float, default=0.0,
+                        help="Probability of a request answered only after --timeout-delay (default: 0)")
+    parser.add_argument("--timeout-delay", type=float, default=30.0,
+                        help="Delay of the requests simulating a timeout, in seconds (default: 30)")
+    parser.add_argument("--response-size", default="20000",
+                        help="Size distribution of the TEI responses in bytes (default: 20000)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random outcomes")
+    parser.add_argument("--no-compress", action="store_true", help="Never gzip the responses")
+
+
+def server_from_args(args, host: str = "127.0.0.1", port: int = 0) -> MockGrobidServer:
+    return MockGrobidServer(host, port, latency=args.latency, busy_rate=args.busy_rate,
+                            timeout_rate=args.timeout_rate, timeout_delay=args.timeout_delay,
+                            response_size=args.response_size, seed=args.seed, compress=not args.no_compress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a mock GROBID server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8070, help="Port to listen on, 0 for a free port (default: 8070)")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = server_from_args(args, args.host, args.port)
+    # the first line of the output gives the URL to the parent process of a benchmark
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"requests: {dict(server.requests)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
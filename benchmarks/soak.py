@@ -0,0 +1,281 @@
+"""
+Memory soak tests: push many synthetic documents through the client or the converters and
+check that the memory of the process does not grow with the number of documents.
+
+A soak repeats a step (a GrobidClient.process run over a synthetic corpus against a mock GROBID
+server, or the conversion of a chunk of generated TEI documents) until --documents documents are
+processed or --duration seconds elapsed. After each step the RSS, and with --tracemalloc the
+memory traced by tracemalloc, is sampled against the number of documents processed so far. Once
+the warm-up (--warmup, a fraction of the documents) is over, the slope of a least squares fit of
+the samples must stay under --max-slope (KB per 1000 documents), otherwise the soak fails; the
+growth predicted by the fit over the documents after the warm-up must also exceed --noise (MB),
+as the RSS moves by allocator arenas and short soaks would fail on noise. With
+--tracemalloc, the source lines whose allocations grew the most since the end of the warm-up are
+reported, which usually points at the leak:
+
+    python -m benchmarks.soak client --documents 500000 --corpus-size 2000 --json --samples samples.jsonl
+    python -m benchmarks.soak converters --documents 200000 --tracemalloc --max-slope 50
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.measure import rss_bytes
+from benchmarks.mock_server import add_server_arguments, server_from_args
+from benchmarks.tei_generator import generate_tei
+from benchmarks.throughput import MockServerProcess, _server_options, make_corpus
+
+# (elapsed seconds, documents, rss bytes, traced bytes or None)
+Sample = Tuple[float, int, Optional[int], Optional[int]]
+
+
+def memory_slope(points: Sequence[Tuple[int, int]]) -> Optional[float]:
+    """Return the least squares slope of (documents, bytes) points in bytes per document, None under 2 points."""
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def _top_growth(start: tracemalloc.Snapshot, end: tracemalloc.Snapshot, limit: int = 10) -> List[str]:
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+               tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    start, end = start.filter_traces(filters), end.filter_traces(filters)
+    return [f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}: {stat.size_diff / 1024:+.1f} KB "
+            f"({stat.count_diff:+d} blocks)"
+            for stat in end.compare_to(start, "lineno")[:limit] if stat.size_diff > 0]
+
+
+def run_soak(
+        step: Callable[[], int],
+        documents: int,
+        duration: Optional[float] = None,
+        warmup: float = 0.2,
+        max_slope_kb: float = 100,
+        noise_mb: float = 10,
+        trace: bool = False,
+        on_sample: Optional[Callable[[Sample], None]] = None
+) -> Dict:
+    """Call step() until `documents` documents are processed (or `duration` seconds) and check the memory slope.
+
+    step() processes some documents and returns how many. max_slope_kb is the allowed growth after the warm-up,
+    in KB per 1000 documents, of the RSS and, with trace, of the memory traced by tracemalloc; a growth under
+    noise_mb over the documents after the warm-up is not a failure.
+    Returns the measurements of the soak, with 'passed' and the 'failures'.
+    """
+    if trace:
+        tracemalloc.start()
+    samples: List[Sample] = []
+    warmup_snapshot = None
+    processed = 0
+    start = time.perf_counter()
+
+    def sample():
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0] if trace else None
+        samples.append((round(time.perf_counter() - start, 3), processed, rss_bytes(), traced))
+        if on_sample is not None:
+            on_sample(samples[-1])
+
+    try:
+        sample()
+        while processed < documents and (duration is None or time.perf_counter() - start < duration):
+            processed += step()
+            if trace and warmup_snapshot is None and processed >= warmup * documents:
+                gc.collect()
+                warmup_snapshot = tracemalloc.take_snapshot()
+            sample()
+        top_growth = []
+        if trace and warmup_snapshot is not None:
+            top_growth = _top_growth(warmup_snapshot, tracemalloc.take_snapshot())
+    finally:
+        if trace:
+            tracemalloc.stop()
+
+    steady = [s for s in samples if s[1] >= warmup * processed]
+    result = {
+        "documents": processed,
+        "seconds": round(time.perf_counter() - start, 3),
+        "samples": len(samples),
+        "max_slope_kb_per_1000": max_slope_kb,
+        "noise_mb": noise_mb,
+        "top_growth": top_growth,
+        "failures": [],
+    }
+    for name, column in (("rss", 2), ("traced", 3)):
+        points = [(s[1], s[column]) for s in steady if s[column] is not None]
+        slope = memory_slope(points)
+        result[f"{name}_start_mb"] = round(points[0][1] / 1e6, 2) if points else None
+        result[f"{name}_end_mb"] = round(points[-1][1] / 1e6, 2) if points else None
+        result[f"{name}_slope_kb_per_1000"] = round(slope * 1000 / 1024, 2) if slope is not None else None
+        if slope is None:
+            continue
+        growth = slope * (points[-1][0] - points[0][0])
+        if slope * 1000 / 1024 > max_slope_kb and growth > noise_mb * 1e6:
+            result["failures"].append(f"{name} memory grows by {slope * 1000 / 1024:.1f} KB per 1000 documents "
+                                      f"(limit {max_slope_kb}), {growth / 1e6:.1f} MB after the warm-up")
+    result["passed"] = not result["failures"]
+    return result
+
+
+def client_step(
+        server_url: str,
+        corpus: str,
+        output: str,
+        concurrency: int = 10,
+        log_level: int = logging.ERROR,
+        **process_options
+) -> Callable[[], int]:
+    """Return a soak step processing the corpus with the same GrobidClient, as a long-running service would."""
+    from grobid_client.grobid_client import GrobidClient
+
+    client = GrobidClient(grobid_server=server_url, timeout=10, sleep_time=0.1)
+    client.logger.setLevel(log_level)
+    process_options.setdefault("output_layout", "mirror")
+    documents = client.metrics.documents
+
+    def step() -> int:
+        before = documents.value(outcome="processed") + documents.value(outcome="failed")
+        # the summary printed by each run would drown the samples
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.process("processFulltextDocument", corpus, output=output, n=concurrency, force=True,
+                           **process_options)
+        return documents.value(outcome="processed") + documents.value(outcome="failed") - before
+
+    return step
+
+
+def converters_step(
+        chunk: int = 100,
+        variants: int = 20,
+        paragraphs: int = 20,
+        references: int = 30,
+        malformed_every: int = 50,
+        markdown: bool = True,
+        seed: int = 0
+) -> Callable[[], int]:
+    """Return a soak step converting `chunk` generated TEI documents to JSON (and Markdown).
+
+    `variants` documents of various sizes are generated once and reused; one in `malformed_every` is truncated,
+    so that the error paths of the converters are soaked too.
+    """
+    from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+    from grobid_client.format.TEI2Markdown import TEI2MarkdownConverter
+
+    logging.getLogger("grobid_client.format").setLevel(logging.CRITICAL)
+    documents = []
+    for i in range(variants):
+        tei = generate_tei(paragraphs=paragraphs * (1 + i % 4), references=references * (1 + i % 3),
+                           sentences=bool(i % 2), seed=seed + i).encode("utf-8")
+        documents.append(tei)
+    json_converter = TEI2LossyJSONConverter()
+    markdown_converter = TEI2MarkdownConverter()
+    counter = [0]
+
+    def step() -> int:
+        for _ in range(chunk):
+            index = counter[0]
+            counter[0] += 1
+            tei = documents[index % variants]
+            if malformed_every and index % malformed_every == malformed_every - 1:
+                tei = tei[:len(tei) // 2]
+            json_converter.convert_tei_file(io.BytesIO(tei))
+            if markdown:
+                markdown_converter.convert_tei_file(io.BytesIO(tei))
+        return chunk
+
+    return step
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory soak test of the GROBID client or of the TEI converters")
+    parser.add_argument("target", choices=["client", "converters"], help="What to soak")
+    parser.add_argument("--documents", type=int, default=200000, help="Documents to process (default: 200000)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--warmup", type=float, default=0.2,
+                        help="Fraction of the documents excluded from the slope (default: 0.2)")
+    parser.add_argument("--max-slope", type=float, default=100,
+                        help="Allowed memory growth after the warm-up, in KB per 1000 documents (default: 100)")
+    parser.add_argument("--noise", type=float, default=10,
+                        help="Growth after the warm-up, in MB, under which the slope is ignored (default: 10)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also check the memory traced by tracemalloc and report the lines that grew the most "
+                             "(slower)")
+    parser.add_argument("--samples", default=None, help="JSON Lines file to which the memory samples are written")
+    parser.add_argument("--results", default=None, help="JSON Lines file to which the results are appended")
+    client_options = parser.add_argument_group("client soak")
+    client_options.add_argument("--corpus-size", type=int, default=1000,
+                                help="Synthetic inputs processed by each run of the client (default: 1000)")
+    client_options.add_argument("--document-size", type=int, default=20000,
+                                help="Size of the synthetic inputs in bytes (default: 20000)")
+    client_options.add_argument("--concurrency", "-n", type=int, default=10, help="Concurrent requests (default: 10)")
+    client_options.add_argument("--json", action="store_true", help="Convert the results to JSON")
+    client_options.add_argument("--markdown", action="store_true", help="Convert the results to Markdown")
+    client_options.add_argument("--in-process-server", action="store_true",
+                                help="Run the mock server in a thread of the soak process")
+    add_server_arguments(parser)
+    converter_options = parser.add_argument_group("converters soak")
+    converter_options.add_argument("--paragraphs", type=int, default=20,
+                                   help="Paragraphs of the smallest generated document (default: 20)")
+    converter_options.add_argument("--no-markdown", action="store_true", help="Only convert to JSON")
+    args = parser.parse_args(argv)
+
+    samples_file = open(args.samples, "w", encoding="utf-8") if args.samples else None
+
+    def on_sample(sample: Sample):
+        print(f"{sample[0]:>10.1f}s {sample[1]:>10} documents  RSS {(sample[2] or 0) / 1e6:8.1f} MB"
+              + (f"  traced {sample[3] / 1e6:8.1f} MB" if sample[3] is not None else ""), flush=True)
+        if samples_file is not None:
+            samples_file.write(json.dumps(dict(zip(("seconds", "documents", "rss", "traced"), sample))) + "\n")
+            samples_file.flush()
+
+    temp_dir = tempfile.mkdtemp(prefix="grobid-soak-")
+    server = None
+    try:
+        if args.target == "client":
+            corpus = make_corpus(os.path.join(temp_dir, "corpus"), args.corpus_size, args.document_size)
+            server = server_from_args(args).start() if args.in_process_server else MockServerProcess(
+                _server_options(args))
+            step = client_step(server.url, str(corpus), os.path.join(temp_dir, "output"), args.concurrency,
+                               json_output=args.json, markdown_output=args.markdown)
+        else:
+            step = converters_step(paragraphs=args.paragraphs, markdown=not args.no_markdown)
+        result = run_soak(step, args.documents, args.duration, args.warmup, args.max_slope, args.noise,
+                          args.tracemalloc, on_sample)
+    finally:
+        if server is not None:
+            server.close()
+        if samples_file is not None:
+            samples_file.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    result = dict({"date": datetime.datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                   "target": args.target}, **result)
+    print(json.dumps(result, indent=2))
+    if args.results:
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    for failure in result["failures"]:
+        print(f"FAILED {failure}", file=sys.stderr)
+    return 0 if result["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Synthetic GROBID TEI documents, at any scale.
+
+generate_tei() writes a TEI document shaped like GROBID output: a header with authors,
+affiliations and an abstract, a body of sections with paragraphs (optionally segmented in
+sentences, <s>), dense bibliographical, figure, table and formula references (<ref>), formulas,
+figures and tables (<figure type="table"> with <table>/<row>/<cell>), and a listBibl of
+biblStruct entries, with PDF coordinates (coords) on the elements GROBID annotates.
+The content is pseudo-random but deterministic for a given seed.
+
+PRESETS gives the documents used by the converter benchmarks, from a typical article to the
+pathological ones: thousands of paragraphs, 5000 references, large tables.
+"""
+import random
+from typing import Dict, List
+
+WORDS = (
+    "the of and in to a is that for with as was on by are this be from at we were which an or these have has "
+    "results method model data analysis study effect cell protein expression function patients treatment "
+    "response signal pathway increase significant observed shown figure table sample measured level using "
+    "between during after compared different high low two three control group time rate structure system "
+    "process network learning training performance value mean distribution error energy temperature"
+).split()
+
+PRESETS: Dict[str, Dict] = {
+    "article": dict(sections=8, paragraphs=60, references=60, figures=6, tables=2, table_rows=12),
+    "sentences": dict(sections=12, paragraphs=400, references=250, figures=10, tables=4, table_rows=30,
+                      sentences=True),
+    "dense_refs": dict(sections=20, paragraphs=2000, references=5000, figures=30, tables=10, table_rows=50,
+                       sentences=True, refs_per_sentence=3.0),
+    "large_tables": dict(sections=4, paragraphs=100, references=100, figures=2, tables=20, table_rows=500,
+                         table_columns=12),
+}
+
+
+class _Generator:
+    def __init__(self, seed: int, coordinates: bool):
+        self.random = random.Random(seed)
+        self.coordinates = coordinates
+        self.page = 1
+
+    def coords(self) -> str:
+        if not self.coordinates:
+            return ""
+        r = self.random
+        return f' coords="{self.page},{r.uniform(50, 500):.2f},{r.uniform(50, 750):.2f},{r.uniform(10, 300):.2f},' \
+               f'{r.uniform(6, 10):.2f}"'
+
+    def words(self, low: int, high: int) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(low, high)))
+
+    def ref(self, references: int, figures: int, tables: int) -> str:
+        r = self.random
+        kind = r.random()
+        if kind < 0.75 and references:
+            index = r.randrange(references)
+            return f'<ref type="bibr"{self.coords()} target="#b{index}">[{index + 1}]</ref>'
+        if kind < 0.88 and figures:
+            index = r.randrange(figures)
+            return f'<ref type="figure"{self.coords()} target="#fig_{index}">{index + 1}</ref>'
+        if kind < 0.97 and tables:
+            index = r.randrange(tables)
+            return f'<ref type="table"{self.coords()} target="#tab_{index}">{index + 1}</ref>'
+        return f'<ref type="formula" target="#formula_{r.randrange(100)}">({r.randrange(1, 100)})</ref>'
+
+    def sentence(self, refs_per_sentence: float, references: int, figures: int, tables: int) -> str:
+        r = self.random
+        parts = [self.words(6, 14).capitalize()]
+        count = int(refs_per_sentence) + (1 if r.random() < refs_per_sentence % 1 else 0)
+        for _ in range(count):
+            parts.append(self.ref(references, figures, tables))
+            parts.append(self.words(2, 8))
+        # the words contain no XML special characters, the references are markup
+        return " ".join(parts) + "."
+
+
+def generate_tei(
+        sections: int = 8,
+        paragraphs: int = 60,
+        sentences_per_paragraph: int = 4,
+        refs_per_sentence: float = 0.5,
+        references: int = 60,
+        figures: int = 6,
+        tables: int = 2,
+        table_rows: int = 12,
+        table_columns: int = 6,
+        formulas: int = 5,
+        sentences: bool = False,
+        coordinates: bool = True,
+        seed: int = 0
+) -> str:
+    """Return a synthetic GROBID TEI document as a string."""
+    g = _Generator(seed, coordinates)
+    r = g.random
+    out: List[str] = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<TEI xml:space="preserve" xmlns="http://www.tei-c.org/ns/1.0" xmlns:xlink="http://www.w3.org/1999/xlink">\n'
+        '<teiHeader xml:lang="en"><fileDesc><titleStmt>'
+        f'<title level="a" type="main">{g.words(6, 12).capitalize()}</title></titleStmt>'
+        '<publicationStmt><publisher>Synthetic Publisher</publisher><availability status="unknown"><licence/>'
+        '</availability><date type="published" when="2024-05-17">2024-05-17</date></publicationStmt>'
+        '<sourceDesc><biblStruct><analytic>\n'
+    ]
+    for i in range(r.randint(3, 12)):
+        out.append(f'<author><persName{g.coords()}><forename type="first">{g.words(1, 1).capitalize()}</forename>'
+                   f'<surname>{g.words(1, 1).capitalize()}{i}</surname></persName>'
+                   f'<email>author{i}@example.org</email><affiliation key="aff{i % 3}">'
+                   f'<orgName type="institution">University {i % 3}</orgName><address><settlement>City</settlement>'
+                   f'<country key="DE">Germany</country></address></affiliation></author>\n')
+    out.append('<title level="a" type="main">Synthetic document</title>'
+               '<idno type="DOI">10.1234/synthetic.0001</idno></analytic>'
+               '<monogr><title level="j">Journal of Synthetic Documents</title><imprint>'
+               '<date type="published" when="2024-05-17"/></imprint></monogr></biblStruct></sourceDesc></fileDesc>'
+               '<profileDesc><textClass><keywords><term>synthetic</term><term>benchmark</term></keywords></textClass>'
+               '<abstract><div><p>')
+    out.append(" ".join(g.sentence(refs_per_sentence, references, figures, tables) for _ in range(5)))
+    out.append('</p></div></abstract></profileDesc></teiHeader>\n<text xml:lang="en"><body>\n')
+
+    def paragraph() -> str:
+        content = [g.sentence(refs_per_sentence, references, figures, tables)
+                   for _ in range(r.randint(max(1, sentences_per_paragraph - 2), sentences_per_paragraph + 2))]
+        if sentences:
+            return "<p>" + "".join(f"<s{g.coords()}>{s}</s>" for s in content) + "</p>\n"
+        return "<p>" + " ".join(content) + "</p>\n"
+
+    per_section = max(1, paragraphs // max(1, sections))
+    formula_every = max(1, paragraphs // formulas) if formulas else 0
+    for index in range(paragraphs):
+        if index % per_section == 0:
+            if index:
+                out.append("</div>\n")
+                g.page += 1
+            section = index // per_section + 1
+            out.append(f'<div xmlns="http://www.tei-c.org/ns/1.0"><head n="{section}"{g.coords()}>'
+                       f'{g.words(2, 6).capitalize()}</head>\n')
+        out.append(paragraph())
+        if formula_every and index % formula_every == formula_every - 1:
+            number = index // formula_every
+            out.append(f'<formula xml:id="formula_{number}"{g.coords()}>E = m c^{number % 5 + 2}'
+                       f'<label>({number + 1})</label></formula>\n')
+    if paragraphs:
+        out.append("</div>\n")
+
+    for index in range(figures):
+        out.append(f'<figure xmlns="http://www.tei-c.org/ns/1.0" xml:id="fig_{index}"{g.coords()}>'
+                   f'<head>Fig. {index + 1}</head><label>{index + 1}</label>'
+                   f'<figDesc>{g.words(10, 40).capitalize()}.</figDesc></figure>\n')
+    for index in range(tables):
+        rows = "".join(
+            "<row>" + "".join(f"<cell>{r.uniform(0, 1000):.3f}</cell>" if column else f"<cell>{g.words(1, 3)}</cell>"
+                              for column in range(table_columns)) + "</row>"
+            for _ in range(table_rows))
+        out.append(f'<figure xmlns="http://www.tei-c.org/ns/1.0" type="table" xml:id="tab_{index}"{g.coords()}>'
+                   f'<head>Table {index + 1}</head><label>{index + 1}</label>'
+                   f'<figDesc>{g.words(8, 20).capitalize()}.</figDesc><table>{rows}</table></figure>\n')
+
+    out.append('</body>\n<back>\n<div type="references">\n<listBibl>\n')
+    for index in range(references):
+        year = r.randint(1950, 2024)
+        out.append(
+            f'<biblStruct{g.coords()} xml:id="b{index}"><analytic>'
+            f'<title level="a" type="main">{g.words(5, 14).capitalize()}</title>'
+            + "".join(f'<author><persName><forename type="first">{g.words(1, 1).capitalize()[:1]}</forename>'
+                      f'<surname>{g.words(1, 1).capitalize()}</surname></persName></author>'
+                      for _ in range(r.randint(1, 6)))
+            + f'<idno type="DOI">10.{r.randint(1000, 9999)}/{r.randint(10000, 99999)}</idno></analytic>'
+            f'<monogr><title level="j">{g.words(2, 4).title()}</title><imprint>'
+            f'<biblScope unit="volume">{r.randint(1, 300)}</biblScope>'
+            f'<biblScope unit="page" from="{r.randint(1, 500)}" to="{r.randint(501, 999)}"/>'
+            f'<date type="published" when="{year}">{year}</date></imprint></monogr></biblStruct>\n')
+    out.append('</listBibl>\n</div>\n</back>\n</text>\n</TEI>\n')
+    return "".join(out)
+
+
+def generate_preset(name: str, seed: int = 0) -> str:
+    """Return the synthetic document of a preset of PRESETS."""
+    return generate_tei(seed=seed, **PRESETS[name])
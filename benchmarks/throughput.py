@@ -0,0 +1,201 @@
+"""
+End-to-end throughput benchmark of GrobidClient.process against a mock GROBID server.
+
+A synthetic corpus of small PDF (or reference list) files is generated once in --corpus and
+reused by the next runs with the same parameters. The mock server runs in a separate process
+(or in a thread with --in-process-server), so that the CPU time and the peak RSS measured are
+those of the client. Each run prints its results and appends them to --results as a JSON line:
+
+    python -m benchmarks.throughput --documents 100000 --concurrency 20 --latency lognormal:0.2,0.5 \\
+        --busy-rate 0.01 --corpus /tmp/corpus-100k --results results.jsonl
+
+Results: documents, processed, failed, seconds, docs_per_second, cpu_seconds, cpu_percent
+and peak_rss_mb, with the parameters of the run.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from benchmarks.measure import ResourceMonitor
+from benchmarks.mock_server import add_server_arguments, server_from_args
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+CORPUS_MARKER = ".benchmark-corpus.json"
+
+
+def make_corpus(
+        directory: os.PathLike,
+        documents: int,
+        size: int = 50000,
+        kind: str = "pdf",
+        per_directory: int = 1000,
+        seed: int = 0
+) -> Path:
+    """Generate `documents` synthetic inputs in subdirectories of `per_directory` files.
+
+    kind 'pdf' writes files of `size` bytes starting like a PDF, kind 'txt' reference lists of about
+    `size` bytes for processCitationList. An existing corpus with the same parameters is kept.
+    """
+    directory = Path(directory)
+    parameters = {"documents": documents, "size": size, "kind": kind, "per_directory": per_directory,
+                  "seed": seed}
+    marker = directory / CORPUS_MARKER
+    if marker.is_file():
+        with open(marker) as f:
+            if json.load(f) == parameters:
+                return directory
+        shutil.rmtree(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    if kind == "pdf":
+        length = max(0, size - 9)
+        content = b"%PDF-1.4\n" + random.Random(seed).getrandbits(8 * length).to_bytes(length, "little")
+    else:
+        line = "Lovelace A. Sketch of the Analytical Engine. Taylor's Scientific Memoirs 3, 666-731 (1843)\n"
+        content = (line * max(1, size // len(line))).encode()
+    for i in range(documents):
+        subdirectory = directory / f"{i // per_directory:05d}"
+        if i % per_directory == 0:
+            subdirectory.mkdir(exist_ok=True)
+        with open(subdirectory / f"doc{i:07d}.{kind}", "wb") as f:
+            f.write(content)
+
+    with open(marker, "w") as f:
+        json.dump(parameters, f)
+    return directory
+
+
+def run_benchmark(
+        corpus: os.PathLike,
+        output: os.PathLike,
+        server_url: str,
+        service: str = "processFulltextDocument",
+        concurrency: int = 10,
+        timeout: float = 60,
+        sleep_time: float = 0.5,
+        monitor_interval: float = 0.5,
+        log_level: int = logging.ERROR,
+        **process_options
+) -> Dict:
+    """Process the corpus with GrobidClient.process and return the measurements of the run.
+
+    process_options are passed to GrobidClient.process (json_output, markdown_output, output_layout...).
+    """
+    from grobid_client.grobid_client import GrobidClient
+
+    client = GrobidClient(grobid_server=server_url, timeout=timeout, sleep_time=sleep_time)
+    client.logger.setLevel(log_level)
+    process_options.setdefault("output_layout", "mirror")
+    with ResourceMonitor(monitor_interval) as monitor:
+        client.process(service, str(corpus), output=str(output), n=concurrency, force=True, **process_options)
+
+    documents = client.metrics.documents
+    processed = documents.value(outcome="processed")
+    failed = documents.value(outcome="failed")
+    peak_rss = monitor.peak_rss
+    return {
+        "documents": processed + failed,
+        "processed": processed,
+        "failed": failed,
+        "seconds": round(monitor.wall_seconds, 3),
+        "docs_per_second": round((processed + failed) / monitor.wall_seconds, 2) if monitor.wall_seconds else 0,
+        "cpu_seconds": round(monitor.cpu_seconds, 3),
+        "cpu_percent": round(100 * monitor.cpu_seconds / monitor.wall_seconds, 1) if monitor.wall_seconds else 0,
+        "peak_rss_mb": round(peak_rss / 1e6, 1) if peak_rss is not None else None,
+    }
+
+
+class MockServerProcess:
+    """Run benchmarks.mock_server in a separate process, with the given command line options."""
+
+    def __init__(self, options):
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.mock_server", "--port", "0"] + list(options),
+            cwd=REPOSITORY, stdout=subprocess.PIPE, text=True)
+        self.url = self._process.stdout.readline().strip()
+        if not self.url:
+            self._process.wait()
+            raise RuntimeError("The mock GROBID server did not start")
+
+    def close(self) -> None:
+        self._process.terminate()
+        self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _server_options(args):
+    options = ["--latency", args.latency, "--busy-rate", str(args.busy_rate), "--timeout-rate", str(args.timeout_rate),
+               "--timeout-delay", str(args.timeout_delay), "--response-size", args.response_size]
+    if args.seed is not None:
+        options += ["--seed", str(args.seed)]
+    if args.no_compress:
+        options.append("--no-compress")
+    return options
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the throughput of GrobidClient.process against a mock "
+                                                 "GROBID server")
+    parser.add_argument("--documents", type=int, default=10000, help="Number of documents (default: 10000)")
+    parser.add_argument("--document-size", type=int, default=50000,
+                        help="Size of the synthetic inputs in bytes (default: 50000)")
+    parser.add_argument("--service", default="processFulltextDocument",
+                        help="GROBID service (default: processFulltextDocument, processCitationList uses "
+                             "reference lists)")
+    parser.add_argument("--concurrency", "-n", type=int, default=10, help="Concurrent requests (default: 10)")
+    parser.add_argument("--client-timeout", type=float, default=10,
+                        help="Timeout of the client requests in seconds (default: 10)")
+    parser.add_argument("--sleep-time", type=float, default=0.5,
+                        help="Wait of the client before retrying a 503 answer, in seconds (default: 0.5)")
+    parser.add_argument("--json", action="store_true", help="Convert the results to JSON")
+    parser.add_argument("--markdown", action="store_true", help="Convert the results to Markdown")
+    parser.add_argument("--corpus", default=None,
+                        help="Directory of the synthetic corpus, kept for the next runs (default: temporary)")
+    parser.add_argument("--output", default=None, help="Output directory (default: temporary, removed)")
+    parser.add_argument("--results", default=None, help="JSON Lines file to which the results are appended")
+    parser.add_argument("--in-process-server", action="store_true",
+                        help="Run the mock server in a thread of the benchmark process")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    kind = "txt" if args.service == "processCitationList" else "pdf"
+    temp_dir = tempfile.mkdtemp(prefix="grobid-benchmark-")
+    try:
+        corpus = make_corpus(args.corpus or os.path.join(temp_dir, "corpus"), args.documents, args.document_size, kind)
+        output = args.output or os.path.join(temp_dir, "output")
+        server = server_from_args(args).start() if args.in_process_server else MockServerProcess(_server_options(args))
+        try:
+            result = run_benchmark(corpus, output, server.url, args.service, args.concurrency, args.client_timeout,
+                                   args.sleep_time, json_output=args.json, markdown_output=args.markdown)
+        finally:
+            server.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    result = dict({"date": datetime.datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                   "service": args.service, "concurrency": args.concurrency, "latency": args.latency,
+                   "busy_rate": args.busy_rate, "timeout_rate": args.timeout_rate,
+                   "response_size": args.response_size}, **result)
+    print(json.dumps(result, indent=2))
+    if args.results:
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
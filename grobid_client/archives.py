@@ -0,0 +1,120 @@
+"""
+Tar and zip archives as input sources.
+
+GrobidClient.process() reads the members of an archive given as input directly, without
+extracting them to disk. ArchiveReader reads the archive in a producer thread and hands the
+members over through a bounded queue, so decompression overlaps with the GROBID requests
+while only a bounded number of members is held in memory.
+
+Tar archives (optionally gzip, bz2 or xz compressed) are read as a stream, in member order,
+zip archives in the order of their central directory.
+"""
+import os
+import queue
+import threading
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+ARCHIVE_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz", ".zip")
+
+
+def is_archive(path: Union[str, os.PathLike]) -> bool:
+    """Return True if the file name has the extension of a supported archive."""
+    return str(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def iter_archive_members(
+        path: Union[str, os.PathLike],
+        accept: Optional[Callable[[str], bool]] = None
+) -> Iterator[Tuple[str, bytes]]:
+    """Yield the (member path, content) of the regular files of an archive.
+
+    `accept` is called with the file name of each member (without its directory), members for
+    which it returns False are not read.
+    """
+    if str(path).lower().endswith(".zip"):
+        import zipfile
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or (accept is not None and not accept(os.path.basename(info.filename))):
+                    continue
+                yield info.filename, archive.read(info)
+    else:
+        import tarfile
+        # Stream mode: members are read in order, compressed archives are never seeked
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if not member.isfile() or (accept is not None and not accept(os.path.basename(member.name))):
+                    continue
+                yield member.name, archive.extractfile(member).read()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+_END = object()
+
+
+class ArchiveReader:
+    """Iterate over the members of an archive read by a producer thread.
+
+    At most `max_buffered` members are read ahead of the consumer. An error of the producer is
+    raised by the iteration. close() stops the producer when the consumer does not read all the
+    members.
+    """
+
+    def __init__(
+            self,
+            path: Union[str, os.PathLike],
+            accept: Optional[Callable[[str], bool]] = None,
+            max_buffered: int = 32
+    ):
+        self.path = path
+        self.accept = accept
+        self.members = 0
+        self.bytes = 0
+        self._queue = queue.Queue(maxsize=max_buffered)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, name=f"archive-reader-{os.path.basename(str(path))}",
+                                        daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self) -> None:
+        try:
+            for name, content in iter_archive_members(self.path, self.accept):
+                self.members += 1
+                self.bytes += len(content)
+                if not self._put((name, content)):
+                    return
+        except Exception as e:
+            self._put(_Failure(e))
+        self._put(_END)
+
+    def __iter__(self) -> Iterator[Tuple[str, bytes]]:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
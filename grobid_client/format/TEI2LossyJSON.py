@@ -4,19 +4,25 @@
 
     Original version: https://github.com/howisonlab/softcite-dataset/blob/master/code/corpus/TEI2LossyJSON.py
 """
+import hashlib
 import logging
 import os
 import uuid
 from collections import OrderedDict
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections.abc import Mapping
 import html
 import re
 from pathlib import Path
-from typing import Dict, Union, BinaryIO, Iterator
+from typing import Dict, Iterable, List, Optional, Tuple, Union, BinaryIO, Iterator
 
-import dateparser
 from bs4 import BeautifulSoup, Tag
 
+# Parts of a converted document that can be selected with the `sections` parameter
+DOCUMENT_SECTIONS = ("biblio", "body_text", "figures_and_tables", "references")
+
+_S_TAG = re.compile(r"<s[\s/>]")
+_P_TAG = re.compile(r"<p[\s/>]")
+
 # Configure module-level logger
 logger = logging.getLogger(__name__)
 logger.propagate = False  # Prevent propagation to avoid duplicate logs
@@ -33,198 +39,338 @@ class TEI2LossyJSONConverter:
     - streaming: yields passages one by one to keep memory usage low when processing many files
 
     The class also provides utilities to process a directory of TEI files in parallel and in batches.
+
+    With stable_ids=True, passage, formula and figure IDs are derived from the document instead of being
+    random: the GROBID xml:id when present, otherwise a short hash of the document hash and the structural
+    path of the element, so that converting the same TEI twice gives identical output.
+
+    With normalize_sections=True, the document has a 'sections' table listing each distinct
+    (head_section, head_paragraph) pair once, and passages reference it with a 'section' index instead
+    of repeating the head strings (streamed passages, stream=True, are never normalized).
     """
 
-    def __init__(self, validate_refs: bool = True):
+    def __init__(
+            self,
+            validate_refs: bool = True,
+            stable_ids: bool = False,
+            normalize_sections: bool = False,
+            sections: Optional[Iterable[str]] = None
+    ):
         self.validate_refs = validate_refs
-
-    def convert_tei_file(self, tei_file: Union[Path, BinaryIO], stream: bool = False):
+        self.stable_ids = stable_ids
+        self.normalize_sections = normalize_sections
+        self.sections = _check_sections(sections)
+
+    def convert_tei_file(
+            self,
+            tei_file: Union[Path, BinaryIO],
+            stream: bool = False,
+            sections: Optional[Iterable[str]] = None
+    ):
         """Backward-compatible function. If stream=True returns a generator that yields passages (dicts).
         If stream=False returns the full document dict (same shape as original function).
-        """
-        # Load with BeautifulSoup but avoid building huge structures when streaming
-        if hasattr(tei_file, 'read'):
-            # File-like object (BinaryIO/StringIO)
-            content = tei_file.read()
-            if isinstance(content, bytes):
-                content = content.decode('utf-8')
-        else:
-            # Path-like object
-            with open(tei_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-        soup = BeautifulSoup(content, 'xml')
 
-        if soup.TEI is None:
-            logger.warning("%s: The TEI file is not well-formed or empty. Skipping the file.", tei_file)
+        `sections` restricts the document to some of DOCUMENT_SECTIONS (default: the converter sections, all
+        of them if not set); the other parts are not computed at all and a biblio-only document only parses
+        the teiHeader.
+        """
+        if stream:
+            sections = None
+        result = self._parse(tei_file, sections)
+        if result is None:
             return None if not stream else iter(())
-
-        # Determine passage level early
-        passage_level = "sentence" if len(soup.find_all("s")) > len(soup.find_all("p")) else "paragraph"
+        soup, content, passage_level, parts = result
+        ids = self._id_generator(soup, content)
 
         if stream:
             # Use generator that yields passages as they are formatted
-            return self._iter_passages_from_soup(soup, passage_level)
+            return self._iter_passages_from_soup(soup, passage_level, ids)
         else:
             # Build the full document (backward compatible)
-            document = OrderedDict()
-            document['level'] = passage_level
+            document, passages = self._build_document(soup, passage_level, ids, parts)
+            if 'body_text' in document:
+                document['body_text'].extend(passages)
+            return document
 
-            biblio_structure = OrderedDict()
-            document['biblio'] = biblio_structure
+    def stream_document(
+            self,
+            tei_file: Union[Path, BinaryIO],
+            sections: Optional[Iterable[str]] = None
+    ) -> Optional[Tuple[Dict, Iterator[Dict]]]:
+        """Parse a TEI file once and return (metadata, passages).
 
-            text_structure = []
-            document['body_text'] = text_structure
-            figures_and_tables = []
-            document['figures_and_tables'] = figures_and_tables
-            references_structure = []
-            document['references'] = references_structure
+        metadata has the same shape as the non-streaming document without the passages ('body_text' is an
+        empty list), passages is a generator yielding the body passages one at a time.
+        Returns None if the TEI file is not well-formed or empty.
+        """
+        result = self._parse(tei_file, sections)
+        if result is None:
+            return None
+        soup, content, passage_level, parts = result
+        return self._build_document(soup, passage_level, self._id_generator(soup, content), parts)
 
-            # Populate header and body using the same traversal used by the generator
+    def load_document(self, tei_file: Union[Path, BinaryIO]) -> Optional["LazyDocument"]:
+        """Parse a TEI file and return a LazyDocument, whose parts are computed on first access.
+
+        Returns None if the TEI file is not well-formed or empty.
+        """
+        result = self._parse(tei_file, None)
+        if result is None:
+            return None
+        soup, content, passage_level, parts = result
+        return LazyDocument(self, soup, passage_level, self._id_generator(soup, content), parts)
+
+    def _parse(self, tei_file: Union[Path, BinaryIO], sections: Optional[Iterable[str]]):
+        """Parse a TEI file, returning (soup, content, passage_level, selected parts) or None."""
+        parts = _check_sections(sections) or self.sections or DOCUMENT_SECTIONS
+        content = self._read_content(tei_file)
+
+        if set(parts) <= {"biblio"}:
+            # Only the header is needed, the text is neither parsed nor scanned. The level (used for the
+            # abstract) is estimated on the raw header in the same way as _passage_level does on the tree.
+            header_end = content.find("</teiHeader>")
+            if header_end != -1:
+                header = content[:header_end + len("</teiHeader>")]
+                passage_level = "sentence" if len(_S_TAG.findall(header)) > len(_P_TAG.findall(header)) else "paragraph"
+                soup = BeautifulSoup(header + "</TEI>", 'xml')
+                if soup.TEI is not None:
+                    return soup, content, passage_level, parts
+
+        soup = BeautifulSoup(content, 'xml')
+        if soup.TEI is None:
+            logger.warning("%s: The TEI file is not well-formed or empty. Skipping the file.", tei_file)
+            return None
+        return soup, content, self._passage_level(soup), parts
+
+    @staticmethod
+    def _read_content(tei_file: Union[Path, BinaryIO]) -> str:
+        if hasattr(tei_file, 'read'):
+            # File-like object (BinaryIO/StringIO)
+            content = tei_file.read()
+            if isinstance(content, bytes):
+                content = content.decode('utf-8')
+        else:
+            # Path-like object, plain or compressed
+            from .compression import read_text
+            content = read_text(tei_file)
+        return content
+
+    def _id_generator(self, soup: BeautifulSoup, content: str):
+        """Return the function giving the ID of a passage element: ids(prefix, element)."""
+        if not self.stable_ids:
+            return _random_id_for
+        # The GROBID MD5 of the PDF identifies the document, fall back to the TEI content
+        md5_node = soup.find("idno", type="MD5")
+        if md5_node and md5_node.text.strip():
+            document_key = md5_node.text.strip()
+        else:
+            document_key = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        return StableIdGenerator(document_key)
+
+    @staticmethod
+    def _passage_level(soup: BeautifulSoup) -> str:
+        return "sentence" if len(soup.find_all("s")) > len(soup.find_all("p")) else "paragraph"
+
+    def _build_document(
+            self,
+            soup: BeautifulSoup,
+            passage_level: str,
+            ids=None,
+            parts: Iterable[str] = DOCUMENT_SECTIONS
+    ) -> Tuple[Dict, Iterator[Dict]]:
+        """Build the document structure; body passages are returned as a separate lazy iterator.
+
+        Only the selected parts are computed and present in the document.
+        """
+        document = OrderedDict()
+        document['level'] = passage_level
+
+        if 'biblio' in parts:
+            document['biblio'] = self._document_part('biblio', soup, passage_level, ids)
+
+        sections = None
+        passages = iter(())
+        if 'body_text' in parts:
+            if self.normalize_sections:
+                # Filled while the passages are produced
+                sections = SectionTable()
+                document['sections'] = sections.entries
+            document['body_text'] = []
+            passages = self._iter_passages_from_soup(soup, passage_level, ids, sections)
+
+        for part in ('figures_and_tables', 'references'):
+            if part in parts:
+                document[part] = self._document_part(part, soup, passage_level, ids)
+
+        return document, passages
+
+    def _document_part(self, part: str, soup: BeautifulSoup, passage_level: str, ids=None):
+        """Compute the biblio, figures_and_tables or references part of a document."""
+        if part == 'biblio':
+            biblio_structure = OrderedDict()
             for child in soup.TEI.children:
                 if child.name == 'teiHeader':
-                    # Header parsing mirrors original behavior
-                    title_node = child.find("title", attrs={"type": "main", "level": "a"})
-                    biblio_structure["title"] = title_node.text if title_node else ""
-                    biblio_structure["authors"] = list(
-                        filter(
-                            lambda x: x.strip() != "",
-                            [
-                                " ".join(
-                                    [
-                                        author.find('forename').text if author.find('forename') is not None else "",
-                                        author.find('surname').text if author.find('surname') is not None else ""
-                                    ]
-                                ) for author in child.find_all("author")
-                            ]
-                        )
-                    )
-
-                    doi_node = child.find("idno", type="DOI")
-                    if doi_node:
-                        biblio_structure['doi'] = doi_node.text
-
-                    md5_node = child.find("idno", type="MD5")
-                    if md5_node:
-                        biblio_structure['hash'] = md5_node.text
-
-                    pmc_idno = child.find("idno", type="PMC")
-                    if pmc_idno:
-                        biblio_structure['pmc'] = pmc_idno.text
-
-                    pub_date = child.find("date", attrs={"type": "published"})
-                    if pub_date:
-                        iso_date = pub_date.attrs.get("when")
-                        if iso_date:
-                            biblio_structure["publication_date"] = iso_date
-                            try:
-                                year = dateparser.parse(iso_date).year
-                                biblio_structure["publication_year"] = year
-                            except Exception:
-                                pass
-
-                    publisherStmt = child.find("publicationStmt")
-                    publisher_node = publisherStmt.find("publisher") if publisherStmt else None
-                    if publisher_node:
-                        biblio_structure["publisher"] = publisher_node.text
-
-                    journal_node = child.find("title", attrs={"type": "main", "level": "j"})
-                    if journal_node:
-                        biblio_structure["journal"] = journal_node.text
-
-                    journal_abbr_node = child.find("title", attrs={"type": "abbr", "level": "j"})
-                    if journal_abbr_node:
-                        biblio_structure["journal_abbr"] = journal_abbr_node.text
-
-                    abstract_node = child.find("abstract")
-                    if abstract_node:
-                        abstract_paragraph_nodes = abstract_node.find_all("p")
-                        if passage_level == "sentence":
-                            biblio_structure["abstract"] = [
-                                [
-                                    {
-                                        "id": sentence.get("xml:id") if sentence.has_attr("xml:id") else id,
-                                        "text": sentence.text,
-                                        "coords": [
-                                            box_to_dict(coord.split(","))
-                                            for coord in sentence['coords'].split(";")
-                                        ] if sentence.has_attr("coords") else [],
-                                        "refs": get_refs_with_offsets(sentence)
-                                    }
-                                    for id, sentence in enumerate(paragraph.find_all("s"))
-                                ]
-                                for paragraph in abstract_paragraph_nodes
-                            ]
-                        else:
-                            biblio_structure["abstract"] = [
-                                {
-                                    "id": id,
-                                    "text": paragraph.text,
-                                    "coords": [
-                                        box_to_dict(coord.split(","))
-                                        for coord in paragraph['coords'].split(";")
-                                    ] if paragraph.has_attr("coords") else [],
-                                    "refs": get_refs_with_offsets(paragraph)
-                                }
-                                for id, paragraph in enumerate(abstract_paragraph_nodes)
-                            ]
-
-                elif child.name == 'text':
-                    # Collect body_text using the generator to avoid duplicating logic
-                    for passage in self._iter_passages_from_soup_for_text(child, passage_level):
-                        text_structure.append(passage)
+                    self._extract_biblio(child, passage_level, biblio_structure)
+            return biblio_structure
 
+        result = []
+        for child in soup.TEI.children:
+            if child.name == 'text':
+                if part == 'figures_and_tables':
                     # Collect figures and tables (kept in memory as they should be relatively small)
-                    figures_and_tables_xml = child.find_all("figure")
-                    for item in figures_and_tables_xml:
-                        item_id = item.attrs.get("xml:id") if item.has_attr("xml:id") else get_random_id()
-                        desc = item.figDesc
-                        head = item.head
-                        label = item.label
-                        if item.has_attr("type") and item.attrs["type"] == "table":
-                            json_content = xml_table_to_json(item.table) if item.table else None
-                            note = item.note
-                            figures_and_tables.append(
-                                {
-                                    "id": item_id,
-                                    "label": label.text if label else "",
-                                    "head": head.text if head else "",
-                                    "type": "table",
-                                    "desc": desc.text if desc else "",
-                                    "content": json_content,
-                                    "note": note.text if note else "",
-                                    "coords": [
-                                        box_to_dict(coord.split(","))
-                                        for coord in item['coords'].split(";")
-                                    ] if item.has_attr("coords") else []
-                                }
-                            )
-                        else:
-                            graphic_coords = item.graphic.attrs['coords'] if item.graphic and item.graphic.has_attr(
-                                "coords") else None
-                            figures_and_tables.append(
-                                {
-                                    "id": item_id,
-                                    "label": label.text if label else "",
-                                    "head": head.text if head else "",
-                                    "type": "figure",
-                                    "desc": desc.text if desc else "",
-                                    "note": item.note.text if item.note else "",
-                                    "coords": [
-                                        box_to_dict(coord.split(","))
-                                        for coord in graphic_coords.split(";")
-                                    ] if graphic_coords else []
-                                }
-                            )
-
+                    result.extend(self._extract_figures_and_tables(child, ids))
+                else:
                     # Extract references from listBibl with comprehensive processing
-                    list_bibl = soup.find("listBibl")
-                    if list_bibl:
-                        for i, bibl_struct in enumerate(list_bibl.find_all("biblStruct"), 1):
-                            ref_data = self._extract_comprehensive_reference_data(bibl_struct, i)
-                            if ref_data:
-                                references_structure.append(ref_data)
+                    result.extend(self._extract_references(soup))
+        return result
+
+    def _extract_biblio(self, header: Tag, passage_level: str, biblio_structure: Dict) -> None:
+        """Fill biblio_structure with the bibliographic information of the teiHeader."""
+        title_node = header.find("title", attrs={"type": "main", "level": "a"})
+        biblio_structure["title"] = title_node.text if title_node else ""
+        biblio_structure["authors"] = list(
+            filter(
+                lambda x: x.strip() != "",
+                [
+                    " ".join(
+                        [
+                            author.find('forename').text if author.find('forename') is not None else "",
+                            author.find('surname').text if author.find('surname') is not None else ""
+                        ]
+                    ) for author in header.find_all("author")
+                ]
+            )
+        )
+
+        doi_node = header.find("idno", type="DOI")
+        if doi_node:
+            biblio_structure['doi'] = doi_node.text
+
+        md5_node = header.find("idno", type="MD5")
+        if md5_node:
+            biblio_structure['hash'] = md5_node.text
+
+        pmc_idno = header.find("idno", type="PMC")
+        if pmc_idno:
+            biblio_structure['pmc'] = pmc_idno.text
+
+        pub_date = header.find("date", attrs={"type": "published"})
+        if pub_date:
+            iso_date = pub_date.attrs.get("when")
+            if iso_date:
+                biblio_structure["publication_date"] = iso_date
+                try:
+                    # dateparser loads timezone and locale tables, only pay for it when needed
+                    import dateparser
+                    year = dateparser.parse(iso_date).year
+                    biblio_structure["publication_year"] = year
+                except Exception:
+                    pass
+
+        publisherStmt = header.find("publicationStmt")
+        publisher_node = publisherStmt.find("publisher") if publisherStmt else None
+        if publisher_node:
+            biblio_structure["publisher"] = publisher_node.text
+
+        journal_node = header.find("title", attrs={"type": "main", "level": "j"})
+        if journal_node:
+            biblio_structure["journal"] = journal_node.text
+
+        journal_abbr_node = header.find("title", attrs={"type": "abbr", "level": "j"})
+        if journal_abbr_node:
+            biblio_structure["journal_abbr"] = journal_abbr_node.text
+
+        abstract_node = header.find("abstract")
+        if abstract_node:
+            abstract_paragraph_nodes = abstract_node.find_all("p")
+            if passage_level == "sentence":
+                biblio_structure["abstract"] = [
+                    [
+                        {
+                            "id": sentence.get("xml:id") if sentence.has_attr("xml:id") else id,
+                            "text": sentence.text,
+                            "coords": [
+                                box_to_dict(coord.split(","))
+                                for coord in sentence['coords'].split(";")
+                            ] if sentence.has_attr("coords") else [],
+                            "refs": get_refs_with_offsets(sentence)
+                        }
+                        for id, sentence in enumerate(paragraph.find_all("s"))
+                    ]
+                    for paragraph in abstract_paragraph_nodes
+                ]
+            else:
+                biblio_structure["abstract"] = [
+                    {
+                        "id": id,
+                        "text": paragraph.text,
+                        "coords": [
+                            box_to_dict(coord.split(","))
+                            for coord in paragraph['coords'].split(";")
+                        ] if paragraph.has_attr("coords") else [],
+                        "refs": get_refs_with_offsets(paragraph)
+                    }
+                    for id, paragraph in enumerate(abstract_paragraph_nodes)
+                ]
+
+    def _extract_figures_and_tables(self, text_node: Tag, ids=None) -> List[Dict]:
+        """Extract the figures and tables of the text element."""
+        ids = ids or _random_id_for
+        figures_and_tables = []
+        figures_and_tables_xml = text_node.find_all("figure")
+        for item in figures_and_tables_xml:
+            item_id = item.attrs.get("xml:id") if item.has_attr("xml:id") else ids("", item)
+            desc = item.figDesc
+            head = item.head
+            label = item.label
+            if item.has_attr("type") and item.attrs["type"] == "table":
+                json_content = xml_table_to_json(item.table) if item.table else None
+                note = item.note
+                figures_and_tables.append(
+                    {
+                        "id": item_id,
+                        "label": label.text if label else "",
+                        "head": head.text if head else "",
+                        "type": "table",
+                        "desc": desc.text if desc else "",
+                        "content": json_content,
+                        "note": note.text if note else "",
+                        "coords": [
+                            box_to_dict(coord.split(","))
+                            for coord in item['coords'].split(";")
+                        ] if item.has_attr("coords") else []
+                    }
+                )
+            else:
+                graphic_coords = item.graphic.attrs['coords'] if item.graphic and item.graphic.has_attr(
+                    "coords") else None
+                figures_and_tables.append(
+                    {
+                        "id": item_id,
+                        "label": label.text if label else "",
+                        "head": head.text if head else "",
+                        "type": "figure",
+                        "desc": desc.text if desc else "",
+                        "note": item.note.text if item.note else "",
+                        "coords": [
+                            box_to_dict(coord.split(","))
+                            for coord in graphic_coords.split(";")
+                        ] if graphic_coords else []
+                    }
+                )
 
-            return document
+        return figures_and_tables
+
+    def _extract_references(self, soup: BeautifulSoup) -> List[Dict]:
+        """Extract the bibliographical references of the first listBibl."""
+        references = []
+        list_bibl = soup.find("listBibl")
+        if list_bibl:
+            for i, bibl_struct in enumerate(list_bibl.find_all("biblStruct"), 1):
+                ref_data = self._extract_comprehensive_reference_data(bibl_struct, i)
+                if ref_data:
+                    references.append(ref_data)
+        return references
 
     def _extract_comprehensive_reference_data(self, bibl_struct: Tag, index: int) -> Dict:
         """
@@ -641,15 +787,16 @@ class TEI2LossyJSONConverter:
 
         return text
 
-    def _iter_passages_from_soup(self, soup: BeautifulSoup, passage_level: str) -> Iterator[Dict[str, Union[str, Dict[str, str]]]]:
+    def _iter_passages_from_soup(self, soup: BeautifulSoup, passage_level: str, ids=None, sections=None) -> Iterator[Dict[str, Union[str, Dict[str, str]]]]:
         """Yield formatted passages discovered in the TEI soup. This yields the same structures
-        as get_formatted_passage but one at a time to keep memory usage low."""
+        as get_formatted_passage but one at a time to keep memory usage low.
+        Passages are converted to dicts here, with section references when a SectionTable is given."""
         for child in soup.TEI.children:
             if child.name == 'text':
-                for passage in self._iter_passages_from_soup_for_text(child, passage_level):
-                    yield passage
+                for passage in self._iter_passages_from_soup_for_text(child, passage_level, ids):
+                    yield passage.to_dict(sections)
 
-    def _iter_passages_from_soup_for_text(self, text_node: Tag, passage_level: str) -> Iterator[Dict[str, Union[str, Dict[str, str]]]]:
+    def _iter_passages_from_soup_for_text(self, text_node: Tag, passage_level: str, ids=None) -> Iterator["Passage"]:
         head_paragraph = None
 
         # Process body and back sections
@@ -684,19 +831,21 @@ class TEI2LossyJSONConverter:
                     continue  # Skip to next div, the header will be used by subsequent sibling
 
                 # Process this div and potentially nested divs
-                for passage in self._process_div_with_nested_content(div, passage_level, head_paragraph):
+                for passage in self._process_div_with_nested_content(div, passage_level, head_paragraph, ids):
                     yield passage
                 
                 # Reset head_paragraph after it's been used by a content-bearing div
                 head_paragraph = None
 
 
-    def _process_div_with_nested_content(self, div: Tag, passage_level: str, head_paragraph: str = None) -> Iterator[Dict[str, Union[str, Dict[str, str]]]]:
+    def _process_div_with_nested_content(self, div: Tag, passage_level: str, head_paragraph: str = None, ids=None) -> Iterator["Passage"]:
         """
         Process a div and its nested content, handling various back section types.
         Supports nested divs for complex back sections like annex with multiple subsections.
         Also handles formula elements that are direct children of divs.
+        Passage IDs are given by ids(prefix, element), random IDs by default.
         """
+        ids = ids or _random_id_for
         head = div.find("head")
         p_nodes = div.find_all("p")
         head_section = None
@@ -722,7 +871,7 @@ class TEI2LossyJSONConverter:
                 if nested_div.get("type") == "references":
                     continue
                 # Pass None as head_paragraph to ensure nested divs use their own headers
-                for passage in self._process_div_with_nested_content(nested_div, passage_level, None):
+                for passage in self._process_div_with_nested_content(nested_div, passage_level, None, ids):
                     yield passage
             return  # Don't process this div further
 
@@ -761,93 +910,179 @@ class TEI2LossyJSONConverter:
                 continue
 
             if child.name == "p":
-                paragraph_id = get_random_id(prefix="p_")
+                paragraph_id = ids("p_", child)
 
                 if passage_level == "sentence":
                     for id_s, sentence in enumerate(child.find_all("s")):
-                        struct = get_formatted_passage(current_head_paragraph or head_paragraph, head_section, paragraph_id, sentence)
+                        struct = format_passage(current_head_paragraph or head_paragraph, head_section, paragraph_id, sentence)
                         if self.validate_refs:
-                            for ref in struct['refs']:
+                            for ref in struct.refs:
                                 assert ref['offset_start'] < ref['offset_end'], "Wrong offsets"
-                                assert struct['text'][ref['offset_start']:ref['offset_end']] == ref['text'], "Cannot apply offsets"
+                                assert struct.text[ref['offset_start']:ref['offset_end']] == ref['text'], "Cannot apply offsets"
                         yield struct
                 else:
-                    struct = get_formatted_passage(current_head_paragraph or head_paragraph, head_section, paragraph_id, child)
+                    struct = format_passage(current_head_paragraph or head_paragraph, head_section, paragraph_id, child)
                     if self.validate_refs:
-                        for ref in struct['refs']:
+                        for ref in struct.refs:
                             assert ref['offset_start'] < ref['offset_end'], "Wrong offsets"
-                            assert struct['text'][ref['offset_start']:ref['offset_end']] == ref['text'], "Cannot apply offsets"
+                            assert struct.text[ref['offset_start']:ref['offset_end']] == ref['text'], "Cannot apply offsets"
                     yield struct
 
             elif child.name == "formula":
                 # Process formula elements as passages
-                formula_id = get_random_id(prefix="f_")
+                formula_id = ids("f_", child)
                 formula_text = self._clean_text(child.get_text())
                 
                 if formula_text:
                     # Create a passage structure for the formula
-                    formula_passage = {
-                        "id": formula_id,
-                        "text": formula_text,
-                        "coords": [
+                    label = child.find("label")
+                    yield Passage(
+                        formula_id,
+                        formula_text,
+                        [
                             box_to_dict(coord.split(","))
                             for coord in child.get("coords", "").split(";")
                         ] if child.has_attr("coords") else [],
-                        "refs": [],
-                        "type": "formula"
-                    }
-                    
-                    if current_head_paragraph or head_paragraph:
-                        formula_passage["head_paragraph"] = current_head_paragraph or head_paragraph
-                    if head_section:
-                        formula_passage["head_section"] = head_section
-                    
-                    # Extract formula label if present
-                    label = child.find("label")
-                    if label:
-                        formula_passage["label"] = self._clean_text(label.get_text())
-                    
-                    yield formula_passage
+                        [],
+                        current_head_paragraph or head_paragraph,
+                        head_section,
+                        passage_type="formula",
+                        # Extract formula label if present
+                        label=self._clean_text(label.get_text()) if label else None
+                    )
 
         # Update head_paragraph for potential next div
         if current_head_paragraph is not None:
             head_paragraph = current_head_paragraph
 
-    def process_directory(self, directory: Union[str, Path], pattern: str = "*.tei.xml", parallel: bool = True, workers: int = None) -> Iterator[Dict]:
-        """Process a directory of TEI files and yield converted documents.
-        When parallel=True this uses ProcessPoolExecutor to parallelize file-level conversion.
-        Each yielded item is a dict with keys: 'path' and 'document' (document may be None on parse error).
+    def process_directory(
+            self,
+            directory: Union[str, Path],
+            pattern: str = "*.tei.xml",
+            parallel: bool = True,
+            workers: int = None,
+            output_dir: Union[str, Path] = None,
+            max_in_flight: int = None,
+            max_tasks_per_child: int = None,
+            ordered: bool = False,
+            json_format: str = None
+    ) -> Iterator[Dict]:
+        """Process a directory of TEI files and yield one record per file.
+
+        Files are discovered lazily and at most `max_in_flight` conversions are pending at any time
+        (default: 2 x workers), so the directory can hold millions of files.
+
+        Without `output_dir`, each yielded item is a dict with keys 'path' and 'document' (document may be
+        None on parse error). With `output_dir`, the workers write the JSON files themselves (mirroring the
+        directory structure, serialized with `json_format`) and only a small status record is sent back to
+        the parent: {'path', 'output', 'status', 'error'} where status is 'ok', 'empty' or 'error'.
+
+        When parallel=True a ProcessPoolExecutor is used; workers are replaced after `max_tasks_per_child`
+        conversions to contain the memory growth of long-running BeautifulSoup workers.
+        With ordered=True, records are yielded in discovery order instead of completion order.
         """
+        from .batch import iter_tei_files, run_bounded, output_path_for
+        from .serializers import get_serializer
+
         directory = Path(directory)
-        files = list(directory.rglob(pattern))
-        if not parallel or len(files) <= 1:
-            for f in files:
-                yield {"path": f, "document": self.convert_tei_file(f, stream=False)}
+        extension = get_serializer(json_format).extension
+        converter_options = {
+            "stable_ids": self.stable_ids,
+            "normalize_sections": self.normalize_sections,
+            "sections": self.sections
+        }
+
+        def tasks():
+            for f in iter_tei_files(directory, pattern):
+                output_file = output_path_for(f, directory, output_dir, extension) if output_dir is not None else None
+                yield f, (str(f), output_file, json_format, converter_options)
+
+        def on_error(path, args, error):
+            if output_dir is None:
+                return {"path": path, "document": None}
+            return {"path": path, "output": None, "status": "error", "error": str(error)}
+
+        if not parallel:
+            for f, args in tasks():
+                yield _convert_file_task(*args)
             return
 
-        # Use processes for CPU-bound parsing when many files are available
+        # Use processes for CPU-bound parsing
         workers = workers or min(32, (os.cpu_count() or 1))
-        with ProcessPoolExecutor(max_workers=workers) as ex:
-            futures = {ex.submit(_convert_file_worker, str(f)): f for f in files}
-            for fut in as_completed(futures):
-                f = futures[fut]
-                try:
-                    doc = fut.result()
-                except Exception:
-                    logger.exception("Error processing %s", f)
-                    doc = None
-                yield {"path": f, "document": doc}
-
-
-def _convert_file_worker(path: str):
-    """Worker used by ProcessPoolExecutor. Imports inside function to avoid pickling issues."""
-    from bs4 import BeautifulSoup
-    # Reuse existing top-level helpers from this module by importing here
-    with open(path, 'r') as f:
-        content = f.read()
-    soup = BeautifulSoup(content, 'xml')
-    converter = TEI2LossyJSONConverter()
-    return converter.convert_tei_file(path, stream=False)
+        for record in run_bounded(_convert_file_task, tasks(), workers, max_in_flight, max_tasks_per_child,
+                                  ordered, on_error):
+            yield record
+
+
+def _convert_file_task(path: str, output_file: Path = None, json_format: str = None, converter_options: Dict = None) -> Dict:
+    """Worker used by ProcessPoolExecutor. Module-level so that it can be pickled.
+
+    When output_file is given, the JSON document is written there and only a status record is returned,
+    otherwise the full document is returned in the record.
+    """
+    if output_file is None:
+        converter = TEI2LossyJSONConverter(**(converter_options or {}))
+        return {"path": Path(path), "document": converter.convert_tei_file(path, stream=False)}
+
+    from .batch import convert_file
+    record = convert_file("json", path, output_file, json_format, converter_options)
+    del record["size"], record["mtime_ns"], record["sha256"]
+    return record
+
+
+def _check_sections(sections: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    if sections is None:
+        return None
+    sections = tuple(sections)
+    unknown = set(sections) - set(DOCUMENT_SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown document sections {sorted(unknown)}, must be among {', '.join(DOCUMENT_SECTIONS)}")
+    return sections
+
+
+class LazyDocument(Mapping):
+    """Read-only document whose parts are computed on first access.
+
+    It behaves like the dict returned by TEI2LossyJSONConverter.convert_tei_file (same keys, in the same
+    order), but e.g. document['biblio'] does not compute the passages, figures or references.
+    Use to_dict() to get a plain document for serialization.
+    """
+
+    def __init__(self, converter: TEI2LossyJSONConverter, soup: BeautifulSoup, passage_level: str, ids, parts):
+        self._converter = converter
+        self._soup = soup
+        self._ids = ids
+        self._parts = {'level': passage_level}
+        self._keys = ['level']
+        for part in DOCUMENT_SECTIONS:
+            if part in parts:
+                if part == 'body_text' and converter.normalize_sections:
+                    self._keys.append('sections')
+                self._keys.append(part)
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key not in self._parts:
+            converter = self._converter
+            if key in ('body_text', 'sections'):
+                sections = SectionTable() if converter.normalize_sections else None
+                self._parts['body_text'] = list(
+                    converter._iter_passages_from_soup(self._soup, self._parts['level'], self._ids, sections))
+                if sections is not None:
+                    self._parts['sections'] = sections.entries
+            else:
+                self._parts[key] = converter._document_part(key, self._soup, self._parts['level'], self._ids)
+        return self._parts[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def to_dict(self) -> Dict:
+        return OrderedDict((key, self[key]) for key in self._keys)
 
 
 def box_to_dict(coord_list):
@@ -867,6 +1102,50 @@ def get_random_id(prefix=""):
     return f"{prefix}{uuid.uuid4().hex[:8]}"
 
 
+def _random_id_for(prefix, element):
+    return get_random_id(prefix)
+
+
+class StableIdGenerator:
+    """Deterministic IDs for the elements of one document.
+
+    The ID is the element xml:id when GROBID generated one, otherwise the prefix followed by a short hash
+    of the document key and of the structural path of the element (e.g. TEI/text[0]/body[0]/div[2]/p[1]).
+    The paths of the children of a node are computed together and cached, so that an ID costs
+    O(depth) and not O(number of siblings).
+    """
+
+    def __init__(self, document_key: str):
+        self.document_key = document_key
+        self._paths = {}  # id(element) -> structural path
+
+    def path(self, element: Tag) -> str:
+        path = self._paths.get(id(element))
+        if path is not None:
+            return path
+        parent = element.parent
+        if parent is None or parent.name == "[document]":
+            path = element.name
+            self._paths[id(element)] = path
+            return path
+
+        parent_path = self.path(parent)
+        counts = {}
+        for sibling in parent.children:
+            if isinstance(sibling, Tag):
+                index = counts.get(sibling.name, 0)
+                counts[sibling.name] = index + 1
+                self._paths[id(sibling)] = f"{parent_path}/{sibling.name}[{index}]"
+        return self._paths[id(element)]
+
+    def __call__(self, prefix: str, element: Tag) -> str:
+        xml_id = element.get("xml:id")
+        if xml_id:
+            return xml_id
+        digest = hashlib.blake2b(f"{self.document_key}:{self.path(element)}".encode('utf-8'), digest_size=6)
+        return f"{prefix}{digest.hexdigest()}"
+
+
 def get_refs_with_offsets(element):
     """Extract references with their text offsets from an element."""
     refs = []
@@ -953,8 +1232,74 @@ def get_refs_with_offsets(element):
     return final_refs
 
 
+class Passage:
+    """A body passage (paragraph, sentence or formula), converted to a dict only for serialization."""
+
+    __slots__ = ("id", "text", "coords", "refs", "head_paragraph", "head_section", "type", "label")
+
+    def __init__(self, passage_id, text, coords, refs, head_paragraph=None, head_section=None,
+                 passage_type=None, label=None):
+        self.id = passage_id
+        self.text = text
+        self.coords = coords
+        self.refs = refs
+        self.head_paragraph = head_paragraph
+        self.head_section = head_section
+        self.type = passage_type
+        self.label = label
+
+    def to_dict(self, sections=None) -> Dict:
+        """Return the passage as a dict; with a SectionTable, the heads are replaced by a section index."""
+        passage = {
+            "id": self.id,
+            "text": self.text,
+            "coords": self.coords,
+            "refs": self.refs
+        }
+        if self.type:
+            passage["type"] = self.type
+        if sections is not None:
+            if self.head_paragraph or self.head_section:
+                passage["section"] = sections.index(self.head_section, self.head_paragraph)
+        else:
+            if self.head_paragraph:
+                passage["head_paragraph"] = self.head_paragraph
+            if self.head_section:
+                passage["head_section"] = self.head_section
+        if self.label:
+            passage["label"] = self.label
+        return passage
+
+
+class SectionTable:
+    """Distinct (head_section, head_paragraph) pairs of a document, in order of first use."""
+
+    def __init__(self):
+        self.entries = []
+        self._indexes = {}
+
+    def index(self, head_section, head_paragraph) -> int:
+        key = (head_section, head_paragraph)
+        index = self._indexes.get(key)
+        if index is None:
+            index = len(self.entries)
+            entry = {}
+            if head_section:
+                entry["head_section"] = head_section
+            if head_paragraph:
+                entry["head_paragraph"] = head_paragraph
+            self.entries.append(entry)
+            self._indexes[key] = index
+        return index
+
+
 def get_formatted_passage(head_paragraph, head_section, paragraph_id, element):
     """Format a passage (paragraph or sentence) with metadata and references."""
+    return format_passage(head_paragraph, head_section, paragraph_id, element).to_dict()
+
+
+def format_passage(head_paragraph, head_section, paragraph_id, element) -> Passage:
+    """Same as get_formatted_passage, returning a Passage record."""
     # Import the clean_text method
     def _clean_text_local(text: str) -> str:
         if not text:
@@ -966,22 +1311,12 @@ def get_formatted_passage(head_paragraph, head_section, paragraph_id, element):
     text = _clean_text_local(element.get_text())
     refs = get_refs_with_offsets(element)
 
-    passage = {
-        "id": paragraph_id,
-        "text": text,
-        "coords": [
-            box_to_dict(coord.split(","))
-            for coord in element.get("coords", "").split(";")
-        ] if element.has_attr("coords") else [],
-        "refs": refs
-    }
-
-    if head_paragraph:
-        passage["head_paragraph"] = head_paragraph
-    if head_section:
-        passage["head_section"] = head_section
+    coords = [
+        box_to_dict(coord.split(","))
+        for coord in element.get("coords", "").split(";")
+    ] if element.has_attr("coords") else []
 
-    return passage
+    return Passage(paragraph_id, text, coords, refs, head_paragraph, head_section)
 
 
 def xml_table_to_markdown(table_element):
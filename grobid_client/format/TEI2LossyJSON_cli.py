@@ -6,12 +6,14 @@ This script provides a command-line interface for converting TEI XML files to JS
 using the TEI2LossyJSONConverter.
 """
 import argparse
-import json
 import logging
 import sys
 from pathlib import Path
 
-from .TEI2LossyJSON import TEI2LossyJSONConverter
+from ..profiling import add_profile_arguments, start_profiler_from_args
+from .batch import (add_batch_arguments, add_json_arguments, convert_batch, converter_options_from_args,
+                    is_batch_invocation)
+from .serializers import get_serializer
 
 
 def setup_logging(verbose: bool = False):
@@ -24,13 +26,20 @@ def setup_logging(verbose: bool = False):
     )
 
 
-def convert_single_file(input_file: Path, output_file: Path, verbose: bool = False) -> bool:
+def convert_single_file(
+        input_file: Path,
+        output_file: Path,
+        verbose: bool = False,
+        json_format: str = None,
+        converter_options: dict = None
+) -> bool:
     """Convert a single TEI file to JSON format."""
     try:
         if verbose:
             logging.info(f"Converting {input_file} to {output_file}")
 
-        converter = TEI2LossyJSONConverter()
+        from .TEI2LossyJSON import TEI2LossyJSONConverter
+        converter = TEI2LossyJSONConverter(**(converter_options or {}))
         result = converter.convert_tei_file(input_file, stream=False)
 
         if result is None:
@@ -41,8 +50,7 @@ def convert_single_file(input_file: Path, output_file: Path, verbose: bool = Fal
         output_file.parent.mkdir(parents=True, exist_ok=True)
 
         # Write JSON output
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        get_serializer(json_format).dump(result, output_file)
 
         if verbose:
             logging.info(f"Successfully converted {input_file} to {output_file}")
@@ -69,20 +77,31 @@ Examples:
 
   # Convert and output to stdout
   python -m grobid_client.format.TEI2LossyJSON --input input.tei.xml
+
+  # Write compact JSON with orjson (or MessagePack with --json-format msgpack)
+  python -m grobid_client.format.TEI2LossyJSON --input input.tei.xml --output output.json --json-format orjson
+
+  # Convert a directory tree with 8 processes, mirroring the structure in the output directory
+  python -m grobid_client.format TEI2LossyJSON --input tei/ --output json/ --workers 8
+
+  # Convert glob patterns and a list of files (one per line, '-' for stdin)
+  python -m grobid_client.format TEI2LossyJSON --input 'tei/**/*.tei.xml' --input-list files.txt --output json/
         """
     )
 
     parser.add_argument(
         "--input", "-i",
         type=Path,
-        required=True,
-        help="Input TEI XML file to convert"
+        nargs="+",
+        default=[],
+        help="Input TEI XML file(s), directories or glob patterns to convert"
     )
 
     parser.add_argument(
         "--output", "-o",
         type=Path,
-        help="Output JSON file (if not specified, prints to stdout)"
+        help="Output JSON file (if not specified, prints to stdout). In batch mode, output directory "
+             "(if not specified, outputs are written next to the TEI files)"
     )
 
     parser.add_argument(
@@ -91,10 +110,38 @@ Examples:
         help="Enable verbose logging"
     )
 
+    add_batch_arguments(parser)
+    add_profile_arguments(parser)
+    add_json_arguments(parser)
+
     args = parser.parse_args()
 
     # Setup logging
     setup_logging(args.verbose)
+    start_profiler_from_args(args)
+
+    if not args.input and args.input_list is None:
+        parser.error("at least one --input or --input-list is required")
+
+    # Directories, glob patterns and file lists are converted in batch mode
+    if is_batch_invocation(args):
+        stats = convert_batch(
+            "json",
+            args.input,
+            output_root=args.output,
+            pattern=args.pattern,
+            input_list=args.input_list,
+            workers=args.workers,
+            force=args.force,
+            verbose=args.verbose,
+            json_format=args.json_format,
+            converter_options=converter_options_from_args(args),
+            metrics_port=args.metrics_port,
+            metrics_textfile=args.metrics_textfile
+        )
+        sys.exit(1 if stats["errors"] > 0 else 0)
+
+    args.input = args.input[0]
 
     # Validate input file
     if not args.input.exists():
@@ -107,20 +154,26 @@ Examples:
 
     # Convert the file
     if args.output:
-        success = convert_single_file(args.input, args.output, args.verbose)
+        success = convert_single_file(args.input, args.output, args.verbose, args.json_format,
+                                      converter_options_from_args(args))
         sys.exit(0 if success else 1)
     else:
         # Output to stdout
         try:
-            converter = TEI2LossyJSONConverter()
+            from .TEI2LossyJSON import TEI2LossyJSONConverter
+            converter = TEI2LossyJSONConverter(**converter_options_from_args(args))
             result = converter.convert_tei_file(args.input, stream=False)
 
             if result is None:
                 logging.error(f"Failed to convert {args.input}: TEI file is not well-formed or empty")
                 sys.exit(1)
 
-            # Print JSON to stdout
-            print(json.dumps(result, indent=2, ensure_ascii=False))
+            # Write the serialized document to stdout
+            serializer = get_serializer(args.json_format)
+            data = serializer.dumps(result)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(data if serializer.binary else data + b"\n")
+            sys.stdout.buffer.flush()
 
         except Exception as e:
             logging.error(f"Error converting {args.input}: {str(e)}")
@@ -16,7 +16,8 @@ from pathlib import Path
 from typing import List, Dict, Union, Optional, BinaryIO
 from bs4 import BeautifulSoup, NavigableString, Tag
 import logging
-import dateparser
+
+from .compression import read_text
 
 # Configure module-level logger
 logger = logging.getLogger(__name__)
@@ -43,8 +44,8 @@ class TEI2MarkdownConverter:
         try:
             # Load with BeautifulSoup
             if isinstance(tei_file, (str, Path)):
-                with open(tei_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                # plain or compressed (.gz, .zst) file
+                content = read_text(tei_file)
             else:
                 content = tei_file.read()
                 if isinstance(content, bytes):
@@ -170,6 +171,8 @@ class TEI2MarkdownConverter:
             iso_date = pub_date.attrs.get("when")
             if iso_date:
                 try:
+                    # imported lazily, dateparser is slow to load
+                    import dateparser
                     parsed_date = dateparser.parse(iso_date)
                     if parsed_date:
                         return parsed_date.strftime("%B %d, %Y")
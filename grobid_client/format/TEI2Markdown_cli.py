@@ -10,7 +10,9 @@ import logging
 import sys
 from pathlib import Path
 
-from .TEI2Markdown import TEI2MarkdownConverter
+from ..profiling import add_profile_arguments, start_profiler_from_args
+from ..writer import atomic_write
+from .batch import add_batch_arguments, convert_batch, is_batch_invocation
 
 
 def setup_logging(verbose: bool = False):
@@ -29,6 +31,7 @@ def convert_single_file(input_file: Path, output_file: Path, verbose: bool = Fal
         if verbose:
             logging.info(f"Converting {input_file} to {output_file}")
 
+        from .TEI2Markdown import TEI2MarkdownConverter
         converter = TEI2MarkdownConverter()
         result = converter.convert_tei_file(input_file)
 
@@ -40,8 +43,7 @@ def convert_single_file(input_file: Path, output_file: Path, verbose: bool = Fal
         output_file.parent.mkdir(parents=True, exist_ok=True)
 
         # Write Markdown output
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(result)
+        atomic_write(output_file, result.encode('utf-8'))
 
         if verbose:
             logging.info(f"Successfully converted {input_file} to {output_file}")
@@ -68,20 +70,28 @@ Examples:
 
   # Convert and output to stdout
   python -m grobid_client.format.TEI2Markdown --input input.tei.xml
+
+  # Convert a directory tree with 8 processes, mirroring the structure in the output directory
+  python -m grobid_client.format TEI2Markdown --input tei/ --output md/ --workers 8
+
+  # Convert glob patterns and a list of files (one per line, '-' for stdin)
+  python -m grobid_client.format TEI2Markdown --input 'tei/**/*.tei.xml' --input-list files.txt --output md/
         """
     )
 
     parser.add_argument(
         "--input", "-i",
         type=Path,
-        required=True,
-        help="Input TEI XML file to convert"
+        nargs="+",
+        default=[],
+        help="Input TEI XML file(s), directories or glob patterns to convert"
     )
 
     parser.add_argument(
         "--output", "-o",
         type=Path,
-        help="Output Markdown file (if not specified, prints to stdout)"
+        help="Output Markdown file (if not specified, prints to stdout). In batch mode, output directory "
+             "(if not specified, outputs are written next to the TEI files)"
     )
 
     parser.add_argument(
@@ -90,10 +100,35 @@ Examples:
         help="Enable verbose logging"
     )
 
+    add_batch_arguments(parser)
+    add_profile_arguments(parser)
+
     args = parser.parse_args()
 
     # Setup logging
     setup_logging(args.verbose)
+    start_profiler_from_args(args)
+
+    if not args.input and args.input_list is None:
+        parser.error("at least one --input or --input-list is required")
+
+    # Directories, glob patterns and file lists are converted in batch mode
+    if is_batch_invocation(args):
+        stats = convert_batch(
+            "markdown",
+            args.input,
+            output_root=args.output,
+            pattern=args.pattern,
+            input_list=args.input_list,
+            workers=args.workers,
+            force=args.force,
+            verbose=args.verbose,
+            metrics_port=args.metrics_port,
+            metrics_textfile=args.metrics_textfile
+        )
+        sys.exit(1 if stats["errors"] > 0 else 0)
+
+    args.input = args.input[0]
 
     # Validate input file
     if not args.input.exists():
@@ -111,6 +146,7 @@ Examples:
     else:
         # Output to stdout
         try:
+            from .TEI2Markdown import TEI2MarkdownConverter
             converter = TEI2MarkdownConverter()
             result = converter.convert_tei_file(args.input)
 
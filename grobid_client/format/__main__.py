@@ -21,6 +21,8 @@ def main():
         print("\nExamples:")
         print("  python -m grobid_client.format TEI2LossyJSON --input file.tei.xml --output output.json")
         print("  python -m grobid_client.format TEI2Markdown --input file.tei.xml --output output.md")
+        print("  python -m grobid_client.format TEI2LossyJSON --input tei_dir/ --output json_dir/ --workers 8")
+        print("  python -m grobid_client.format TEI2Markdown --input 'tei_dir/**/*.tei.xml' --output md_dir/")
         print("\nGet help for specific converter:")
         print("  python -m grobid_client.format TEI2LossyJSON --help")
         print("  python -m grobid_client.format TEI2Markdown --help")
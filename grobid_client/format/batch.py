@@ -0,0 +1,540 @@
+"""
+Batch conversion of TEI files.
+
+This module provides the machinery shared by the format CLIs and
+TEI2LossyJSONConverter.process_directory to convert many TEI files in one process:
+input discovery (directories, glob patterns, file lists), output path mirroring,
+manifest-based up-to-date checks and a bounded ProcessPoolExecutor runner.
+
+The converters are imported inside the worker functions so that importing this
+module stays cheap.
+"""
+import argparse
+import fnmatch
+import glob
+import hashlib
+import io
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..profiling import active_profiler, profile_call, profile_stage
+from ..writer import atomic_write
+from .compression import COMPRESSION_EXTENSIONS, compression_of, decompress_bytes, existing_variant, strip_compression
+from .manifest import ConversionManifest
+from .serializers import DEFAULT_JSON_FORMAT, JSON_FORMATS, get_serializer
+
+# Same as TEI2LossyJSON.DOCUMENT_SECTIONS, which can not be imported here without loading BeautifulSoup
+DOCUMENT_SECTIONS = ("biblio", "body_text", "figures_and_tables", "references")
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_EXTENSIONS = {
+    "json": ".json",
+    "markdown": ".md"
+}
+
+TEI_SUFFIXES = (".grobid.tei.xml", ".tei.xml", ".xml")
+
+# Converter instances are created once per process, on first use
+_converters = {}
+
+
+def _has_glob_magic(path: str) -> bool:
+    return any(c in path for c in "*?[")
+
+
+def _is_shadowed(path: Path) -> bool:
+    """Return True if path is a compressed file of which another variant is preferred (plain, then .gz, then .zst).
+
+    The variants of a TEI file are converted to the same output, only the preferred one is converted.
+    """
+    if compression_of(path) is None:
+        return False
+    preferred = existing_variant(strip_compression(path))
+    if preferred is None or Path(preferred) == path:
+        return False
+    logger.warning(f"Skipping {path}, {preferred} is converted to the same output")
+    return True
+
+
+def iter_tei_files(directory: Path, pattern: str = "*.tei.xml") -> Iterator[Path]:
+    """Recursively yield the files of a directory matching pattern, plain or compressed (.gz, .zst).
+
+    When a file is stored both plain and compressed, only the preferred variant is yielded (see _is_shadowed).
+    """
+    patterns = [pattern] + [pattern + extension for extension in COMPRESSION_EXTENSIONS.values()]
+    if "/" in pattern:
+        for variant in patterns:
+            for path in directory.rglob(variant):
+                if not _is_shadowed(path):
+                    yield path
+        return
+    # One traversal for the plain and compressed variants
+    for path in directory.rglob("*"):
+        if any(fnmatch.fnmatch(path.name, variant) for variant in patterns) and not _is_shadowed(path):
+            yield path
+
+
+def iter_inputs(
+        inputs: Iterable[Union[str, Path]],
+        pattern: str = "*.tei.xml",
+        input_list: Optional[Union[str, Path]] = None
+) -> Iterator[Tuple[Path, Path]]:
+    """Lazily yield (tei_file, base_directory) pairs for the given inputs.
+
+    Each input can be a TEI file, a directory (searched recursively with `pattern`) or a glob
+    pattern (recursive `**` is supported). `input_list` is a text file with one input per line,
+    '-' reads the list from stdin. The base directory is used to mirror the directory structure
+    in the output root.
+    """
+    def all_inputs():
+        for item in inputs or []:
+            yield str(item)
+        if input_list is not None:
+            stream = sys.stdin if str(input_list) == "-" else open(input_list, "r", encoding="utf-8")
+            try:
+                for line in stream:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        yield line
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+
+    for item in all_inputs():
+        path = Path(item)
+        if path.is_dir():
+            for tei_file in iter_tei_files(path, pattern):
+                yield tei_file, path
+        elif path.is_file():
+            yield path, path.parent
+        elif _has_glob_magic(item):
+            # The base is the non-magic prefix of the pattern
+            base_parts = []
+            for part in path.parts:
+                if _has_glob_magic(part):
+                    break
+                base_parts.append(part)
+            base = Path(*base_parts) if base_parts else Path(".")
+            for match in glob.iglob(item, recursive=True):
+                match_path = Path(match)
+                if match_path.is_file() and not _is_shadowed(match_path):
+                    yield match_path, base
+        else:
+            logger.error(f"Input path does not exist: {item}")
+
+
+def output_path_for(
+        tei_file: Path,
+        base: Path,
+        output_root: Optional[Union[str, Path]],
+        extension: str
+) -> Path:
+    """Mirror the location of `tei_file` below `base` into `output_root`, replacing the TEI suffix.
+
+    Without output root, the output is written next to the TEI file.
+    """
+    name = strip_compression(tei_file.name)
+    for suffix in TEI_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    if output_root is None:
+        return tei_file.parent / f"{name}{extension}"
+    try:
+        relative_parent = tei_file.parent.relative_to(base)
+    except ValueError:
+        relative_parent = Path()
+    return Path(output_root) / relative_parent / f"{name}{extension}"
+
+
+def json_options(json_format: str = None, converter_options: Optional[Dict] = None) -> Dict:
+    """Return the options of a JSON conversion recorded in the manifest (only non-default values)."""
+    options = dict(get_serializer(json_format).options)
+    for name, value in (converter_options or {}).items():
+        if value:
+            # as read back from the manifest
+            options[name] = list(value) if isinstance(value, tuple) else value
+    return options
+
+
+def converter_options_from_args(args) -> Dict:
+    """Return the TEI2LossyJSONConverter options set by add_json_arguments."""
+    return {
+        "stable_ids": args.stable_ids,
+        "normalize_sections": args.normalize_sections,
+        "sections": tuple(args.sections) if args.sections else None
+    }
+
+
+def _get_converter(output_format: str, converter_options: Optional[Dict] = None):
+    converter_options = {name: value for name, value in (converter_options or {}).items() if value}
+    key = (output_format, tuple(sorted(converter_options.items())))
+    converter = _converters.get(key)
+    if converter is None:
+        if output_format == "json":
+            from .TEI2LossyJSON import TEI2LossyJSONConverter
+            converter = TEI2LossyJSONConverter(**converter_options)
+        elif output_format == "markdown":
+            from .TEI2Markdown import TEI2MarkdownConverter
+            converter = TEI2MarkdownConverter()
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+        _converters[key] = converter
+    return converter
+
+
+def convert_file(
+        output_format: str,
+        tei_file: Union[str, Path],
+        output_file: Union[str, Path],
+        json_format: str = None,
+        converter_options: Optional[Dict] = None
+) -> Dict:
+    """Convert one TEI file and write the result, returning a small status record.
+
+    JSON documents are written with the serializer of `json_format` (see serializers.JSON_FORMATS),
+    `converter_options` are passed to TEI2LossyJSONConverter (stable_ids, normalize_sections).
+
+    The record has the keys 'path', 'output', 'status' ('ok', 'empty' or 'error'), 'error',
+    'size' and 'mtime_ns' (of the TEI file, taken before reading it), 'sha256' (of the TEI content, for the
+    manifest) and 'seconds' (conversion time, without writing the output). Module-level so that it can run in
+    a process pool.
+    """
+    tei_file = Path(tei_file)
+    record = {"path": tei_file, "output": None, "status": "ok", "error": None, "size": 0, "mtime_ns": None,
+              "sha256": None, "seconds": None}
+    start = time.perf_counter()
+    try:
+        # The TEI file is read once, for its digest and for the conversion
+        tei_stat = os.stat(tei_file)
+        record["size"], record["mtime_ns"] = tei_stat.st_size, tei_stat.st_mtime_ns
+        with open(tei_file, 'rb') as f:
+            data = f.read()
+        record["sha256"] = hashlib.sha256(data).hexdigest()
+        source = io.BytesIO(decompress_bytes(data, compression_of(tei_file)))
+        del data
+        converter = _get_converter(output_format, converter_options)
+        with profile_stage("convert"):
+            if output_format == "json":
+                result = converter.convert_tei_file(source, stream=False)
+            else:
+                result = converter.convert_tei_file(source)
+
+        record["seconds"] = time.perf_counter() - start
+        if result is None:
+            record["status"] = "empty"
+            return record
+
+        output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        # Written atomically: a crashed or concurrent conversion never leaves a truncated output behind
+        if output_format == "json":
+            get_serializer(json_format).dump(result, output_file)
+        else:
+            atomic_write(output_file, result.encode("utf-8"))
+        record["output"] = output_file
+    except Exception as e:
+        logger.error(f"Error converting {tei_file}: {str(e)}")
+        record["status"] = "error"
+        record["error"] = str(e)
+    return record
+
+
+def _profiled_convert_file(*args) -> Dict:
+    """convert_file run under cProfile in a worker process, the record carries the statistics in 'profile'."""
+    record, stats = profile_call(convert_file, *args)
+    record["profile"] = stats
+    return record
+
+
+def _new_pool(workers: int, max_tasks_per_child: int = None) -> ProcessPoolExecutor:
+    if max_tasks_per_child and sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_tasks_per_child)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def run_bounded(
+        fn: Callable,
+        tasks: Iterable[Tuple[Path, tuple]],
+        workers: int,
+        max_in_flight: int = None,
+        max_tasks_per_child: int = None,
+        ordered: bool = False,
+        on_error: Callable = None
+) -> Iterator:
+    """Run fn(*args) for each (key, args) task in a process pool and yield the results.
+
+    At most `max_in_flight` tasks (default: 2 x workers) are pending at any time, so `tasks`
+    can be a lazy iterator over millions of items. Workers are replaced after
+    `max_tasks_per_child` tasks; on Python < 3.11, where ProcessPoolExecutor does not support it,
+    the whole pool is recycled once it has run workers x max_tasks_per_child tasks.
+    With ordered=True, results are yielded in submission order instead of completion order.
+    If a task raises, on_error(key, args, exception) is yielded instead (the exception is
+    re-raised when on_error is None).
+    """
+    max_in_flight = max_in_flight or workers * 2
+    native_recycling = sys.version_info >= (3, 11)
+    recycle_after = workers * max_tasks_per_child if max_tasks_per_child and not native_recycling else None
+
+    pending = deque()  # (future, key, args) in submission order
+    executor = _new_pool(workers, max_tasks_per_child)
+    submitted_to_pool = 0
+
+    def collect(future, key, args):
+        try:
+            return future.result()
+        except Exception as e:
+            if on_error is None:
+                raise
+            logger.exception("Error processing %s", key)
+            return on_error(key, args, e)
+
+    def drain(block_all=False):
+        """Yield finished results; wait for at least one (or for all when block_all)."""
+        if ordered:
+            while pending and (block_all or len(pending) >= max_in_flight or pending[0][0].done()):
+                yield collect(*pending.popleft())
+        else:
+            futures = [item[0] for item in pending]
+            done, _ = wait(futures, return_when=ALL_COMPLETED if block_all else FIRST_COMPLETED)
+            remaining = deque()
+            for item in pending:
+                if item[0] in done:
+                    yield collect(*item)
+                else:
+                    remaining.append(item)
+            pending.clear()
+            pending.extend(remaining)
+
+    try:
+        for key, args in tasks:
+            if recycle_after and submitted_to_pool >= recycle_after:
+                for result in drain(block_all=True):
+                    yield result
+                executor.shutdown(wait=True)
+                executor = _new_pool(workers)
+                submitted_to_pool = 0
+
+            pending.append((executor.submit(fn, *args), key, args))
+            submitted_to_pool += 1
+
+            if len(pending) >= max_in_flight:
+                for result in drain():
+                    yield result
+
+        while pending:
+            for result in drain(block_all=True):
+                yield result
+    finally:
+        executor.shutdown(wait=True)
+
+
+def convert_batch(
+        output_format: str,
+        inputs: List[Union[str, Path]],
+        output_root: Optional[Union[str, Path]] = None,
+        pattern: str = "*.tei.xml",
+        input_list: Optional[Union[str, Path]] = None,
+        workers: int = None,
+        force: bool = False,
+        verbose: bool = False,
+        json_format: str = None,
+        converter_options: Optional[Dict] = None,
+        metrics=None,
+        metrics_port: Optional[int] = None,
+        metrics_textfile: Optional[str] = None
+) -> Dict[str, int]:
+    """Convert all TEI files designated by `inputs` to `output_format` ('json' or 'markdown').
+
+    Outputs mirror the input directory structure below `output_root` (or are written next to the
+    TEI files). Unless `force` is set, outputs are skipped when the conversion manifest shows they were
+    produced from the same TEI content with the same converter version and options.
+    Prints processing statistics and returns the counters.
+
+    The conversions are recorded in `metrics` (a grobid_client.metrics.ClientMetrics, created when
+    exported), served on http://127.0.0.1:`metrics_port`/metrics and/or written to `metrics_textfile`
+    during the run.
+    """
+    start_time = time.time()
+    extension = OUTPUT_EXTENSIONS[output_format]
+    options = None
+    if output_format == "json":
+        extension = get_serializer(json_format).extension
+        options = json_options(json_format, converter_options)
+    workers = workers or min(32, (os.cpu_count() or 1))
+    manifest = ConversionManifest()
+
+    stats = {"found": 0, "processed": 0, "errors": 0, "skipped": 0, "bytes": 0}
+
+    metrics_exporters = None
+    if metrics is None and (metrics_port is not None or metrics_textfile):
+        from ..metrics import ClientMetrics
+        metrics = ClientMetrics()
+    if metrics_port is not None or metrics_textfile:
+        from ..metrics import MetricsExporters
+        metrics_exporters = MetricsExporters(metrics.registry, metrics_port, metrics_textfile)
+
+    def tasks():
+        for tei_file, base in iter_inputs(inputs, pattern, input_list):
+            stats["found"] += 1
+            output_file = output_path_for(tei_file, base, output_root, extension)
+            if not force and manifest.is_current(output_file, tei_file, output_format, options):
+                if verbose:
+                    logger.info(f"{output_file} is up to date, skipping... (use --force to reconvert)")
+                stats["skipped"] += 1
+                if metrics is not None:
+                    metrics.cache_lookups.inc(cache="conversion", result="hit")
+                continue
+            if not force and metrics is not None:
+                metrics.cache_lookups.inc(cache="conversion", result="miss")
+            yield tei_file, (output_format, tei_file, output_file, json_format, converter_options)
+
+    def on_error(key, args, error):
+        return {"path": key, "output": None, "status": "error", "error": str(error), "size": 0, "mtime_ns": None,
+                "sha256": None, "seconds": None}
+
+    profiler = active_profiler()
+    convert = convert_file
+    if profiler is not None and workers > 1:
+        if profiler.mode == "cprofile":
+            convert = _profiled_convert_file
+        else:
+            logger.warning("The sampling profiler does not sample the conversion processes, use --workers 1")
+
+    if workers <= 1:
+        records = (convert_file(*args) for _, args in tasks())
+    else:
+        records = run_bounded(convert, tasks(), workers, on_error=on_error)
+
+    try:
+        for record in records:
+            if "profile" in record:
+                profiler.add_stats("convert", record.pop("profile"))
+            stats["bytes"] += record["size"]
+            if metrics is not None:
+                metrics.conversions.inc(format=output_format, status=record["status"])
+                metrics.converted_bytes.inc(record["size"], format=output_format)
+                if record["seconds"] is not None:
+                    metrics.stage_seconds.observe(record["seconds"], stage="convert")
+            if record["status"] == "ok":
+                stats["processed"] += 1
+                manifest.record(record["output"], record["path"], output_format, options, sha256=record["sha256"],
+                                size=record["size"], mtime_ns=record["mtime_ns"])
+                if verbose:
+                    logger.info(f"Converted {record['path']} to {record['output']}")
+            else:
+                stats["errors"] += 1
+                logger.error(f"Conversion of {record['path']} failed: "
+                             f"{record['error'] or 'TEI file is not well-formed or empty'}")
+    finally:
+        manifest.save()
+        if metrics_exporters is not None:
+            metrics_exporters.close()
+
+    runtime = time.time() - start_time
+    docs_per_second = stats["processed"] / runtime if runtime > 0 else 0
+    seconds_per_doc = runtime / stats["processed"] if stats["processed"] > 0 else 0
+    mb_per_second = stats["bytes"] / (1024 * 1024) / runtime if runtime > 0 else 0
+
+    total = stats["found"]
+    print(f"Found {total} file(s) to convert")
+    print(f"Conversion completed: {stats['processed']} out of {total} files converted")
+    print(f"Errors: {stats['errors']} out of {total} files converted")
+    if stats["skipped"] > 0:
+        print(f"Skipped: {stats['skipped']} out of {total} files (already up to date, use --force to reconvert)")
+    print(f"⏱️  Total runtime: {runtime:.2f} seconds")
+    print(f"🚀 Speed: {docs_per_second:.2f} documents/second ({mb_per_second:.2f} MB/second of TEI)")
+    print(f" Throughput: {seconds_per_doc:.2f} seconds/document")
+
+    return stats
+
+
+def add_batch_arguments(parser) -> None:
+    """Add the batch mode options shared by the format CLIs."""
+    parser.add_argument(
+        "--input-list",
+        default=None,
+        help="Text file listing TEI files, directories or glob patterns, one per line ('-' for stdin)"
+    )
+    parser.add_argument(
+        "--pattern",
+        default="*.tei.xml",
+        help="File name pattern used when an input is a directory (default: *.tei.xml)"
+    )
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=None,
+        help="Number of conversion processes in batch mode (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reconvert files even if the manifest shows the output is up to date"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics of the batch conversion on http://127.0.0.1:PORT/metrics"
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        default=None,
+        help="Write Prometheus metrics of the batch conversion to this file (.prom) for node-exporter"
+    )
+
+
+def _parse_sections(value: str) -> List[str]:
+    sections = [part.strip() for part in value.split(",") if part.strip()]
+    unknown = [part for part in sections if part not in DOCUMENT_SECTIONS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown section(s) {', '.join(unknown)}, must be among {', '.join(DOCUMENT_SECTIONS)}")
+    return sections
+
+
+def add_json_arguments(parser) -> None:
+    """Add the options of the JSON writers: --json-format, --stable-ids, --normalize-sections and --sections."""
+    parser.add_argument(
+        "--json-format",
+        choices=JSON_FORMATS,
+        default=DEFAULT_JSON_FORMAT,
+        help="Serialization of the JSON output: indented JSON (pretty, default), JSON without whitespace "
+             "(compact), compact JSON encoded with orjson (orjson) or MessagePack binary files with a "
+             ".msgpack extension (msgpack)"
+    )
+    parser.add_argument(
+        "--stable-ids",
+        action="store_true",
+        help="Derive passage IDs from the document (GROBID xml:id or a hash of the document hash and the element "
+             "position) instead of random IDs, so that reconversions are identical"
+    )
+    parser.add_argument(
+        "--normalize-sections",
+        action="store_true",
+        help="List the section heads once in a 'sections' table and reference them by index from the passages "
+             "instead of repeating head_section/head_paragraph in every passage"
+    )
+    parser.add_argument(
+        "--sections",
+        type=_parse_sections,
+        default=None,
+        help=f"Comma-separated parts of the document to convert, among {', '.join(DOCUMENT_SECTIONS)} "
+             "(default: all). The other parts are not computed, 'biblio' alone only parses the TEI header"
+    )
+
+
+def is_batch_invocation(args) -> bool:
+    """Return True if the parsed CLI arguments designate more than a single TEI file."""
+    if args.input_list is not None or len(args.input) != 1:
+        return True
+    single = args.input[0]
+    return single.is_dir() or _has_glob_magic(str(single))
@@ -0,0 +1,109 @@
+"""
+Transparent compression of TEI files and converted outputs.
+
+A file whose name ends with `.gz` is gzip-compressed, `.zst` zstd-compressed (zstd requires
+the optional zstandard package). open_file opens plain and compressed files alike, so the
+client, the converters and the validator read `doc.grobid.tei.xml.gz` as they read
+`doc.grobid.tei.xml`. gzip files are written without timestamp, so that the same content
+always gives the same bytes.
+"""
+import gzip
+import io
+import os
+from typing import IO, Optional, Union
+
+COMPRESSIONS = ("gzip", "zstd")
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+PathType = Union[str, os.PathLike]
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compressed files require the zstandard package, install it with: pip install zstandard") from e
+    return zstandard
+
+
+def compression_of(path: PathType) -> Optional[str]:
+    """Return the compression of a file given by its extension, None for plain files."""
+    name = str(path)
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if name.endswith(extension):
+            return compression
+    return None
+
+
+def strip_compression(path: PathType) -> str:
+    """Return the path without its compression extension."""
+    name = str(path)
+    compression = compression_of(name)
+    return name[:-len(COMPRESSION_EXTENSIONS[compression])] if compression else name
+
+
+def with_compression(path: PathType, compression: Optional[str]) -> str:
+    """Return the path of a file stored with the given compression (None for plain files)."""
+    if compression is None:
+        return str(path)
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}', must be one of {', '.join(COMPRESSIONS)}")
+    return str(path) + COMPRESSION_EXTENSIONS[compression]
+
+
+def existing_variant(path: PathType) -> Optional[str]:
+    """Return the path of the plain or compressed file stored for `path` (a plain file name), None if none exists."""
+    for compression in (None,) + COMPRESSIONS:
+        candidate = with_compression(path, compression)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def open_file(path: PathType, mode: str = "rb", encoding: Optional[str] = None) -> IO:
+    """Open a plain, gzip or zstd file according to its extension, in binary or text mode like open()."""
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, mode, encoding=encoding)
+
+    binary_mode = mode.replace("t", "")
+    if compression == "gzip":
+        if "r" in binary_mode:
+            stream = gzip.open(path, binary_mode)
+        else:
+            stream = gzip.GzipFile(path, binary_mode, mtime=0)
+    else:
+        stream = _zstandard().open(path, binary_mode)
+    if "b" in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding or "utf-8")
+
+
+def compress_bytes(data: bytes, compression: Optional[str]) -> bytes:
+    """Return data compressed like open_file would write it (unchanged for None)."""
+    if compression is None:
+        return data
+    if compression == "gzip":
+        return gzip.compress(data, mtime=0)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown compression '{compression}', must be one of {', '.join(COMPRESSIONS)}")
+
+
+def decompress_bytes(data: bytes, compression: Optional[str]) -> bytes:
+    """Return the content of data stored with the given compression (unchanged for None)."""
+    if compression is None:
+        return data
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        # Frames written by a stream do not record their content size, read them as a stream
+        with _zstandard().ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True) as reader:
+            return reader.read()
+    raise ValueError(f"Unknown compression '{compression}', must be one of {', '.join(COMPRESSIONS)}")
+
+
+def read_text(path: PathType) -> str:
+    """Read the UTF-8 content of a plain or compressed file."""
+    with open_file(path, "rt", encoding="utf-8") as f:
+        return f.read()
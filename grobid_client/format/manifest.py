@@ -0,0 +1,173 @@
+"""
+Conversion manifests for incremental re-conversion.
+
+A manifest records, for each converted output, a fingerprint of what produced it:
+the SHA-256 of the TEI content, the converter and its version, and the conversion
+options. An output is regenerated only when one of these changed, so a converter
+release only re-converts what its version bump covers and an updated TEI file is
+picked up even when the output already exists.
+
+There is one manifest per output directory, stored as an append-only JSON Lines file
+(`.grobid-manifest.jsonl`, the last line for an output wins), so that recording a
+conversion never rewrites the whole file. The TEI size and modification time are
+stored as well to avoid re-hashing files that were not touched.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+MANIFEST_FILENAME = ".grobid-manifest.jsonl"
+
+# Bump the version of a converter when a change alters its output,
+# existing outputs are then regenerated on the next run
+CONVERTER_VERSIONS = {
+    "json": 1,
+    "markdown": 1
+}
+
+# Buffered manifest lines are appended to disk every FLUSH_EVERY records
+FLUSH_EVERY = 1000
+
+
+def file_sha256(path: Union[str, Path], chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex SHA-256 of a file content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def converter_id(output_format: str) -> str:
+    return f"{output_format}/{CONVERTER_VERSIONS[output_format]}"
+
+
+class ConversionManifest:
+    """Per-directory manifests of converted outputs. Thread-safe."""
+
+    def __init__(self, filename: str = MANIFEST_FILENAME):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._entries = {}  # directory -> {output name: entry}
+        self._buffers = {}  # directory -> [json lines not yet written]
+        self._buffered = 0
+
+    def _load(self, directory: str) -> Dict[str, Dict]:
+        entries = self._entries.get(directory)
+        if entries is not None:
+            return entries
+
+        entries = {}
+        manifest_path = os.path.join(directory, self.filename)
+        lines = 0
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        entries[entry["output"]] = entry
+                    except (ValueError, KeyError):
+                        # truncated last line after a crash, ignore it
+                        continue
+        except FileNotFoundError:
+            pass
+
+        # Compact manifests that accumulated many superseded lines
+        if lines > 2 * len(entries) + 100:
+            self._rewrite(manifest_path, entries)
+
+        self._entries[directory] = entries
+        return entries
+
+    @staticmethod
+    def _rewrite(manifest_path: str, entries: Dict[str, Dict]) -> None:
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries.values():
+                f.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+        os.replace(tmp_path, manifest_path)
+
+    def is_current(
+            self,
+            output_file: Union[str, Path],
+            tei_file: Union[str, Path],
+            output_format: str,
+            options: Optional[Dict] = None
+    ) -> bool:
+        """Return True if output_file exists and was produced from the current TEI content
+        with the current converter version and the same options."""
+        output_file = os.path.expanduser(str(output_file))
+        if not os.path.isfile(output_file):
+            return False
+
+        directory, name = os.path.split(output_file)
+        with self._lock:
+            entry = self._load(directory).get(name)
+        if entry is None:
+            return False
+        if entry.get("converter") != converter_id(output_format) or entry.get("options") != (options or {}):
+            return False
+
+        tei_stat = os.stat(tei_file)
+        if entry.get("size") == tei_stat.st_size and entry.get("mtime_ns") == tei_stat.st_mtime_ns:
+            return True
+
+        # The TEI file was touched, compare its content
+        if entry.get("size") != tei_stat.st_size or file_sha256(tei_file) != entry.get("sha256"):
+            return False
+        self.record(output_file, tei_file, output_format, options, sha256=entry["sha256"])
+        return True
+
+    def record(
+            self,
+            output_file: Union[str, Path],
+            tei_file: Union[str, Path],
+            output_format: str,
+            options: Optional[Dict] = None,
+            sha256: Optional[str] = None,
+            size: Optional[int] = None,
+            mtime_ns: Optional[int] = None
+    ) -> None:
+        """Record that output_file was just produced from tei_file.
+
+        The SHA-256, size and modification time of the TEI file are given when the caller has them, from
+        before the conversion read the file; they are otherwise read from the file.
+        """
+        output_file = os.path.expanduser(str(output_file))
+        if size is None or mtime_ns is None:
+            tei_stat = os.stat(tei_file)
+            size, mtime_ns = tei_stat.st_size, tei_stat.st_mtime_ns
+        entry = {
+            "output": os.path.basename(output_file),
+            "sha256": sha256 or file_sha256(tei_file),
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "converter": converter_id(output_format),
+            "options": options or {}
+        }
+        directory = os.path.dirname(output_file)
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._lock:
+            self._load(directory)[entry["output"]] = entry
+            self._buffers.setdefault(directory, []).append(line)
+            self._buffered += 1
+            if self._buffered >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        for directory, lines in self._buffers.items():
+            if lines:
+                os.makedirs(directory or ".", exist_ok=True)
+                with open(os.path.join(directory, self.filename), 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+        self._buffers = {}
+        self._buffered = 0
+
+    def save(self) -> None:
+        """Append the buffered entries to the manifest files."""
+        with self._lock:
+            self._flush_locked()
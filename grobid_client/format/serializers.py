@@ -0,0 +1,202 @@
+"""
+Serializers for the JSON documents produced by the converters.
+
+- pretty: indented JSON (default, the historical output)
+- compact: JSON without whitespace, noticeably smaller for coordinate-heavy documents
+- orjson: compact JSON encoded with orjson (optional dependency, much faster than the stdlib encoder)
+- msgpack: MessagePack binary documents, written with a `.msgpack` extension (optional dependency)
+
+All serializers work on bytes so that the writers do not need to know whether the format is textual.
+`load_document` reads any of these outputs back, choosing the decoder from the file extension;
+`iter_document_members` reads a JSON document member by member, for documents too large to load.
+Documents are written and read gzip or zstd compressed when their name ends with .gz or .zst.
+"""
+import json
+from pathlib import Path
+from typing import Any, Collection, Iterator, Tuple, Union
+
+from ..writer import atomic_write
+from .compression import compress_bytes, compression_of, open_file, strip_compression
+
+JSON_FORMATS = ("pretty", "compact", "orjson", "msgpack")
+DEFAULT_JSON_FORMAT = "pretty"
+
+MSGPACK_EXTENSION = ".msgpack"
+
+
+def _require(module_name: str, json_format: str):
+    try:
+        return __import__(module_name)
+    except ImportError as e:
+        raise ImportError(
+            f"The '{json_format}' JSON format requires the {module_name} package, install it with: pip install {module_name}"
+        ) from e
+
+
+class Serializer:
+    """Encode and decode converter documents in one of the JSON_FORMATS."""
+
+    def __init__(self, json_format: str = DEFAULT_JSON_FORMAT):
+        if json_format not in JSON_FORMATS:
+            raise ValueError(f"Unknown JSON format '{json_format}', must be one of {', '.join(JSON_FORMATS)}")
+        self.json_format = json_format
+        self.binary = json_format == "msgpack"
+        self.extension = MSGPACK_EXTENSION if self.binary else ".json"
+        # Optional dependencies are checked when the serializer is created, not on first write
+        if json_format == "orjson":
+            self._orjson = _require("orjson", json_format)
+        elif json_format == "msgpack":
+            self._msgpack = _require("msgpack", json_format)
+
+    @property
+    def options(self) -> dict:
+        """Conversion options recorded in the manifest, empty for the default format."""
+        return {} if self.json_format == DEFAULT_JSON_FORMAT else {"json_format": self.json_format}
+
+    def dumps(self, document: Any) -> bytes:
+        if self.json_format == "pretty":
+            return json.dumps(document, indent=2, ensure_ascii=False).encode("utf-8")
+        if self.json_format == "compact":
+            return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        if self.json_format == "orjson":
+            return self._orjson.dumps(document)
+        return self._msgpack.packb(document, use_bin_type=True)
+
+    def dumps_line(self, document: Any) -> bytes:
+        """Encode a document on a single line, for JSON Lines outputs."""
+        if self.json_format == "orjson":
+            return self._orjson.dumps(document) + b"\n"
+        if self.json_format == "msgpack":
+            raise ValueError("The msgpack format can not be used for JSON Lines outputs")
+        return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def dump(self, document: Any, path: Union[str, Path]) -> None:
+        """Write a document atomically (temporary file renamed over path), compressed if path ends in .gz/.zst."""
+        atomic_write(path, compress_bytes(self.dumps(document), compression_of(path)))
+
+    def __repr__(self):
+        return f"Serializer({self.json_format!r})"
+
+
+def get_serializer(json_format: Union[str, Serializer, None] = None) -> Serializer:
+    """Return a serializer for a format name (None is the default format)."""
+    if isinstance(json_format, Serializer):
+        return json_format
+    return Serializer(json_format or DEFAULT_JSON_FORMAT)
+
+
+def loads_document(data: bytes, binary: bool = False) -> Any:
+    """Decode a document, with orjson when it is installed."""
+    if binary:
+        return _require("msgpack", "msgpack").unpackb(data, raw=False)
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(data.decode("utf-8"))
+    return orjson.loads(data)
+
+
+def load_document(path: Union[str, Path]) -> Any:
+    """Read a document written by any of the serializers, the format is given by the file extension."""
+    with open_file(path, "rb") as f:
+        data = f.read()
+    return loads_document(data, binary=strip_compression(path).endswith(MSGPACK_EXTENSION))
+
+
+class _StreamingDecoder:
+    """Decode the values of a JSON text stream one at a time, keeping only the undecoded text in memory."""
+
+    def __init__(self, stream, chunk_size: int = 1 << 20):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read(self, at_least: int) -> bool:
+        """Append the next chunk of the stream to the buffer, return False at the end of the stream."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(max(self._chunk_size, at_least))
+        if not chunk:
+            self._eof = True
+            return False
+        # the decoded prefix is dropped; reading at least the size of the buffer keeps the retries linear
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, '' at the end of the stream."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\n\r":
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._read(0):
+                return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            raise json.JSONDecodeError(f"Expecting one of {characters!r}", self._buffer, self._pos)
+        self._pos += 1
+        return character
+
+    def value(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._read(len(self._buffer)):
+                    raise
+                continue
+            # a number at the end of the buffer may go on in the next chunk (digits, exponent)
+            if not self._buffer[end:end + 3].strip("0123456789+-.eE") and self._read(len(self._buffer)):
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_array(decoder: _StreamingDecoder) -> Iterator[Any]:
+    decoder.expect("[")
+    if decoder.peek() == "]":
+        decoder.expect("]")
+        return
+    while True:
+        yield decoder.value()
+        if decoder.expect(",]") == "]":
+            return
+
+
+def iter_document_members(path: Union[str, Path], streamed: Collection[str] = ()) -> Iterator[Tuple[str, Any]]:
+    """Yield the (key, value) members of a JSON document one at a time, without loading the whole document.
+
+    The array value of a key in `streamed` (e.g. 'body_text') is yielded as an iterator decoding one item at a
+    time, the items not consumed before the next member are skipped. Memory use is bounded by the largest
+    member (or streamed item) instead of the document. MessagePack documents are loaded whole.
+    Raises json.JSONDecodeError if the document is not a well-formed JSON object.
+    """
+    if strip_compression(path).endswith(MSGPACK_EXTENSION):
+        yield from load_document(path).items()
+        return
+    with open_file(path, "rt", encoding="utf-8") as f:
+        decoder = _StreamingDecoder(f)
+        decoder.expect("{")
+        if decoder.peek() == "}":
+            return
+        while True:
+            key = decoder.value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting a property name", "", 0)
+            decoder.expect(":")
+            if key in streamed and decoder.peek() == "[":
+                items = _iter_array(decoder)
+                yield key, items
+                for _ in items:
+                    pass
+            else:
+                yield key, decoder.value()
+            if decoder.expect(",}") == "}":
+                return
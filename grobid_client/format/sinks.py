@@ -0,0 +1,328 @@
+"""
+Streaming output sinks for converted documents.
+
+JSONLSink writes the passages produced by TEI2LossyJSONConverter.stream_document
+to sharded JSON Lines files, one passage per line tagged with its document id,
+and the document-level metadata (biblio, figures and tables, references) to a
+separate set of shards. Passages are written as they are produced, so memory
+use per document stays bounded by the parsed TEI and not by the JSON output.
+
+Layout of the output directory:
+
+    passages-00000.jsonl    {"doc_id": ..., "id": ..., "text": ..., ...}
+    documents-00000.jsonl   {"doc_id": ..., "level": ..., "biblio": ..., "passage_count": ...}
+
+A new pair of shards is started every `max_shard_documents` documents. Shards are
+never split inside a document, and a new sink continues the shard numbering found
+in the output directory instead of overwriting existing shards. Lines are compact
+JSON, encoded with orjson when json_format="orjson".
+
+ArchiveSink packs the output files of each document (TEI, JSON, Markdown, error
+report) as members of rotating tar or zip shards instead of writing millions of
+small files:
+
+    grobid-00000.tar        (.tar.zst with zstd compression, .zip for zip shards)
+    grobid-index.jsonl      {"doc_id": ..., "name": ..., "shard": ..., "offset": ..., "length": ...}
+
+The index gives, for each member, the byte range of its content in the shard file
+(for zstd shards, of the independent zstd frame holding its tar header and content),
+so that a document can be read back without scanning the shards.
+"""
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Union
+
+from .serializers import get_serializer
+
+PASSAGES_PREFIX = "passages"
+DOCUMENTS_PREFIX = "documents"
+
+_SHARD_PATTERN = re.compile(r"^(?:%s|%s)-(\d+)\.jsonl$" % (PASSAGES_PREFIX, DOCUMENTS_PREFIX))
+
+
+class JSONLSink:
+    """Thread-safe sink writing documents to sharded JSON Lines files."""
+
+    def __init__(self, output_dir: Union[str, Path], max_shard_documents: int = 10000, json_format: str = "compact"):
+        self._dumps_line = get_serializer(json_format).dumps_line
+        self.output_dir = Path(os.path.expanduser(str(output_dir)))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_shard_documents = max_shard_documents
+        self.documents = 0
+        self.passages = 0
+        self._lock = threading.Lock()
+        self._shard = self._next_shard_index()
+        self._shard_documents = 0
+        self._passages_file = None
+        self._documents_file = None
+
+    def _next_shard_index(self) -> int:
+        indexes = [int(m.group(1)) for m in (_SHARD_PATTERN.match(p.name) for p in self.output_dir.iterdir()) if m]
+        return max(indexes) + 1 if indexes else 0
+
+    def _open_shard(self) -> None:
+        name = f"{self._shard:05d}.jsonl"
+        self._passages_file = open(self.output_dir / f"{PASSAGES_PREFIX}-{name}", 'ab')
+        self._documents_file = open(self.output_dir / f"{DOCUMENTS_PREFIX}-{name}", 'ab')
+
+    def _close_shard(self) -> None:
+        for f in (self._passages_file, self._documents_file):
+            if f is not None:
+                f.close()
+        self._passages_file = None
+        self._documents_file = None
+
+    def write_document(self, doc_id: str, metadata: Dict, passages: Iterable[Dict]) -> int:
+        """Write the passages of one document followed by its metadata line.
+
+        metadata is the converter document without passages ('body_text' is dropped if present).
+        Returns the number of passages written.
+        """
+        with self._lock:
+            if self._passages_file is None:
+                self._open_shard()
+
+            count = 0
+            write, dumps_line = self._passages_file.write, self._dumps_line
+            for passage in passages:
+                record = {"doc_id": doc_id}
+                record.update(passage)
+                write(dumps_line(record))
+                count += 1
+
+            record = {"doc_id": doc_id}
+            record.update((key, value) for key, value in metadata.items() if key != "body_text")
+            record["passage_count"] = count
+            self._documents_file.write(self._dumps_line(record))
+
+            self.documents += 1
+            self.passages += count
+            self._shard_documents += 1
+            if self._shard_documents >= self.max_shard_documents:
+                self._close_shard()
+                self._shard += 1
+                self._shard_documents = 0
+            return count
+
+    def write_tei(self, doc_id: str, tei_file: Union[str, Path, BinaryIO], converter=None) -> Optional[int]:
+        """Convert a TEI file with TEI2LossyJSONConverter and stream it into the sink.
+
+        Returns the number of passages written, or None if the TEI file is not well-formed or empty.
+        """
+        if converter is None:
+            from .TEI2LossyJSON import TEI2LossyJSONConverter
+            converter = TEI2LossyJSONConverter()
+        result = converter.stream_document(tei_file)
+        if result is None:
+            return None
+        metadata, passages = result
+        return self.write_document(doc_id, metadata, passages)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+ARCHIVE_FORMATS = ("tar", "zip")
+ARCHIVE_COMPRESSIONS = {"tar": (None, "zstd"), "zip": (None, "deflate")}
+ARCHIVE_INDEX = "grobid-index.jsonl"
+ARCHIVE_PREFIX = "grobid"
+
+_ARCHIVE_SHARD_PATTERN = re.compile(r"^%s-(\d+)\.(?:tar|tar\.zst|zip)$" % ARCHIVE_PREFIX)
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd compressed shards require the zstandard package, install it with: pip install zstandard") from e
+    return zstandard
+
+
+class ArchiveSink:
+    """Thread-safe sink packing the output files of documents into rotating tar or zip shards.
+
+    A new shard is started when the current one holds `max_shard_documents` documents or
+    `max_shard_bytes` bytes, shards are never split inside a document. Tar shards can be
+    compressed with zstd (one frame per member, the shard stays a valid .tar.zst stream),
+    zip shards with deflate. A new sink continues the shard numbering of the output directory
+    and appends to its index. The index entries of a document are flushed as soon as it is
+    written, so its members can be read back from another process before the sink is closed.
+    """
+
+    def __init__(
+            self,
+            output_dir: Union[str, Path],
+            archive_format: str = "tar",
+            compression: Optional[str] = None,
+            max_shard_documents: int = 10000,
+            max_shard_bytes: int = 1 << 30
+    ):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format '{archive_format}', must be one of {', '.join(ARCHIVE_FORMATS)}")
+        if compression not in ARCHIVE_COMPRESSIONS[archive_format]:
+            raise ValueError(f"Compression '{compression}' is not supported for {archive_format} shards")
+        self.archive_format = archive_format
+        self.compression = compression
+        self._compressor = _zstandard().ZstdCompressor() if compression == "zstd" else None
+        self.output_dir = Path(os.path.expanduser(str(output_dir)))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_shard_documents = max_shard_documents
+        self.max_shard_bytes = max_shard_bytes
+        self.documents = 0
+        self._lock = threading.Lock()
+        self._names = set()
+        self._index = None  # (doc_id, name) -> entry, loaded on first read
+        self._load_names()
+        self._shard = self._next_shard_index()
+        self._shard_file = None
+        self._shard_name = None
+        self._shard_documents = 0
+        self._zip = None
+        self._index_file = open(self.output_dir / ARCHIVE_INDEX, 'ab')
+
+    def _load_names(self) -> None:
+        self._names.update(entry["name"] for entry in iter_archive_index(self.output_dir))
+
+    def _next_shard_index(self) -> int:
+        indexes = [int(m.group(1)) for m in (_ARCHIVE_SHARD_PATTERN.match(p.name) for p in self.output_dir.iterdir()) if m]
+        return max(indexes) + 1 if indexes else 0
+
+    def _shard_extension(self) -> str:
+        if self.archive_format == "zip":
+            return ".zip"
+        return ".tar.zst" if self.compression == "zstd" else ".tar"
+
+    def _open_shard(self) -> None:
+        self._shard_name = f"{ARCHIVE_PREFIX}-{self._shard:05d}{self._shard_extension()}"
+        self._shard_file = open(self.output_dir / self._shard_name, 'wb')
+        if self.archive_format == "zip":
+            compression = zipfile.ZIP_DEFLATED if self.compression == "deflate" else zipfile.ZIP_STORED
+            self._zip = zipfile.ZipFile(self._shard_file, 'w', compression=compression)
+
+    def _close_shard(self) -> None:
+        if self._shard_file is None:
+            return
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        else:
+            # End of archive: two zero blocks
+            end = tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+            self._shard_file.write(self._compressor.compress(end) if self._compressor is not None else end)
+        self._shard_file.close()
+        self._shard_file = None
+        self._shard_documents = 0
+        self._shard += 1
+
+    def _write_member(self, name: str, data: bytes):
+        """Append a member to the current shard and return the (offset, length) of its indexed byte range."""
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = self._zip.compression
+            self._zip.writestr(info, data)
+            # The compressed content directly precedes the end of the file, no data descriptor on seekable files
+            return self._shard_file.tell() - info.compress_size, info.compress_size
+
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        header = info.tobuf(format=tarfile.PAX_FORMAT, encoding="utf-8", errors="surrogateescape")
+        padding = -len(data) % tarfile.BLOCKSIZE
+        offset = self._shard_file.tell()
+        if self._compressor is not None:
+            frame = self._compressor.compress(header + data + tarfile.NUL * padding)
+            self._shard_file.write(frame)
+            return offset, len(frame)
+        self._shard_file.write(header)
+        self._shard_file.write(data)
+        self._shard_file.write(tarfile.NUL * padding)
+        return offset + len(header), len(data)
+
+    def write_document(self, doc_id: str, members: Dict[str, bytes]) -> None:
+        """Write the output files of one document, a mapping of member names to contents."""
+        with self._lock:
+            if self._shard_file is None:
+                self._open_shard()
+            entries = []
+            for name, data in members.items():
+                offset, length = self._write_member(name, data)
+                entry = {"doc_id": doc_id, "name": name, "shard": self._shard_name, "offset": offset, "length": length}
+                if self.compression is not None:
+                    entry["compression"] = self.compression
+                entries.append(entry)
+            # The members are in the shard file before their index entries are visible to other readers
+            self._shard_file.flush()
+            for entry in entries:
+                self._index_file.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+                if self._index is not None:
+                    self._index[(doc_id, entry["name"])] = entry
+                self._names.add(entry["name"])
+            self._index_file.flush()
+            self.documents += 1
+            self._shard_documents += 1
+            if self._shard_documents >= self.max_shard_documents or self._shard_file.tell() >= self.max_shard_bytes:
+                self._close_shard()
+
+    def __contains__(self, name: str) -> bool:
+        """Return True if a member with this name was written to the shards of the output directory."""
+        return name in self._names
+
+    def read_member(self, doc_id: str, name: str) -> bytes:
+        """Read back a member of a document, with the index. Raises KeyError for unknown members."""
+        with self._lock:
+            if self._index is None:
+                self._index = {(entry["doc_id"], entry["name"]): entry for entry in iter_archive_index(self.output_dir)}
+            entry = self._index[(doc_id, name)]
+        return read_archive_member(self.output_dir, entry)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_shard()
+            self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_archive_index(output_dir: Union[str, Path]) -> Iterable[Dict]:
+    """Yield the index entries of the archive shards of an output directory."""
+    index_path = Path(output_dir) / ARCHIVE_INDEX
+    if not index_path.is_file():
+        return
+    with open(index_path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_archive_member(output_dir: Union[str, Path], entry: Dict) -> bytes:
+    """Read the content of an indexed member from its shard, without scanning the shard."""
+    with open(Path(output_dir) / entry["shard"], 'rb') as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["length"])
+    compression = entry.get("compression")
+    if compression == "zstd":
+        frame = _zstandard().ZstdDecompressor().decompress(data)
+        with tarfile.open(fileobj=io.BytesIO(frame), mode="r:") as archive:
+            return archive.extractfile(archive.next()).read()
+    if compression == "deflate":
+        return zlib.decompress(data, -15)
+    return data
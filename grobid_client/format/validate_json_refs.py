@@ -2,34 +2,107 @@
 """
 Script to validate reference offsets in JSON files generated from TEI documents.
 
-This script processes a directory of JSON files and validates that:
+This script processes a directory tree of JSON files (or MessagePack `.msgpack` files written with
+--json-format msgpack) and validates that:
 1. All references have valid offset_start and offset_end values
 2. The text at the specified offsets matches the reference text
 3. Offsets are within bounds of the parent text
 4. References have the expected structure and types
 
+A file is counted as invalid when it can not be read or when any of its references is invalid.
+
+Large output trees are validated with bounded memory: the files are discovered lazily, documents
+larger than --stream-threshold are decoded one passage at a time, --workers validates files in a
+process pool, and --report streams one JSON line per file while only the aggregates (and the first
+errors) are kept in memory.
+
 Usage:
-    python validate_json_refs.py <directory_path> [--verbose] [--output report.json]
+    python -m grobid_client.format.validate_json_refs <directory_path> [--verbose] [--output report.json]
 
 Example:
-    python validate_json_refs.py ./output --verbose --output validation_report.json
+    python -m grobid_client.format.validate_json_refs ./output --verbose --output validation_report.json
+    python -m grobid_client.format.validate_json_refs ./output --workers 16 --report validation.jsonl
 """
 
 import json
 import os
 import argparse
 import sys
-from pathlib import Path
-from typing import Dict, List, Any, Tuple, Optional
-from collections import defaultdict
+from collections.abc import Iterator as IteratorABC
+from typing import Dict, List, Any, Tuple, Optional, Iterable, Iterator
 import datetime
 
+from .compression import strip_compression
+from .serializers import MSGPACK_EXTENSION, iter_document_members, load_document
 
-class JSONReferenceValidator:
-    """Validates reference offsets in JSON files."""
+DOCUMENT_EXTENSIONS = ('.json', MSGPACK_EXTENSION)
+
+# Documents larger than this (bytes on disk) are decoded one passage at a time
+DEFAULT_STREAM_THRESHOLD = 64 * 1024 * 1024
+
+# Sections whose passages carry references, in the order they are validated
+PASSAGE_SECTIONS = ('body_text', 'annex', 'notes')
+
+# With a JSONL report, only the first errors are kept in memory
+MAX_KEPT_ERRORS = 100
+
+# Files validated by one task of the process pool
+FILES_PER_TASK = 32
+
+
+def is_document_file(name: str) -> bool:
+    """Return True for JSON and MessagePack documents, plain or compressed (.gz, .zst)."""
+    return strip_compression(name).endswith(DOCUMENT_EXTENSIONS)
 
-    def __init__(self, verbose: bool = False):
+
+def iter_document_files(directory_path: str, recursive: bool = True) -> Iterator[str]:
+    """Lazily yield the JSON and MessagePack documents of a directory, of its whole tree when recursive."""
+    if not recursive:
+        with os.scandir(directory_path) as entries:
+            for entry in entries:
+                if entry.is_file() and is_document_file(entry.name):
+                    yield entry.path
+        return
+    for dirpath, dirnames, filenames in os.walk(directory_path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if is_document_file(filename):
+                yield os.path.join(dirpath, filename)
+
+
+def iter_report(report_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the file results of a JSONL report written by JSONReferenceValidator."""
+    with open(report_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _validate_files_task(file_paths: List[str], stream_threshold: int) -> List[Dict[str, Any]]:
+    """Validate files in a worker process, returning their results. Module-level so that it can be pickled."""
+    validator = JSONReferenceValidator(stream_threshold=stream_threshold)
+    return [validator.validate_file(file_path) for file_path in file_paths]
+
+
+class JSONReferenceValidator:
+    """Validates reference offsets in JSON files.
+
+    Without report_path, the details of every file are kept in results['file_details']. With report_path,
+    they are written to a JSON Lines report as the files are validated, and only the aggregates and the first
+    MAX_KEPT_ERRORS errors stay in memory. workers > 1 validates the files in a process pool.
+    """
+
+    def __init__(
+            self,
+            verbose: bool = False,
+            workers: int = 1,
+            report_path: Optional[str] = None,
+            stream_threshold: int = DEFAULT_STREAM_THRESHOLD
+    ):
         self.verbose = verbose
+        self.workers = workers
+        self.report_path = report_path
+        self.stream_threshold = stream_threshold
         self.results = {
             'total_files': 0,
             'valid_files': 0,
@@ -37,55 +110,69 @@ class JSONReferenceValidator:
             'total_refs': 0,
             'valid_refs': 0,
             'invalid_refs': 0,
+            'error_count': 0,
             'errors': [],
             'warnings': [],
             'file_details': []
         }
+        self._report = None
 
-    def validate_directory(self, directory_path: str) -> Dict[str, Any]:
-        """Validate all JSON files in a directory or a single JSON file."""
+    def validate_directory(self, directory_path: str, recursive: bool = True) -> Dict[str, Any]:
+        """Validate all JSON (or MessagePack) files of a directory tree (top level only if not recursive) or a file."""
         # Check if it's a single file
         if os.path.isfile(directory_path):
-            if not directory_path.endswith('.json'):
+            if not is_document_file(directory_path):
                 raise ValueError(f"File must be a JSON file: {directory_path}")
-            json_files = [Path(directory_path)]
+            json_files = iter([directory_path])
         elif os.path.isdir(directory_path):
-            json_files = list(Path(directory_path).glob("*.json"))
+            json_files = iter_document_files(directory_path, recursive)
         else:
             raise ValueError(f"Path does not exist: {directory_path}")
 
-        if not json_files:
+        total_files = self.results['total_files']
+        if self.report_path:
+            self._report = open(self.report_path, 'w', encoding='utf-8')
+        try:
+            for file_result in self._iter_file_results(json_files):
+                self._record(file_result)
+        finally:
+            if self._report is not None:
+                self._report.close()
+                self._report = None
+
+        if self.results['total_files'] == total_files:
             self.results['warnings'].append(f"No JSON files found in {directory_path}")
-            return self.results
+        return self.results
 
-        self.results['total_files'] = len(json_files)
+    def _iter_file_results(self, json_files: Iterator[str]) -> Iterator[Dict[str, Any]]:
+        """Yield the result of each file, validated here or in a process pool."""
+        if self.workers <= 1:
+            for json_file in json_files:
+                yield self.validate_file(json_file)
+            return
 
-        for json_file in json_files:
-            self._validate_file(str(json_file))
+        from .batch import run_bounded
 
-        return self.results
+        def tasks():
+            chunk = []
+            for json_file in json_files:
+                chunk.append(json_file)
+                if len(chunk) == FILES_PER_TASK:
+                    yield chunk[0], (chunk, self.stream_threshold)
+                    chunk = []
+            if chunk:
+                yield chunk[0], (chunk, self.stream_threshold)
 
-    def _validate_file(self, file_path: str) -> None:
-        """Validate a single JSON file."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except json.JSONDecodeError as e:
-            error_msg = f"Invalid JSON in {file_path}: {str(e)}"
-            self.results['errors'].append(error_msg)
-            self.results['invalid_files'] += 1
-            if self.verbose:
-                print(f"❌ {error_msg}")
-            return
-        except Exception as e:
-            error_msg = f"Error reading {file_path}: {str(e)}"
-            self.results['errors'].append(error_msg)
-            self.results['invalid_files'] += 1
-            if self.verbose:
-                print(f"❌ {error_msg}")
-            return
+        def on_error(key, args, error):
+            return [self._error_result(file_path, f"Error validating {file_path}: {str(error)}")
+                    for file_path in args[0]]
+
+        for file_results in run_bounded(_validate_files_task, tasks(), self.workers, on_error=on_error):
+            yield from file_results
 
-        file_result = {
+    @staticmethod
+    def _new_file_result(file_path: str) -> Dict[str, Any]:
+        return {
             'file': file_path,
             'valid': True,
             'total_refs': 0,
@@ -95,92 +182,104 @@ class JSONReferenceValidator:
             'warnings': []
         }
 
-        # Validate different parts of the JSON structure
-        self._validate_body_text_refs(data, file_result)
-        self._validate_abstract_refs(data, file_result)
-        self._validate_other_sections(data, file_result)
+    def _error_result(self, file_path: str, error_msg: str) -> Dict[str, Any]:
+        file_result = self._new_file_result(file_path)
+        file_result['valid'] = False
+        file_result['errors'].append(error_msg)
+        return file_result
+
+    def validate_file(self, file_path: str) -> Dict[str, Any]:
+        """Validate a single JSON file and return its result, without updating the aggregates."""
+        file_result = self._new_file_result(file_path)
+        try:
+            if os.path.getsize(file_path) > self.stream_threshold:
+                self._validate_members(iter_document_members(file_path, PASSAGE_SECTIONS + ('biblio',)),
+                                       file_result)
+            else:
+                data = load_document(file_path)
+                if not isinstance(data, dict):
+                    raise ValueError("the document is not a JSON object")
+                # Validate different parts of the JSON structure
+                self._validate_body_text_refs(data, file_result)
+                self._validate_abstract_refs(data, file_result)
+                self._validate_other_sections(data, file_result)
+        except json.JSONDecodeError as e:
+            return self._error_result(file_path, f"Invalid JSON in {file_path}: {str(e)}")
+        except Exception as e:
+            return self._error_result(file_path, f"Error reading {file_path}: {str(e)}")
+
+        file_result['valid'] = not file_result['errors']
+        return file_result
 
-        # Update overall results
+    def _record(self, file_result: Dict[str, Any]) -> None:
+        """Add the result of a file to the aggregates, and to the report or the file details."""
+        self.results['total_files'] += 1
         self.results['total_refs'] += file_result['total_refs']
         self.results['valid_refs'] += file_result['valid_refs']
         self.results['invalid_refs'] += file_result['invalid_refs']
 
+        file_path = file_result['file']
         if file_result['valid']:
             self.results['valid_files'] += 1
             if self.verbose:
                 print(f"✅ {file_path}: {file_result['valid_refs']}/{file_result['total_refs']} refs valid")
         else:
             self.results['invalid_files'] += 1
-            self.results['errors'].extend(file_result['errors'])
+            self.results['error_count'] += len(file_result['errors'])
+            errors = file_result['errors']
+            if self._report is not None:
+                errors = errors[:max(0, MAX_KEPT_ERRORS - len(self.results['errors']))]
+            self.results['errors'].extend(errors)
             if self.verbose:
                 print(f"❌ {file_path}: {file_result['valid_refs']}/{file_result['total_refs']} refs valid")
 
-        self.results['file_details'].append(file_result)
-
-    def _validate_body_text_refs(self, data: Dict[str, Any], file_result: Dict[str, Any]) -> None:
-        """Validate references in body_text section."""
-        if 'body_text' not in data:
+        if self._report is not None:
+            self._report.write(json.dumps(file_result, ensure_ascii=False) + '\n')
+        else:
+            self.results['file_details'].append(file_result)
+
+    def _validate_members(self, members: Iterable[Tuple[str, Any]], file_result: Dict[str, Any]) -> None:
+        """Validate the references of a document read member by member (see serializers.iter_document_members)."""
+        for key, value in members:
+            if key in PASSAGE_SECTIONS:
+                self._validate_passages(value, key, file_result)
+            elif key == 'biblio' and isinstance(value, dict):
+                self._validate_passages(value.get('abstract'), 'biblio.abstract', file_result)
+
+    def _validate_passages(self, passages: Any, location: str, file_result: Dict[str, Any]) -> None:
+        """Validate the references of a list (or iterator) of passages having 'text' and 'refs'."""
+        if not isinstance(passages, (list, IteratorABC)):
             return
 
-        for i, paragraph in enumerate(data.get('body_text', [])):
-            if 'text' not in paragraph or 'refs' not in paragraph:
+        for i, passage in enumerate(passages):
+            if not isinstance(passage, dict) or 'text' not in passage or 'refs' not in passage:
                 continue
 
-            text = paragraph['text']
-            refs = paragraph.get('refs', [])
+            text = passage['text']
+            refs = passage.get('refs', [])
             file_result['total_refs'] += len(refs)
 
             for j, ref in enumerate(refs):
-                is_valid, error = self._validate_single_ref(text, ref, f"body_text[{i}].refs[{j}]")
+                is_valid, error = self._validate_single_ref(text, ref, f"{location}[{i}].refs[{j}]")
                 if is_valid:
                     file_result['valid_refs'] += 1
                 else:
                     file_result['invalid_refs'] += 1
                     file_result['errors'].append(error)
 
+    def _validate_body_text_refs(self, data: Dict[str, Any], file_result: Dict[str, Any]) -> None:
+        """Validate references in body_text section."""
+        self._validate_passages(data.get('body_text'), 'body_text', file_result)
+
     def _validate_abstract_refs(self, data: Dict[str, Any], file_result: Dict[str, Any]) -> None:
         """Validate references in abstract section."""
-        if 'biblio' not in data or 'abstract' not in data['biblio']:
-            return
-
-        for i, paragraph in enumerate(data['biblio']['abstract']):
-            if 'text' not in paragraph or 'refs' not in paragraph:
-                continue
-
-            text = paragraph['text']
-            refs = paragraph.get('refs', [])
-            file_result['total_refs'] += len(refs)
-
-            for j, ref in enumerate(refs):
-                is_valid, error = self._validate_single_ref(text, ref, f"biblio.abstract[{i}].refs[{j}]")
-                if is_valid:
-                    file_result['valid_refs'] += 1
-                else:
-                    file_result['invalid_refs'] += 1
-                    file_result['errors'].append(error)
+        if isinstance(data.get('biblio'), dict):
+            self._validate_passages(data['biblio'].get('abstract'), 'biblio.abstract', file_result)
 
     def _validate_other_sections(self, data: Dict[str, Any], file_result: Dict[str, Any]) -> None:
         """Validate references in other sections (annex, etc.)."""
-        # Look for other sections that might contain references
         for section_key in ['annex', 'notes']:
-            if section_key not in data:
-                continue
-
-            section = data[section_key]
-            if isinstance(section, list):
-                for i, item in enumerate(section):
-                    if isinstance(item, dict) and 'text' in item and 'refs' in item:
-                        text = item['text']
-                        refs = item.get('refs', [])
-                        file_result['total_refs'] += len(refs)
-
-                        for j, ref in enumerate(refs):
-                            is_valid, error = self._validate_single_ref(text, ref, f"{section_key}[{i}].refs[{j}]")
-                            if is_valid:
-                                file_result['valid_refs'] += 1
-                            else:
-                                file_result['invalid_refs'] += 1
-                                file_result['errors'].append(error)
+            self._validate_passages(data.get(section_key), section_key, file_result)
 
     def _validate_single_ref(self, text: str, ref: Dict[str, Any], location: str) -> Tuple[bool, Optional[str]]:
         """Validate a single reference."""
@@ -256,8 +355,11 @@ class JSONReferenceValidator:
             report_lines.append("Errors:")
             for error in self.results['errors'][:20]:  # Limit to first 20 errors
                 report_lines.append(f"  ❌ {error}")
-            if len(self.results['errors']) > 20:
-                report_lines.append(f"  ... and {len(self.results['errors']) - 20} more errors")
+            shown = min(20, len(self.results['errors']))
+            if self.results['error_count'] > shown:
+                report_lines.append(f"  ... and {self.results['error_count'] - shown} more errors")
+            if self.report_path:
+                report_lines.append(f"  All errors are in the report {self.report_path}")
             report_lines.append("")
 
         # Add file details
@@ -286,8 +388,10 @@ class JSONReferenceValidator:
                 'invalid_files': self.results['invalid_files'],
                 'total_refs': self.results['total_refs'],
                 'valid_refs': self.results['valid_refs'],
-                'invalid_refs': self.results['invalid_refs']
+                'invalid_refs': self.results['invalid_refs'],
+                'error_count': self.results['error_count']
             },
+            'report': self.report_path,
             'warnings': self.results['warnings'],
             'errors': self.results['errors'],
             'file_details': self.results['file_details']
@@ -297,14 +401,37 @@ class JSONReferenceValidator:
             json.dump(report_data, f, indent=2, ensure_ascii=False)
 
 
-def main():
+def main(argv=None):
     """Main function."""
     parser = argparse.ArgumentParser(
         description="Validate reference offsets in JSON files generated from TEI documents"
     )
     parser.add_argument(
         "directory",
-        help="Directory containing JSON files to validate"
+        help="Directory containing JSON files to validate (searched recursively)"
+    )
+    parser.add_argument(
+        "--no-recursive",
+        action="store_true",
+        help="Only validate the files at the top level of the directory"
+    )
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=1,
+        help="Number of validation processes (default: 1)"
+    )
+    parser.add_argument(
+        "--report", "-r",
+        help="JSON Lines report, one line per file, written as the files are validated; only the aggregates "
+             "are kept in memory"
+    )
+    parser.add_argument(
+        "--stream-threshold",
+        type=float,
+        default=DEFAULT_STREAM_THRESHOLD / (1024 * 1024),
+        help="Size in MB above which documents are decoded one passage at a time "
+             f"(default: {DEFAULT_STREAM_THRESHOLD // (1024 * 1024)})"
     )
     parser.add_argument(
         "--verbose", "-v",
@@ -326,11 +453,12 @@ def main():
         help="Print only list of files with errors"
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     try:
-        validator = JSONReferenceValidator(verbose=args.verbose)
-        results = validator.validate_directory(args.directory)
+        validator = JSONReferenceValidator(verbose=args.verbose, workers=args.workers, report_path=args.report,
+                                           stream_threshold=int(args.stream_threshold * 1024 * 1024))
+        results = validator.validate_directory(args.directory, recursive=not args.no_recursive)
 
         # Print basic summary
         if results['total_files'] == 0:
@@ -347,7 +475,8 @@ def main():
 
         # Print only list of files with errors if requested
         if args.list_errors:
-            error_files = [detail['file'] for detail in validator.results['file_details'] if detail['invalid_refs'] > 0]
+            details = iter_report(args.report) if args.report else validator.results['file_details']
+            error_files = [detail['file'] for detail in details if detail['invalid_refs'] > 0]
             error_files.sort()
             for file_path in error_files:
                 print(file_path)
@@ -15,6 +15,7 @@ which is not implemented for the moment.
 
 """
 import os
+import io
 import json
 import argparse
 import time
@@ -23,11 +24,51 @@ import ntpath
 import requests
 import pathlib
 import logging
-from typing import Tuple
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
 import copy
+import datetime
+import functools
+import hashlib
 
-from .format.TEI2LossyJSON import TEI2LossyJSONConverter
 from .client import ApiClient
+from .format.compression import compress_bytes, existing_variant, strip_compression, with_compression
+from .layouts import OUTPUT_LAYOUTS, DirectoryCache, layout_name
+from .metrics import ClientMetrics
+from .profiling import add_profile_arguments, profile_stage, start_profiler_from_args
+from .writer import OutputWriter, atomic_write
+from .multipart import MultipartStream, is_seekable
+
+
+class ProcessResult:
+    """Result of the processing of one input by GrobidClient.iter_process.
+
+    Attributes:
+        input_path: the processed input file
+        status: HTTP status code of the GROBID request
+        tei: the TEI XML result as UTF-8 bytes, None on error
+        json: the TEI2LossyJSON document when JSON output was requested
+        markdown: the Markdown conversion when Markdown output was requested
+        error: error message of the request or of a conversion, None on success
+        timings: duration in seconds of each stage ('request', 'json', 'markdown') and 'total'
+    """
+
+    __slots__ = ("input_path", "status", "tei", "json", "markdown", "error", "timings")
+
+    def __init__(self, input_path, status, tei=None, json=None, markdown=None, error=None, timings=None):
+        self.input_path = input_path
+        self.status = status
+        self.tei = tei
+        self.json = json
+        self.markdown = markdown
+        self.error = error
+        self.timings = timings if timings is not None else {}
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.tei is not None
+
+    def __repr__(self):
+        return f"ProcessResult(input_path={self.input_path!r}, status={self.status}, error={self.error!r})"
 
 
 class ServerUnavailableException(Exception):
@@ -100,6 +141,17 @@ class GrobidClient(ApiClient):
             'timeout': timeout
         })
 
+        # Parent directories of the output files, created once per run
+        self._output_dirs = DirectoryCache()
+        # I/O thread writing the output files during process(), files are written synchronously otherwise
+        self._output_writer = None
+        # Progress reporter of the running process() call, if enabled
+        self._progress = None
+        # Prometheus-compatible metrics, cumulated over the calls (see grobid_client.metrics)
+        self.metrics = ClientMetrics()
+        # Stage tracer of the running process() call, if enabled
+        self._tracer = None
+
         # Configure logging based on config and verbose flag
         self._configure_logging()
 
@@ -301,21 +353,99 @@ class GrobidClient(ApiClient):
             self.logger.error(error_msg)
             raise ServerUnavailableException(error_msg) from e
 
-    def _output_file_name(self, input_file, input_path, output):
+    def _output_file_name(self, input_file, input_path, output, output_names=None, output_layout="flat"):
         # Use pathlib for consistent cross-platform path handling
         input_file_path = pathlib.Path(input_file)
 
-        if output is not None:
+        output_name = output_names.get(input_file) if output_names else None
+        if output_name:
+            # Output name given by an input manifest, relative to the output directory
+            base = pathlib.Path(output) if output is not None else input_file_path.parent
+            filename = base / f"{self._named_output(output_name, output_layout)}.grobid.tei.xml"
+        elif output is not None and input_path is None:
+            # Listed inputs have no common input directory: they are mirrored on their absolute path (without its
+            # root) and sharded on it, so that inputs with the same name in different directories are kept apart
+            absolute_path = input_file_path.resolve()
+            if output_layout == "mirror":
+                from .inputs import output_name_for
+                name = output_name_for(absolute_path.as_posix())
+            else:
+                name = layout_name(input_file_path.stem, output_layout, key=str(absolute_path))
+            filename = pathlib.Path(output) / f"{name}.grobid.tei.xml"
+        elif output is not None:
             # Calculate relative path from input_path, then join with output directory
             input_path_abs = pathlib.Path(input_path).resolve()
             input_file_rel = input_file_path.resolve().relative_to(input_path_abs)
-            filename = pathlib.Path(output) / f"{input_file_rel.stem}.grobid.tei.xml"
+            name = layout_name(input_file_rel.with_suffix("").as_posix(), output_layout)
+            filename = pathlib.Path(output) / f"{name}.grobid.tei.xml"
         else:
             # Use the same directory as the input file
             filename = input_file_path.parent / f"{input_file_path.stem}.grobid.tei.xml"
 
         return str(filename)
 
+    @staticmethod
+    def _named_output(name, output_layout="flat"):
+        """Return the output name of an input named by a relative path: kept as is, or sharded."""
+        return layout_name(name, "sharded" if output_layout == "sharded" else "mirror")
+
+    @staticmethod
+    def _input_size(input_file):
+        """Return the size in bytes of an input file or of in-memory content, 0 if unknown."""
+        if isinstance(input_file, tuple):
+            content = input_file[1]
+            return len(content) if isinstance(content, (bytes, bytearray, memoryview)) else 0
+        try:
+            return os.path.getsize(input_file)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _is_eligible_input(filename, service):
+        """Return True if a file found in an input directory can be processed by the service."""
+        return filename.endswith(".pdf") or filename.endswith(".PDF") or \
+            (service == 'processCitationList' and (
+                filename.endswith(".txt") or filename.endswith(".TXT"))) or \
+            (service == 'processCitationPatentST36' and (
+                filename.endswith(".xml") or filename.endswith(".XML")))
+
+    @staticmethod
+    def _is_in_memory_input(item):
+        """Return True for inputs given by content and not by path: bytes, file-like objects, (name, content)."""
+        return isinstance(item, (bytes, bytearray, memoryview, tuple)) or hasattr(item, "read")
+
+    @staticmethod
+    def _split_in_memory_input(item, extension):
+        """Return the (name, content) of an in-memory input.
+
+        Inputs without a name are named after a digest of their content, file objects after the path they were
+        opened with: 'a/x.pdf' and 'b/x.pdf' are distinct inputs, an absolute path is kept without its root.
+        """
+        if isinstance(item, tuple):
+            name, content = item
+            return str(name), content
+        if hasattr(item, "read"):
+            name = getattr(item, "name", None)
+            if isinstance(name, (str, os.PathLike)):
+                return os.fspath(name), item
+            if not is_seekable(item):
+                item = item.read()
+            else:
+                position = item.tell()
+                digest = hashlib.sha1()
+                for chunk in iter(lambda: item.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                item.seek(position)
+                return digest.hexdigest()[:16] + extension, item
+        return hashlib.sha1(item).hexdigest()[:16] + extension, item
+
+    @staticmethod
+    def _content_output_file_name(name, output, output_layout="flat"):
+        """Return the TEI output file of an in-memory input, its name is kept relative to the output directory."""
+        from .inputs import output_name_for
+        output_name = GrobidClient._named_output(output_name_for(name), output_layout)
+        return str(pathlib.Path(output) / f"{output_name}.grobid.tei.xml")
+
     def ping(self) -> Tuple[bool, int]:
         """
         Check the Grobid service. Returns True if the service is up.
@@ -340,80 +470,147 @@ class GrobidClient(ApiClient):
             verbose=False,
             flavor=None,
             json_output=False,
-            markdown_output=False
+            markdown_output=False,
+            jsonl_output=None,
+            json_format=None,
+            stable_ids=False,
+            normalize_sections=False,
+            input_manifest=None,
+            manifest_format=None,
+            archive_output=None,
+            archive_compression=None,
+            shard_documents=10000,
+            compression=None,
+            output_layout="flat",
+            fsync_every=None,
+            fsync_interval=None,
+            progress=False,
+            metrics_port=None,
+            metrics_textfile=None,
+            trace=None,
+            chrome_trace=None
     ):
+        """Process the inputs of a directory, of a manifest or of an iterable, in batches of batch_size files.
+
+        `input_path` is a directory walked for eligible files, or an iterable of paths, (path, output name,
+        priority) tuples or InputItems. `input_manifest` is a manifest file listing the inputs ('-' for
+        stdin, see grobid_client.inputs for the formats), input_path is then ignored. Manifests and
+        iterables are consumed lazily, one batch at a time, and their inputs are not filtered by extension.
+        Within a batch, inputs with a higher priority are sent first.
+
+        With `archive_output` ('tar' or 'zip'), the results are packed into rotating shards of `shard_documents`
+        documents in the output directory, with an index of their members (see format.sinks.ArchiveSink),
+        instead of being written as separate files. `archive_compression` is 'zstd' for tar shards or 'deflate'
+        for zip shards.
+
+        With `compression` ('gzip' or 'zstd'), the TEI, JSON and Markdown files are stored compressed, with a
+        .gz or .zst extension. Existing results are found whatever their compression.
+
+        `output_layout` places the results in the output directory: 'flat' (named after the input file name),
+        'mirror' (reproducing the input tree) or 'sharded' (in hash-named subdirectories, see
+        grobid_client.layouts). Existing results are looked up in the same layout, so that a run resumed with
+        the same layout skips them.
+
+        Output files are written atomically (temporary file renamed over the final path) by an I/O thread, so
+        an interrupted run never leaves truncated results. With `fsync_every` files and/or `fsync_interval`
+        seconds, the files are also made durable by group commits (see grobid_client.writer).
+
+        With `progress`, the counts of processed, failed and skipped inputs, the rolling throughput, the
+        requests in flight and the ETA are reported on stderr while processing (see grobid_client.progress).
+
+        The metrics of the client (self.metrics) are served during the run on http://127.0.0.1:`metrics_port`/metrics
+        and/or written every 15 seconds to `metrics_textfile` for the node-exporter textfile collector.
+
+        With `trace`, the stages of each document (scan, queued, request, download, writes, conversions) are
+        timed in this JSONL file, with `chrome_trace` they are written as Chrome trace events to this file (see
+        grobid_client.tracing).
+        """
+        if output_layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"Unknown output layout '{output_layout}', must be one of {', '.join(OUTPUT_LAYOUTS)}")
         start_time = time.time()
+        self._output_dirs.clear()
+        if archive_output and output is None:
+            # Packed results are named relative to the output directory, by default the input directory
+            output = input_path if isinstance(input_path, (str, os.PathLike)) and os.path.isdir(input_path) \
+                else os.getcwd()
         batch_size_pdf = self.config["batch_size"]
-
-        # First pass: count all eligible files
-        all_input_files = []
-        for (dirpath, dirnames, filenames) in os.walk(input_path):
-            for filename in filenames:
-                if filename.endswith(".pdf") or filename.endswith(".PDF") or \
-                        (service == 'processCitationList' and (
-                                filename.endswith(".txt") or filename.endswith(".TXT"))) or \
-                        (service == 'processCitationPatentST36' and (
-                                filename.endswith(".xml") or filename.endswith(".XML"))):
-                    full_path = os.sep.join([dirpath, filename])
-                    all_input_files.append(full_path)
-
-        # Log total files found
-        total_files = len(all_input_files)
-        if total_files == 0:
-            self.logger.warning(f"No eligible files found in {input_path}")
-            return
+        from .archives import is_archive
+        from .inputs import InputItem
+
+        archive_reader = None
+        if input_manifest is None and isinstance(input_path, (str, os.PathLike)) and is_archive(input_path) \
+                and os.path.isfile(input_path):
+            # Archive members are read by a producer thread and sent from memory, the output names are the member
+            # paths and the results go next to the archive by default
+            from .archives import ArchiveReader
+            from .inputs import output_name_for
+            archive_reader = ArchiveReader(input_path, accept=lambda name: self._is_eligible_input(name, service),
+                                           max_buffered=2 * batch_size_pdf)
+            input_items = (InputItem(name, output_name_for(name), content=content) for name, content in archive_reader)
+            if output is None:
+                output = os.path.dirname(os.path.abspath(input_path))
+            input_path = None
+            total_files = None
+        elif input_manifest is not None or not isinstance(input_path, (str, os.PathLike)):
+            # Listed inputs are consumed lazily, their number is only known at the end
+            from .inputs import iter_input_items, iter_manifest
+            if input_manifest is not None:
+                input_items = iter_manifest(input_manifest, manifest_format)
+            else:
+                input_items = iter_input_items(input_path)
+            input_path = None
+            total_files = None
+        else:
+            # First pass: count all eligible files
+            all_input_files = []
+            for (dirpath, dirnames, filenames) in os.walk(input_path):
+                for filename in filenames:
+                    if self._is_eligible_input(filename, service):
+                        full_path = os.sep.join([dirpath, filename])
+                        all_input_files.append(full_path)
+
+            # Log total files found
+            total_files = len(all_input_files)
+            if total_files == 0:
+                self.logger.warning(f"No eligible files found in {input_path}")
+                return
+
+            print(f"Found {total_files} file(s) to process")
+            input_items = (InputItem(input_file) for input_file in all_input_files)
 
         # Counters for processing statistics (initialize before early return)
         processed_files_count = 0
         errors_files_count = 0
         skipped_files_count = 0
+        listed_files_count = 0
 
-        print(f"Found {total_files} file(s) to process")
-        input_files = []
-
-        for input_file in all_input_files:
-            # Extract just the filename for verbose logging
-            filename = os.path.basename(input_file)
+        batch = []
 
-            if verbose:
-                try:
-                    self.logger.info(f"Found file: {filename}")
-                except UnicodeEncodeError:
-                    # may happen on linux see https://stackoverflow.com/questions/27366479/python-3-os-walk-file-paths-unicodeencodeerror-utf-8-codec-cant-encode-s
-                    self.logger.warning(f"Could not log filename due to encoding issues")
-
-            input_files.append(input_file)
+        # Options of the TEI2LossyJSON converter for the JSON and JSONL outputs
+        converter_options = {"stable_ids": stable_ids, "normalize_sections": normalize_sections}
 
-            if len(input_files) == batch_size_pdf:
-                batch_processed, batch_errors, batch_skipped = self.process_batch(
-                    service,
-                    input_files,
-                    input_path,
-                    output,
-                    n,
-                    generateIDs,
-                    consolidate_header,
-                    consolidate_citations,
-                    include_raw_citations,
-                    include_raw_affiliations,
-                    tei_coordinates,
-                    segment_sentences,
-                    force,
-                    verbose,
-                    flavor,
-                    json_output,
-                    markdown_output
-                )
-                processed_files_count += batch_processed
-                errors_files_count += batch_errors
-                skipped_files_count += batch_skipped
-                input_files = []
+        # Passages of all the documents are streamed into sharded JSONL files
+        jsonl_sink = None
+        if jsonl_output:
+            from .format.sinks import JSONLSink
+            jsonl_sink = JSONLSink(jsonl_output, json_format="orjson" if json_format == "orjson" else "compact")
 
-        # last batch
-        if len(input_files) > 0:
-            batch_processed, batch_errors, batch_skipped = self.process_batch(
+        # Output files packed into tar/zip shards
+        output_sink = None
+        if archive_output:
+            from .format.sinks import ArchiveSink
+            output_sink = ArchiveSink(output, archive_output, archive_compression, max_shard_documents=shard_documents)
+        else:
+            self._output_writer = OutputWriter(fsync_every, fsync_interval, max_pending=4 * batch_size_pdf,
+                                               logger=self.logger, on_write=self._record_write)
+
+        def run_batch(batch):
+            # Higher priorities first, the input order is kept otherwise
+            batch.sort(key=lambda item: -item.priority)
+            output_names = {item.path: item.output for item in batch if item.output}
+            return self.process_batch(
                 service,
-                input_files,
+                [item.path if item.content is None else (item.path, item.content) for item in batch],
                 input_path,
                 output,
                 n,
@@ -428,11 +625,85 @@ class GrobidClient(ApiClient):
                 verbose,
                 flavor,
                 json_output,
-                markdown_output
+                markdown_output,
+                jsonl_sink=jsonl_sink,
+                json_format=json_format,
+                converter_options=converter_options,
+                output_names=output_names or None,
+                output_sink=output_sink,
+                compression=compression,
+                output_layout=output_layout
             )
-            processed_files_count += batch_processed
-            errors_files_count += batch_errors
-            skipped_files_count += batch_skipped
+
+        if progress:
+            from .progress import ProgressReporter
+            self._progress = ProgressReporter(total=total_files).start()
+        if trace or chrome_trace:
+            from .tracing import StageTracer
+            self._tracer = StageTracer(trace, chrome_trace)
+        metrics_exporters = None
+        if metrics_port is not None or metrics_textfile:
+            from .metrics import MetricsExporters
+            metrics_exporters = MetricsExporters(self.metrics.registry, metrics_port, metrics_textfile)
+
+        try:
+            for item in input_items:
+                listed_files_count += 1
+                # Extract just the filename for verbose logging
+                filename = os.path.basename(item.path)
+                if self._tracer is not None:
+                    self._tracer.mark(item.path, "scan")
+
+                if verbose:
+                    try:
+                        self.logger.info(f"Found file: {filename}")
+                    except UnicodeEncodeError:
+                        # may happen on linux see https://stackoverflow.com/questions/27366479/python-3-os-walk-file-paths-unicodeencodeerror-utf-8-codec-cant-encode-s
+                        self.logger.warning(f"Could not log filename due to encoding issues")
+
+                batch.append(item)
+
+                if len(batch) == batch_size_pdf:
+                    batch_processed, batch_errors, batch_skipped = run_batch(batch)
+                    processed_files_count += batch_processed
+                    errors_files_count += batch_errors
+                    skipped_files_count += batch_skipped
+                    batch = []
+
+            if self._progress is not None:
+                # all the inputs are listed, the ETA can be computed
+                self._progress.set_total(listed_files_count)
+
+            # last batch
+            if len(batch) > 0:
+                batch_processed, batch_errors, batch_skipped = run_batch(batch)
+                processed_files_count += batch_processed
+                errors_files_count += batch_errors
+                skipped_files_count += batch_skipped
+        finally:
+            if archive_reader is not None:
+                archive_reader.close()
+            if jsonl_sink is not None:
+                jsonl_sink.close()
+            if output_sink is not None:
+                output_sink.close()
+            if self._output_writer is not None:
+                self._output_writer.close()
+                self._output_writer = None
+            if self._progress is not None:
+                self._progress.stop()
+                self._progress = None
+            if metrics_exporters is not None:
+                metrics_exporters.close()
+            if self._tracer is not None:
+                self._tracer.close()
+                self._tracer = None
+
+        if total_files is None:
+            total_files = listed_files_count
+            if total_files == 0:
+                self.logger.warning("No input listed")
+                return
 
         runtime = time.time() - start_time
         docs_per_second = processed_files_count / runtime if runtime > 0 else 0
@@ -466,7 +737,14 @@ class GrobidClient(ApiClient):
             verbose=False,
             flavor=None,
             json_output=False,
-            markdown_output=False
+            markdown_output=False,
+            jsonl_sink=None,
+            json_format=None,
+            converter_options=None,
+            output_names=None,
+            output_sink=None,
+            compression=None,
+            output_layout="flat"
     ):
         batch_start_time = time.time()
         if verbose:
@@ -476,59 +754,29 @@ class GrobidClient(ApiClient):
         error_count = 0
         skipped_count = 0
 
+        manifest = None
+        if json_output or markdown_output:
+            from .format.manifest import ConversionManifest
+            manifest = ConversionManifest()
+        serializer = None
+        if json_output:
+            from .format.serializers import get_serializer
+            serializer = get_serializer(json_format)
+
         # we use ThreadPoolExecutor and not ProcessPoolExecutor because it is an I/O intensive process
         with concurrent.futures.ThreadPoolExecutor(max_workers=n) as executor:
             # with concurrent.futures.ProcessPoolExecutor(max_workers=n) as executor:
             results = []
+            input_sizes = {}
             for input_file in input_files:
+                # in-memory inputs are (name, content) tuples
+                name = input_file[0] if isinstance(input_file, tuple) else input_file
                 # check if TEI file is already produced
-                filename = self._output_file_name(input_file, input_path, output)
-                if not force and os.path.isfile(filename):
-                    self.logger.info(
-                        f"{filename} already exists, skipping... (use --force to reprocess pdf input files)")
+                filename = self._output_file_name(name, input_path, output, output_names, output_layout)
+                if not force and self._skip_existing_result(name, filename, output_sink, manifest, json_output,
+                                                            markdown_output, serializer, converter_options,
+                                                            compression):
                     skipped_count += 1
-
-                    # Check if JSON output is needed but JSON file doesn't exist
-                    if json_output:
-                        json_filename = filename.replace('.grobid.tei.xml', '.json')
-                        # Expand ~ to home directory before checking file existence
-                        json_filename_expanded = os.path.expanduser(json_filename)
-                        if not os.path.isfile(json_filename_expanded):
-                            self.logger.info(f"JSON file {json_filename} does not exist, generating JSON from existing TEI...")
-                            try:
-                                converter = TEI2LossyJSONConverter()
-                                json_data = converter.convert_tei_file(filename, stream=False)
-
-                                if json_data:
-                                    with open(json_filename_expanded, 'w', encoding='utf8') as json_file:
-                                        json.dump(json_data, json_file, indent=2, ensure_ascii=False)
-                                    self.logger.debug(f"Successfully created JSON file: {json_filename_expanded}")
-                                else:
-                                    self.logger.warning(f"Failed to convert TEI to JSON for {filename}")
-                            except Exception as e:
-                                self.logger.error(f"Failed to convert TEI to JSON for {filename}: {str(e)}")
-
-                    # Check if Markdown output is needed but Markdown file doesn't exist
-                    if markdown_output:
-                        markdown_filename = filename.replace('.grobid.tei.xml', '.md')
-                        # Expand ~ to home directory before checking file existence
-                        markdown_filename_expanded = os.path.expanduser(markdown_filename)
-                        if not os.path.isfile(markdown_filename_expanded):
-                            self.logger.info(f"Markdown file {markdown_filename} does not exist, generating Markdown from existing TEI...")
-                            try:
-                                from .format.TEI2Markdown import TEI2MarkdownConverter
-                                converter = TEI2MarkdownConverter()
-                                markdown_data = converter.convert_tei_file(filename)
-
-                                if markdown_data:
-                                    with open(markdown_filename_expanded, 'w', encoding='utf8') as markdown_file:
-                                        markdown_file.write(markdown_data)
-                                    self.logger.debug(f"Successfully created Markdown file: {markdown_filename_expanded}")
-                                else:
-                                    self.logger.warning(f"Failed to convert TEI to Markdown for {filename}")
-                            except Exception as e:
-                                self.logger.error(f"Failed to convert TEI to Markdown for {filename}: {str(e)}")
-
                     continue
 
                 selected_process = self.process_pdf
@@ -536,7 +784,9 @@ class GrobidClient(ApiClient):
                     selected_process = self.process_txt
 
                 if verbose:
-                    self.logger.info(f"Adding {input_file} to the queue")
+                    self.logger.info(f"Adding {name} to the queue")
+
+                selected_process = self._queue_input(name, input_file, selected_process, input_sizes)
 
                 r = executor.submit(
                     selected_process,
@@ -555,73 +805,26 @@ class GrobidClient(ApiClient):
 
                 results.append(r)
 
-        for r in concurrent.futures.as_completed(results):
-            input_file, status, text = r.result()
-            filename = self._output_file_name(input_file, input_path, output)
-
-            if status != 200 or text is None:
-                self.logger.error(f"Processing of {input_file} failed with error {status}: {text}")
-                error_count += 1
-                # writing error file with suffixed error code
-                try:
-                    pathlib.Path(os.path.dirname(filename)).mkdir(parents=True, exist_ok=True)
-                    error_filename = filename.replace(".grobid.tei.xml", f"_{status}.txt")
-                    with open(error_filename, 'w', encoding='utf8') as error_file:
-                        if text is not None:
-                            error_file.write(text)
-                        else:
-                            error_file.write("")
-                    self.logger.info(f"Error details written to {error_filename}")
-                except OSError as e:
-                    self.logger.error(f"Failed to write error file {filename}: {str(e)}")
-            else:
-                processed_count += 1
-                # writing TEI file
-                try:
-                    pathlib.Path(os.path.dirname(filename)).mkdir(parents=True, exist_ok=True)
-                    with open(filename, 'w', encoding='utf8') as tei_file:
-                        tei_file.write(text)
-                    self.logger.debug(f"Successfully wrote TEI file: {filename}")
-                    
-                    # Convert to JSON if requested
-                    if json_output:
-                        try:
-                            converter = TEI2LossyJSONConverter()
-                            json_data = converter.convert_tei_file(filename, stream=False)
-                            
-                            if json_data:
-                                json_filename = filename.replace('.grobid.tei.xml', '.json')
-                                # Always write JSON file when TEI is written (respects --force behavior)
-                                json_filename_expanded = os.path.expanduser(json_filename)
-                                with open(json_filename_expanded, 'w', encoding='utf8') as json_file:
-                                    json.dump(json_data, json_file, indent=2, ensure_ascii=False)
-                                self.logger.debug(f"Successfully wrote JSON file: {json_filename_expanded}")
-                            else:
-                                self.logger.warning(f"Failed to convert TEI to JSON for {filename}")
-                        except Exception as e:
-                            self.logger.error(f"Failed to convert TEI to JSON for {filename}: {str(e)}")
-                    
-                    # Convert to Markdown if requested
-                    if markdown_output:
-                        try:
-                            from .format.TEI2Markdown import TEI2MarkdownConverter
-                            converter = TEI2MarkdownConverter()
-                            markdown_data = converter.convert_tei_file(filename)
-
-                            if markdown_data is not None:
-                                markdown_filename = filename.replace('.grobid.tei.xml', '.md')
-                                # Always write Markdown file when TEI is written (respects --force behavior)
-                                markdown_filename_expanded = os.path.expanduser(markdown_filename)
-                                with open(markdown_filename_expanded, 'w', encoding='utf8') as markdown_file:
-                                    markdown_file.write(markdown_data)
-                                self.logger.debug(f"Successfully wrote Markdown file: {markdown_filename_expanded}")
-                            else:
-                                self.logger.warning(f"Failed to convert TEI to Markdown for {filename}")
-                        except Exception as e:
-                            self.logger.error(f"Failed to convert TEI to Markdown for {filename}: {str(e)}")
-                            
-                except OSError as e:
-                    self.logger.error(f"Failed to write TEI XML file {filename}: {str(e)}")
+            # The results are written as they complete, while the next requests run. as_completed releases each
+            # future once yielded, so the TEI of a batch is not kept alive until its last request completes.
+            completed = concurrent.futures.as_completed(results)
+            del results
+            for r in completed:
+                input_file, status, text = r.result()
+                filename = self._output_file_name(input_file, input_path, output, output_names, output_layout)
+                doc_id = output_names.get(input_file) if output_names else None
+                if self._complete_result(input_file, status, text, filename, input_sizes, output_sink, json_output,
+                                         markdown_output, manifest, serializer, converter_options, jsonl_sink,
+                                         input_path, doc_id, compression):
+                    processed_count += 1
+                else:
+                    error_count += 1
+
+        if manifest is not None:
+            # the manifest entries are recorded once the outputs are written
+            if self._output_writer is not None:
+                self._output_writer.flush()
+            manifest.save()
 
         # Calculate batch statistics
         batch_runtime = time.time() - batch_start_time
@@ -635,6 +838,600 @@ class GrobidClient(ApiClient):
 
         return processed_count, error_count, skipped_count
 
+    def _skip_existing_result(self, name, filename, output_sink=None, manifest=None, json_output=False,
+                              markdown_output=False, serializer=None, converter_options=None, compression=None):
+        """Return True if the TEI result of an input exists, written (plain or compressed) or packed.
+
+        The skip is recorded, and the missing or stale JSON/Markdown outputs of a written result are regenerated.
+        """
+        if output_sink is not None:
+            if f"{self._sink_doc_id(filename, output_sink)}.grobid.tei.xml" not in output_sink:
+                self.metrics.cache_lookups.inc(cache="tei", result="miss")
+                return False
+            self.logger.info(f"{filename} already packed, skipping... (use --force to reprocess input files)")
+            self._record_skip()
+            return True
+
+        # the TEI file may be stored compressed
+        tei_filename = existing_variant(filename)
+        if tei_filename is None:
+            self.metrics.cache_lookups.inc(cache="tei", result="miss")
+            return False
+        self.logger.info(f"{tei_filename} already exists, skipping... (use --force to reprocess pdf input files)")
+        self._record_skip()
+
+        # Regenerate JSON/Markdown outputs that are missing or stale (TEI or converter changed)
+        if json_output:
+            self._convert_tei_output(tei_filename, "json", manifest, only_if_stale=True, serializer=serializer,
+                                     converter_options=converter_options, compression=compression, doc=name)
+        if markdown_output:
+            self._convert_tei_output(tei_filename, "markdown", manifest, only_if_stale=True, compression=compression,
+                                     doc=name)
+        return True
+
+    def _queue_input(self, name, input_file, selected_process, input_sizes):
+        """Record an input submitted for processing in the progress and the trace, return the function to call."""
+        if self._progress is not None:
+            input_sizes[name] = self._input_size(input_file)
+            selected_process = self._progress.track(selected_process, self.config['grobid_server'])
+        if self._tracer is not None:
+            self._tracer.mark(name, "queued", bytes=input_sizes.get(name, self._input_size(input_file)))
+        return selected_process
+
+    def _complete_result(self, input_file, status, text, filename, input_sizes, output_sink=None, json_output=False,
+                         markdown_output=False, manifest=None, serializer=None, converter_options=None,
+                         jsonl_sink=None, input_path=None, doc_id=None, compression=None):
+        """Write or pack the result of an input and record its outcome in the metrics, the trace and the progress.
+
+        Returns True if the input was processed successfully.
+        """
+        if output_sink is not None:
+            written = self._pack_result(input_file, status, text, filename, output_sink, json_output, markdown_output,
+                                        serializer, converter_options, jsonl_sink, doc_id)
+        else:
+            written = self._write_result(input_file, status, text, filename, json_output, markdown_output, manifest,
+                                         serializer, converter_options, jsonl_sink, input_path, doc_id, compression)
+
+        succeeded = status == 200 and text is not None
+        self.metrics.documents.inc(outcome="processed" if succeeded else "failed")
+        if self._tracer is not None:
+            self._tracer.mark(input_file, "done", status=status)
+        if self._progress is not None:
+            if succeeded:
+                self._progress.add_completed(input_sizes.pop(input_file, 0))
+            else:
+                self._progress.add_failed(input_sizes.pop(input_file, 0))
+        return written
+
+    def _write_result(self, input_file, status, text, filename, json_output=False, markdown_output=False,
+                      manifest=None, serializer=None, converter_options=None, jsonl_sink=None, input_path=None,
+                      doc_id=None, compression=None):
+        """Write the TEI result of an input, or an error file, and its requested conversions.
+
+        With compression, the TEI file and the conversions are stored compressed (filename + .gz/.zst).
+        Returns True if the input was processed successfully.
+        """
+        if status != 200 or text is None:
+            self.logger.error(f"Processing of {input_file} failed with error {status}: {text}")
+            # writing error file with suffixed error code
+            try:
+                self._output_dirs.ensure_parent(filename)
+                error_filename = filename.replace(".grobid.tei.xml", f"_{status}.txt")
+                self._write_output(error_filename, (text or "").encode("utf-8"), doc=input_file)
+                self.logger.info(f"Error details written to {error_filename}")
+            except OSError as e:
+                self.logger.error(f"Failed to write error file {filename}: {str(e)}")
+        else:
+            # writing TEI file
+            try:
+                self._output_dirs.ensure_parent(filename)
+                tei_filename = with_compression(filename, compression)
+                tei_content = text.encode("utf-8")
+                on_written = None
+                if self._tracer is not None:
+                    on_written = functools.partial(self._tracer.mark, input_file, "tei_written",
+                                                   bytes=len(tei_content))
+                self._write_output(tei_filename, compress_bytes(tei_content, compression), on_written, doc=input_file)
+                self.logger.debug(f"Successfully wrote TEI file: {tei_filename}")
+
+                # Always write JSON/Markdown files when TEI is written (respects --force behavior)
+                # The conversions read the TEI from memory, the file may still be queued for writing
+                if json_output:
+                    self._convert_tei_output(tei_filename, "json", manifest, serializer=serializer,
+                                             converter_options=converter_options, compression=compression,
+                                             tei_content=tei_content, doc=input_file)
+                if markdown_output:
+                    self._convert_tei_output(tei_filename, "markdown", manifest, compression=compression,
+                                             tei_content=tei_content, doc=input_file)
+                if jsonl_sink is not None:
+                    self._stream_tei_output(tei_filename, input_file, input_path, jsonl_sink, converter_options, doc_id,
+                                            tei_content=tei_content)
+
+            except OSError as e:
+                self.logger.error(f"Failed to write TEI XML file {filename}: {str(e)}")
+
+        return status == 200 and text is not None
+
+    @staticmethod
+    def _sink_doc_id(filename, output_sink):
+        """Return the document id of a TEI output file in an archive sink: its path relative to the sink directory."""
+        relative = os.path.relpath(filename, str(output_sink.output_dir)).replace(os.sep, "/")
+        return relative[:-len(".grobid.tei.xml")] if relative.endswith(".grobid.tei.xml") else relative
+
+    def _pack_result(self, input_file, status, text, filename, output_sink, json_output=False, markdown_output=False,
+                     serializer=None, converter_options=None, jsonl_sink=None, doc_id=None):
+        """Pack the TEI result of an input, or its error report, and its requested conversions into an archive sink.
+
+        The members are named like the files that process_batch would write, relative to the sink directory.
+        Returns True if the input was processed successfully.
+        """
+        sink_id = self._sink_doc_id(filename, output_sink)
+        if status != 200 or text is None:
+            self.logger.error(f"Processing of {input_file} failed with error {status}: {text}")
+            members = {f"{sink_id}_{status}.txt": (text or "").encode('utf-8')}
+        else:
+            members = {f"{sink_id}.grobid.tei.xml": text.encode('utf-8')}
+            for output_format, requested in (("json", json_output), ("markdown", markdown_output)):
+                if not requested:
+                    continue
+                try:
+                    if output_format == "json":
+                        from .format.TEI2LossyJSON import TEI2LossyJSONConverter
+                        with profile_stage("convert_json"):
+                            converted = TEI2LossyJSONConverter(**(converter_options or {})).convert_tei_file(
+                                io.StringIO(text), stream=False)
+                        if serializer is None:
+                            from .format.serializers import get_serializer
+                            serializer = get_serializer()
+                        if converted is not None:
+                            members[f"{sink_id}{serializer.extension}"] = serializer.dumps(converted)
+                    else:
+                        from .format.TEI2Markdown import TEI2MarkdownConverter
+                        with profile_stage("convert_markdown"):
+                            converted = TEI2MarkdownConverter().convert_tei_file(io.StringIO(text))
+                        if converted is not None:
+                            members[f"{sink_id}.md"] = converted.encode('utf-8')
+                    if converted is None:
+                        self.logger.warning(f"Failed to convert TEI to {output_format} for {input_file}")
+                except Exception as e:
+                    self.logger.error(f"Failed to convert TEI to {output_format} for {input_file}: {str(e)}")
+
+        try:
+            output_sink.write_document(sink_id, members)
+        except OSError as e:
+            self.logger.error(f"Failed to pack the results of {input_file}: {str(e)}")
+            return False
+
+        if status == 200 and text is not None and jsonl_sink is not None:
+            try:
+                from .format.TEI2LossyJSON import TEI2LossyJSONConverter
+                jsonl_sink.write_tei(doc_id or sink_id, io.StringIO(text),
+                                     TEI2LossyJSONConverter(**(converter_options or {})))
+            except Exception as e:
+                self.logger.error(f"Failed to stream TEI passages for {input_file}: {str(e)}")
+        return status == 200 and text is not None
+
+    def iter_process(
+            self,
+            inputs: Union[str, Iterable],
+            service,
+            n=10,
+            generateIDs=False,
+            consolidate_header=True,
+            consolidate_citations=False,
+            include_raw_citations=False,
+            include_raw_affiliations=False,
+            tei_coordinates=False,
+            segment_sentences=False,
+            flavor=None,
+            json_output=False,
+            markdown_output=False,
+            converter_options: Optional[Dict] = None,
+            max_in_flight: Optional[int] = None,
+            callback: Optional[Callable[[ProcessResult], None]] = None
+    ) -> Iterator[ProcessResult]:
+        """Process inputs and yield a ProcessResult per input as soon as it completes, without writing files.
+
+        `inputs` is a path or an iterable of paths and in-memory inputs (bytes, file-like objects or
+        (name, content) tuples, see process_pdf); directories are walked for eligible files like in
+        process(). Inputs are consumed lazily and at most `max_in_flight` (default: 2 x n) results are
+        pending at any time, so a slow consumer does not let results pile up in memory.
+        The JSON and Markdown conversions run in the worker threads, `converter_options` are passed to
+        TEI2LossyJSONConverter. `callback`, when given, is called with each result before it is yielded.
+        """
+        max_in_flight = max_in_flight or 2 * n
+        selected_process = self.process_txt if service == 'processCitationList' else self.process_pdf
+        request_args = (
+            generateIDs,
+            consolidate_header,
+            consolidate_citations,
+            include_raw_citations,
+            include_raw_affiliations,
+            tei_coordinates,
+            segment_sentences,
+            flavor,
+            -1,
+            -1
+        )
+
+        def process_one(input_file):
+            return self._process_one(selected_process, service, input_file, request_args, json_output,
+                                     markdown_output, converter_options)
+
+        return self._iter_completed(process_one, self._iter_input_files(inputs, service), n, max_in_flight, callback)
+
+    def process_contents(
+            self,
+            service,
+            inputs: Iterable,
+            output,
+            n=10,
+            generateIDs=False,
+            consolidate_header=True,
+            consolidate_citations=False,
+            include_raw_citations=False,
+            include_raw_affiliations=False,
+            tei_coordinates=False,
+            segment_sentences=False,
+            force=True,
+            verbose=False,
+            flavor=None,
+            json_output=False,
+            markdown_output=False,
+            json_format=None,
+            converter_options: Optional[Dict] = None,
+            max_in_flight: Optional[int] = None,
+            output_layout="flat",
+            compression=None
+    ):
+        """Process in-memory inputs and write the results to the output directory, like process_batch.
+
+        `inputs` is an iterable of bytes, file-like objects or (name, content) tuples, consumed lazily with
+        at most `max_in_flight` (default: 2 x n) inputs held at any time. The result of an input named
+        'a/doc.pdf' is written to <output>/a/doc.grobid.tei.xml, inputs without name are named after a
+        digest of their content (or to <output>/ab/cd/doc.grobid.tei.xml with the 'sharded' output_layout).
+        Existing results, plain or compressed, are skipped unless force is set, and their missing or stale
+        JSON/Markdown outputs are regenerated. With compression ('gzip' or 'zstd'), the results are stored
+        compressed.
+
+        Returns the numbers of processed, failed and skipped inputs.
+        """
+        start_time = time.time()
+        processed_count = 0
+        error_count = 0
+        skipped_count = 0
+
+        manifest = None
+        if json_output or markdown_output:
+            from .format.manifest import ConversionManifest
+            manifest = ConversionManifest()
+        serializer = None
+        if json_output:
+            from .format.serializers import get_serializer
+            serializer = get_serializer(json_format)
+
+        extension = ".txt" if service == 'processCitationList' else ".pdf"
+        selected_process = self.process_txt if service == 'processCitationList' else self.process_pdf
+        request_args = (
+            generateIDs,
+            consolidate_header,
+            consolidate_citations,
+            include_raw_citations,
+            include_raw_affiliations,
+            tei_coordinates,
+            segment_sentences,
+            flavor,
+            -1,
+            -1
+        )
+
+        input_sizes = {}
+
+        def pending_inputs():
+            nonlocal skipped_count
+            for item in inputs:
+                name, content = self._split_in_memory_input(item, extension)
+                filename = self._content_output_file_name(name, output, output_layout)
+                if not force and self._skip_existing_result(name, filename, None, manifest, json_output,
+                                                            markdown_output, serializer, converter_options,
+                                                            compression):
+                    skipped_count += 1
+                    continue
+                if verbose:
+                    self.logger.info(f"Adding {name} to the queue")
+                yield self._queue_input(name, (name, content), selected_process, input_sizes), (name, content)
+
+        def process_one(queued):
+            function, item = queued
+            return function(service, item, *request_args)
+
+        for name, status, text in self._iter_completed(process_one, pending_inputs(), n, max_in_flight or 2 * n):
+            filename = self._content_output_file_name(name, output, output_layout)
+            if self._complete_result(name, status, text, filename, input_sizes, json_output=json_output,
+                                     markdown_output=markdown_output, manifest=manifest, serializer=serializer,
+                                     converter_options=converter_options, compression=compression):
+                processed_count += 1
+            else:
+                error_count += 1
+
+        if manifest is not None:
+            manifest.save()
+
+        if verbose:
+            runtime = time.time() - start_time
+            self.logger.info(f"⏱️  Runtime: {runtime:.2f} seconds")
+            self.logger.info(f"🚀 Speed: {processed_count / runtime if runtime > 0 else 0:.2f} documents/second")
+
+        return processed_count, error_count, skipped_count
+
+    def _iter_completed(self, function, items, n, max_in_flight, callback=None):
+        """Run function on each item in a thread pool and yield the results as they complete.
+
+        Items are consumed lazily: no more than max_in_flight calls are pending or unconsumed at any time.
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=n)
+        pending = set()
+
+        def wait_for_results():
+            """Wait until at least one pending request completes and return the completed results."""
+            done, not_done = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            pending.intersection_update(not_done)
+            results = [future.result() for future in done]
+            if callback is not None:
+                for result in results:
+                    callback(result)
+            return results
+
+        try:
+            for item in items:
+                pending.add(executor.submit(function, item))
+                if len(pending) >= max_in_flight:
+                    for result in wait_for_results():
+                        yield result
+
+            while pending:
+                for result in wait_for_results():
+                    yield result
+        finally:
+            # The consumer may stop early, do not start the remaining requests
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _iter_input_files(self, inputs, service):
+        """Yield the input files of iter_process: files and in-memory inputs as given, eligible files of directories."""
+        if isinstance(inputs, (str, os.PathLike)):
+            inputs = [inputs]
+        for input_path in inputs:
+            if self._is_in_memory_input(input_path):
+                yield input_path
+            elif os.path.isdir(input_path):
+                for (dirpath, dirnames, filenames) in os.walk(input_path):
+                    for filename in filenames:
+                        if self._is_eligible_input(filename, service):
+                            yield os.sep.join([dirpath, filename])
+            elif os.path.isfile(input_path):
+                yield input_path
+            else:
+                self.logger.error(f"Input path does not exist: {input_path}")
+
+    def _process_one(self, selected_process, service, input_file, request_args, json_output=False,
+                     markdown_output=False, converter_options=None) -> ProcessResult:
+        """Process one input and convert its TEI in memory, used by iter_process."""
+        start_time = time.perf_counter()
+        name, status, text = selected_process(service, input_file, *request_args)
+        result = ProcessResult(name, status)
+        result.timings["request"] = time.perf_counter() - start_time
+
+        if status != 200 or text is None:
+            result.error = text
+        else:
+            result.tei = text.encode('utf-8')
+            for output_format, requested in (("json", json_output), ("markdown", markdown_output)):
+                if not requested:
+                    continue
+                stage_start = time.perf_counter()
+                try:
+                    with profile_stage(f"convert_{output_format}"):
+                        if output_format == "json":
+                            from .format.TEI2LossyJSON import TEI2LossyJSONConverter
+                            converter = TEI2LossyJSONConverter(**(converter_options or {}))
+                            result.json = converter.convert_tei_file(io.StringIO(text), stream=False)
+                        else:
+                            from .format.TEI2Markdown import TEI2MarkdownConverter
+                            result.markdown = TEI2MarkdownConverter().convert_tei_file(io.StringIO(text))
+                except Exception as e:
+                    self.logger.error(f"Failed to convert TEI to {output_format} for {name}: {str(e)}")
+                    result.error = f"{output_format} conversion failed: {str(e)}"
+                result.timings[output_format] = time.perf_counter() - stage_start
+
+        result.timings["total"] = time.perf_counter() - start_time
+        return result
+
+    def _write_output(self, path, data, on_written=None, doc=None):
+        """Write an output file atomically, through the I/O thread of process() when it is running.
+
+        on_written is called once the file is at its final path. doc is the input the file belongs to,
+        which keys the trace of the write (the path itself when not given).
+        """
+        if self._tracer is not None:
+            on_written = self._traced_write(path if doc is None else doc, path, data, on_written)
+        if self._output_writer is not None:
+            self._output_writer.write(path, data, on_written)
+            return
+        start = time.perf_counter()
+        with profile_stage("write"):
+            atomic_write(path, data)
+        self._record_write(time.perf_counter() - start, len(data))
+        if on_written is not None:
+            on_written()
+
+    def _traced_write(self, doc, path, data, on_written=None):
+        """Wrap on_written to trace the write of an output file of doc, from its submission to its final path."""
+        tracer, start, size = self._tracer, self._tracer.now(), len(data)
+
+        def traced():
+            tracer.span(doc, "write", start, bytes=size, path=path)
+            if on_written is not None:
+                on_written()
+        return traced
+
+    def _record_write(self, seconds, size):
+        self.metrics.stage_seconds.observe(seconds, stage="write")
+        self.metrics.bytes_written.inc(size)
+
+    def _record_skip(self):
+        """Count an input skipped because its result exists."""
+        self.metrics.cache_lookups.inc(cache="tei", result="hit")
+        self.metrics.documents.inc(outcome="skipped")
+        if self._progress is not None:
+            self._progress.add_skipped()
+
+    def _post_measured(self, service, sent_bytes=0, doc=None, **kwargs):
+        """POST a request to a GROBID service and record it in the metrics, and in the trace of doc.
+
+        The request stage lasts until the response headers are received (upload and server processing),
+        the download stage until the response body is read.
+        """
+        server = self.config['grobid_server']
+        metrics = self.metrics
+        metrics.in_flight.inc(server=server)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with profile_stage("request"):
+                res, status = self.post(**kwargs)
+        finally:
+            metrics.in_flight.dec(server=server)
+            metrics.requests.inc(service=service, server=server, status=status)
+        end = time.perf_counter()
+        duration = end - start
+
+        elapsed = getattr(res, "elapsed", None)
+        request_seconds = min(duration, elapsed.total_seconds()) if isinstance(elapsed, datetime.timedelta) \
+            else duration
+        metrics.stage_seconds.observe(request_seconds, stage="request")
+        if request_seconds < duration:
+            metrics.stage_seconds.observe(duration - request_seconds, stage="download")
+        metrics.bytes_sent.inc(sent_bytes, service=service, server=server)
+        content = getattr(res, "content", None)
+        received = len(content) if isinstance(content, bytes) else 0
+        metrics.bytes_received.inc(received, service=service, server=server)
+        if self._tracer is not None and doc is not None:
+            # the first byte of the response is received with its headers
+            first_byte = start + request_seconds
+            self._tracer.span(doc, "request", start, first_byte, service=service, server=server,
+                              bytes_sent=sent_bytes)
+            self._tracer.span(doc, "download", first_byte, end, status=status, bytes_received=received)
+        if status == 503:
+            metrics.retries.inc(service=service, server=server, reason="busy")
+        return res, status
+
+    def _convert_tei_output(self, tei_filename, output_format, manifest=None, only_if_stale=False, serializer=None,
+                            converter_options=None, compression=None, tei_content=None, doc=None):
+        """Convert a TEI result file to JSON or Markdown, written next to it.
+
+        tei_content is the content of the TEI file when it was just produced, the file is then not read.
+        doc is the input the TEI file was produced from, which keys the trace of the conversion.
+
+        JSON documents are written with the given serializer (indented JSON by default), converter_options
+        are passed to TEI2LossyJSONConverter (stable_ids, normalize_sections).
+        With only_if_stale, the conversion is skipped when the output exists and the manifest shows it was
+        produced from the same TEI content with the same converter version and options.
+        """
+        options = None
+        if output_format == "json":
+            if serializer is None:
+                from .format.serializers import get_serializer
+                serializer = get_serializer()
+            from .format.batch import json_options
+            extension, label = serializer.extension, "JSON"
+            options = json_options(serializer.json_format, converter_options)
+        else:
+            extension, label = ".md", "Markdown"
+        # Expand ~ to home directory before checking file existence
+        output_filename = with_compression(
+            os.path.expanduser(strip_compression(tei_filename).replace('.grobid.tei.xml', extension)), compression)
+
+        if only_if_stale:
+            if manifest is not None and manifest.is_current(output_filename, tei_filename, output_format, options):
+                self.metrics.cache_lookups.inc(cache="conversion", result="hit")
+                self.logger.debug(f"{label} file {output_filename} is up to date")
+                return
+            self.metrics.cache_lookups.inc(cache="conversion", result="miss")
+            if os.path.isfile(output_filename):
+                self.logger.info(f"{label} file {output_filename} is outdated, regenerating {label} from existing TEI...")
+            else:
+                self.logger.info(f"{label} file {output_filename} does not exist, generating {label} from existing TEI...")
+
+        conversion_status = "error"
+        start = time.perf_counter()
+        try:
+            source = io.BytesIO(tei_content) if tei_content is not None else tei_filename
+            with profile_stage(f"convert_{output_format}"):
+                if output_format == "json":
+                    from .format.TEI2LossyJSON import TEI2LossyJSONConverter
+                    converter = TEI2LossyJSONConverter(**(converter_options or {}))
+                    converted = converter.convert_tei_file(source, stream=False)
+                else:
+                    from .format.TEI2Markdown import TEI2MarkdownConverter
+                    converted = TEI2MarkdownConverter().convert_tei_file(source)
+
+            if converted is None:
+                conversion_status = "empty"
+                self.logger.warning(f"Failed to convert TEI to {label} for {tei_filename}")
+                return
+            conversion_status = "ok"
+            self.metrics.stage_seconds.observe(time.perf_counter() - start, stage="convert")
+            if self._tracer is not None:
+                self._tracer.span(tei_filename if doc is None else doc, f"convert_{output_format}", start,
+                                  bytes=len(tei_content) if tei_content is not None else None, path=output_filename)
+            if tei_content is not None:
+                self.metrics.converted_bytes.inc(len(tei_content), format=output_format)
+
+            data = serializer.dumps(converted) if output_format == "json" else converted.encode("utf-8")
+            on_written = None
+            if manifest is not None:
+                # The digest of a TEI file just written plain is that of its content in memory, it is not read back
+                sha256 = hashlib.sha256(tei_content).hexdigest() if tei_content is not None and compression is None \
+                    else None
+                on_written = functools.partial(manifest.record, output_filename, tei_filename, output_format, options,
+                                               sha256=sha256)
+            self._write_output(output_filename, compress_bytes(data, compression), on_written, doc=doc)
+            self.logger.debug(f"Successfully wrote {label} file: {output_filename}")
+        except Exception as e:
+            self.logger.error(f"Failed to convert TEI to {label} for {tei_filename}: {str(e)}")
+        finally:
+            self.metrics.conversions.inc(format=output_format, status=conversion_status)
+
+    def _stream_tei_output(self, tei_filename, input_file, input_path, jsonl_sink, converter_options=None,
+                           doc_id=None, tei_content=None):
+        """Stream the passages of a TEI result file into the JSONL sink.
+
+        The document id, when not given (output name of a listed input), is the path of the input file
+        relative to input_path, without extension.
+        """
+        if doc_id is None:
+            relative = pathlib.Path(pathlib.Path(input_file).name)
+            if input_path is not None:
+                try:
+                    relative = pathlib.Path(input_file).resolve().relative_to(pathlib.Path(input_path).resolve())
+                except ValueError:
+                    pass
+            doc_id = relative.with_suffix("").as_posix()
+
+        try:
+            from .format.TEI2LossyJSON import TEI2LossyJSONConverter
+            source = io.BytesIO(tei_content) if tei_content is not None else tei_filename
+            with profile_stage("jsonl"):
+                count = jsonl_sink.write_tei(doc_id, source, TEI2LossyJSONConverter(**(converter_options or {})))
+            if count is None:
+                self.logger.warning(f"Failed to stream TEI passages for {tei_filename}")
+            else:
+                self.logger.debug(f"Streamed {count} passages of {doc_id} to {jsonl_sink.output_dir}")
+        except Exception as e:
+            self.logger.error(f"Failed to stream TEI passages for {tei_filename}: {str(e)}")
+
     def process_pdf(
             self,
             service,
@@ -650,18 +1447,25 @@ class GrobidClient(ApiClient):
             start=-1,
             end=-1
     ):
+        """Send a PDF to a GROBID service and return (name, status, text).
+
+        pdf_file is a path, or an in-memory input: bytes, a binary file-like object or a
+        (name, bytes or file-like) tuple. In-memory inputs are uploaded with a streamed multipart
+        body, without copying the content in memory; name is the given name, the name of the file
+        object, or a digest of the content when the input has no name.
+        """
         pdf_handle = None
+        name = pdf_file
+        body = None
         try:
-            pdf_handle = open(pdf_file, "rb")
-            
-            files = {
-                "input": (
-                    pdf_file,
-                    pdf_handle,
-                    "application/pdf",
-                    {"Expires": "0"},
-                )
-            }
+            if self._is_in_memory_input(pdf_file):
+                name, content = self._split_in_memory_input(pdf_file, ".pdf")
+                if hasattr(content, "read") and not is_seekable(content):
+                    # the content is needed again if the server is busy
+                    content = content.read()
+                pdf_file = (name, content)
+            else:
+                pdf_handle = open(pdf_file, "rb")
 
             the_url = self.get_server_url(service)
 
@@ -688,14 +1492,34 @@ class GrobidClient(ApiClient):
             if end and end > 0:
                 the_data["end"] = str(end)
 
-            res, status = self.post(
-                url=the_url, files=files, data=the_data, headers={"Accept": "text/plain"},
-                timeout=self.config['timeout']
-            )
+            if pdf_handle is None:
+                body = MultipartStream(the_data, "input", name, pdf_file[1], "application/pdf", {"Expires": "0"})
+                res, status = self._post_measured(
+                    service, len(body), name,
+                    url=the_url, data=body,
+                    headers={"Accept": "text/plain", "Accept-Encoding": "gzip", "Content-Type": body.content_type},
+                    timeout=self.config['timeout']
+                )
+            else:
+                files = {
+                    "input": (
+                        pdf_file,
+                        pdf_handle,
+                        "application/pdf",
+                        {"Expires": "0"},
+                    )
+                }
+                res, status = self._post_measured(
+                    service, self._input_size(pdf_file), name,
+                    url=the_url, files=files, data=the_data, headers={"Accept": "text/plain", "Accept-Encoding": "gzip"},
+                    timeout=self.config['timeout']
+                )
 
             if status == 503:
+                if body is not None:
+                    body.rewind()
                 return self._handle_server_busy_retry(
-                    pdf_file,
+                    name,
                     self.process_pdf,
                     service,
                     pdf_file,
@@ -711,18 +1535,19 @@ class GrobidClient(ApiClient):
                     end
                 )
 
-            return (pdf_file, status, res.text)
-        
-        except IOError as e:
-            self.logger.error(f"Failed to open PDF file {pdf_file}: {str(e)}")
-            return (pdf_file, 400, f"Failed to open file: {str(e)}")
+            return (name, status, res.text)
+
+        # requests exceptions are IOErrors, they are handled first
         except requests.exceptions.ReadTimeout as e:
-            self.logger.error(f"Request timeout for {pdf_file}: {str(e)}")
-            return (pdf_file, 408, f"Request timeout: {str(e)}")
+            self.logger.error(f"Request timeout for {name}: {str(e)}")
+            return (name, 408, f"Request timeout: {str(e)}")
         except requests.exceptions.RequestException as e:
-            return self._handle_request_error(pdf_file, e)
+            return self._handle_request_error(name, e)
+        except IOError as e:
+            self.logger.error(f"Failed to open PDF file {name}: {str(e)}")
+            return (name, 400, f"Failed to open file: {str(e)}")
         except Exception as e:
-            return self._handle_unexpected_error(pdf_file, e)
+            return self._handle_unexpected_error(name, e)
         finally:
             if pdf_handle:
                 pdf_handle.close()
@@ -745,16 +1570,31 @@ class GrobidClient(ApiClient):
             start_page=-1,
             end_page=-1
     ):
+        """Send a list of references, one per line, to a GROBID service and return (name, status, text).
+
+        txt_file is a path, or an in-memory input: bytes, a file-like object or a (name, content) tuple,
+        where content is str, bytes or a file-like object.
+        """
         # create request based on file content
+        name = txt_file
         try:
-            with open(txt_file, 'r', encoding='utf-8') as f:
-                references = [line.rstrip() for line in f]
+            if self._is_in_memory_input(txt_file):
+                name, content = self._split_in_memory_input(txt_file, ".txt")
+                if hasattr(content, "read"):
+                    content = content.read()
+                if not isinstance(content, str):
+                    content = bytes(content).decode('utf-8')
+                references = [line.rstrip() for line in io.StringIO(content)]
+                txt_file = (name, content)
+            else:
+                with open(txt_file, 'r', encoding='utf-8') as f:
+                    references = [line.rstrip() for line in f]
         except IOError as e:
-            self.logger.error(f"Failed to read text file {txt_file}: {str(e)}")
-            return (txt_file, 500, f"Failed to read file: {str(e)}")
+            self.logger.error(f"Failed to read text file {name}: {str(e)}")
+            return (name, 500, f"Failed to read file: {str(e)}")
         except UnicodeDecodeError as e:
-            self.logger.error(f"Unicode decode error reading {txt_file}: {str(e)}")
-            return (txt_file, 500, f"Unicode decode error: {str(e)}")
+            self.logger.error(f"Unicode decode error reading {name}: {str(e)}")
+            return (name, 500, f"Unicode decode error: {str(e)}")
 
         the_url = self.get_server_url(service)
 
@@ -767,13 +1607,14 @@ class GrobidClient(ApiClient):
         the_data["citations"] = references
 
         try:
-            res, status = self.post(
-                url=the_url, data=the_data, headers={"Accept": "application/xml"}
+            res, status = self._post_measured(
+                service, sum(len(reference) for reference in references), name,
+                url=the_url, data=the_data, headers={"Accept": "application/xml", "Accept-Encoding": "gzip"}
             )
 
             if status == 503:
                 return self._handle_server_busy_retry(
-                    txt_file,
+                    name,
                     self.process_txt,
                     service,
                     txt_file,
@@ -786,11 +1627,11 @@ class GrobidClient(ApiClient):
                     segment_sentences
                 )
         except requests.exceptions.RequestException as e:
-            return self._handle_request_error(txt_file, e)
+            return self._handle_request_error(name, e)
         except Exception as e:
-            return self._handle_unexpected_error(txt_file, e)
+            return self._handle_unexpected_error(name, e)
 
-        return (txt_file, status, res.text)
+        return (name, status, res.text)
 
 
 def main():
@@ -822,7 +1663,21 @@ def main():
     parser.add_argument(
         "--input",
         default=None,
-        help="path to the directory containing files to process: PDF or .txt (for processCitationList only, one reference per line), or .xml for patents in ST36"
+        help="path to the directory containing files to process: PDF or .txt (for processCitationList only, one reference per line), or .xml for patents in ST36. "
+             "A tar (optionally compressed) or zip archive of such files can be given instead of a directory, its members are read without extraction"
+    )
+    parser.add_argument(
+        "--input-manifest",
+        default=None,
+        help="file listing the input files instead of walking --input ('-' for stdin): one path per line with "
+             "optional tab-separated output name and priority, or a CSV/JSONL file with path, output and "
+             "priority fields. The list is read lazily, one batch at a time",
+    )
+    parser.add_argument(
+        "--manifest-format",
+        choices=["text", "csv", "jsonl"],
+        default=None,
+        help="format of --input-manifest, by default given by its extension (.csv, .jsonl), text otherwise",
     )
     parser.add_argument(
         "--output",
@@ -905,6 +1760,108 @@ def main():
         action="store_true",
         help="Convert TEI output to Markdown format",
     )
+    parser.add_argument(
+        "--json-format",
+        choices=["pretty", "compact", "orjson", "msgpack"],
+        default="pretty",
+        help="Serialization of the --json output: indented JSON (pretty, default), JSON without whitespace (compact), "
+             "compact JSON encoded with orjson (orjson) or MessagePack binary files with a .msgpack extension (msgpack)",
+    )
+    parser.add_argument(
+        "--stable-ids",
+        action="store_true",
+        help="Derive the passage IDs of the JSON/JSONL output from the document (GROBID xml:id or a hash of the "
+             "document hash and the element position) instead of random IDs, so that reconversions are identical",
+    )
+    parser.add_argument(
+        "--normalize-sections",
+        action="store_true",
+        help="List the section heads of the JSON/JSONL output once in a 'sections' table referenced by index from "
+             "the passages, instead of repeating them in every passage",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=["gzip", "zstd"],
+        default=None,
+        help="Store the TEI, JSON and Markdown results compressed (.gz, or .zst with the zstandard package); "
+             "existing results are recognized whatever their compression",
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Report the progress on stderr while processing: counts, rolling docs/s and MB/s over 1/5/15 minutes, "
+             "requests in flight and ETA (a progress bar on a terminal, a line per minute otherwise)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while processing",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        default=None,
+        help="Write Prometheus metrics every 15 seconds to this file (.prom) for the node-exporter textfile collector",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Record the timing of each stage of each document (scan, queued, request, download, writes, "
+             "conversions) in this JSONL file",
+    )
+    parser.add_argument(
+        "--chrome-trace",
+        default=None,
+        help="Write the stages of each document as Chrome trace events to this file "
+             "(open it in chrome://tracing or ui.perfetto.dev)",
+    )
+    parser.add_argument(
+        "--fsync-every",
+        type=int,
+        default=None,
+        help="Make the output files durable with one group fsync every N files (default: no fsync)",
+    )
+    parser.add_argument(
+        "--fsync-interval",
+        type=float,
+        default=None,
+        help="Make the output files durable with one group fsync every T seconds (default: no fsync)",
+    )
+    parser.add_argument(
+        "--output-layout",
+        choices=["flat", "mirror", "sharded"],
+        default="flat",
+        help="Layout of the results in the output directory: flat (default, named after the input file name), "
+             "mirror (reproduce the input tree, or the absolute paths of listed inputs) or sharded (two levels of hash-named subdirectories, "
+             "for millions of results)",
+    )
+    parser.add_argument(
+        "--archive-output",
+        choices=["tar", "zip"],
+        default=None,
+        help="Pack the result files (TEI, JSON, Markdown, errors) into rotating tar or zip shards in the output "
+             "directory, with a grobid-index.jsonl index of the members, instead of writing one file per output",
+    )
+    parser.add_argument(
+        "--archive-compression",
+        choices=["zstd", "deflate"],
+        default=None,
+        help="Compression of the --archive-output shards: zstd for tar shards (requires the zstandard package), "
+             "deflate for zip shards",
+    )
+    parser.add_argument(
+        "--shard-documents",
+        type=int,
+        default=10000,
+        help="Number of documents per --archive-output shard (default: 10000)",
+    )
+    parser.add_argument(
+        "--jsonl",
+        default=None,
+        help="Directory where to stream the passages of all the documents as sharded JSON Lines files "
+             "(one passage per line, document metadata in separate files)",
+    )
+    add_profile_arguments(parser)
 
     args = parser.parse_args()
 
@@ -965,6 +1922,11 @@ def main():
         logger.error(f"Missing or invalid service '{service}', must be one of {valid_services}")
         exit(1)
 
+    if input_path is None and args.input_manifest is None:
+        logger.error("Missing input, use --input or --input-manifest")
+        exit(1)
+
+    start_profiler_from_args(args, logger)
     start_time = time.time()
 
     try:
@@ -984,7 +1946,25 @@ def main():
             verbose=verbose,
             flavor=flavor,
             json_output=json_output,
-            markdown_output=markdown_output
+            markdown_output=markdown_output,
+            jsonl_output=args.jsonl,
+            json_format=args.json_format,
+            stable_ids=args.stable_ids,
+            normalize_sections=args.normalize_sections,
+            input_manifest=args.input_manifest,
+            manifest_format=args.manifest_format,
+            archive_output=args.archive_output,
+            archive_compression=args.archive_compression,
+            shard_documents=args.shard_documents,
+            compression=args.compress,
+            output_layout=args.output_layout,
+            fsync_every=args.fsync_every,
+            fsync_interval=args.fsync_interval,
+            progress=args.progress,
+            metrics_port=args.metrics_port,
+            metrics_textfile=args.metrics_textfile,
+            trace=args.trace,
+            chrome_trace=args.chrome_trace
         )
     except Exception as e:
         logger.error(f"Processing failed: {str(e)}")
@@ -0,0 +1,129 @@
+"""
+Input manifests for GrobidClient.process.
+
+Instead of walking a directory, process() can take the list of inputs from a manifest
+or from any iterable, consumed lazily in batches. Each input is an InputItem: the path
+of the file, an optional output name and an optional priority.
+
+Manifest formats, chosen with `manifest_format` or from the file extension:
+
+- text (default): one path per line, optionally followed by a tab and an output name, and
+  another tab and a priority. Empty lines and lines starting with '#' are ignored.
+- csv (.csv): a header line with a 'path' column and optional 'output' and 'priority' columns.
+- jsonl (.jsonl, .ndjson): one JSON object per line with a 'path' key and optional 'output'
+  and 'priority' keys.
+
+'-' reads the manifest from stdin; a stdin manifest whose first line is a JSON object is read as JSONL.
+
+The output name is the path of the result relative to the output directory, without
+extension ('2024/abc' gives <output>/2024/abc.grobid.tei.xml). Inputs with a higher
+priority are sent first within each batch of inputs.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+from pathlib import PurePosixPath
+from typing import IO, Iterable, Iterator, NamedTuple, Optional, Union
+
+MANIFEST_FORMATS = ("text", "csv", "jsonl")
+
+
+class InputItem(NamedTuple):
+    """An input of GrobidClient.process.
+
+    content holds the data of inputs that are not files (e.g. archive members), path is then their name.
+    """
+    path: str
+    output: Optional[str] = None
+    priority: float = 0
+    content: Optional[bytes] = None
+
+
+def output_name_for(name: str) -> str:
+    """Return the output name of an input given by a relative name: its path without extension, '.' and '..'."""
+    path = PurePosixPath(str(name).replace("\\", "/"))
+    parts = [part for part in path.parts if part not in ("/", "", ".", "..")]
+    if not parts:
+        return "document"
+    return str(PurePosixPath(*parts[:-1], PurePosixPath(parts[-1]).stem))
+
+
+def manifest_format_for(path: Union[str, os.PathLike]) -> str:
+    """Return the manifest format given by the extension of a manifest file."""
+    name = str(path).lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".jsonl") or name.endswith(".ndjson"):
+        return "jsonl"
+    return "text"
+
+
+def _item(path, output=None, priority=None) -> InputItem:
+    if not path:
+        raise ValueError("Input manifest entry without path")
+    return InputItem(str(path), str(output) if output else None, float(priority) if priority not in (None, "") else 0)
+
+
+def _iter_text(lines: Iterable[str]) -> Iterator[InputItem]:
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        yield _item(*line.split("\t")[:3])
+
+
+def _iter_csv(lines: Iterable[str]) -> Iterator[InputItem]:
+    for row in csv.DictReader(lines):
+        yield _item(row.get("path"), row.get("output"), row.get("priority"))
+
+
+def _iter_jsonl(lines: Iterable[str]) -> Iterator[InputItem]:
+    for line in lines:
+        if line.strip():
+            entry = json.loads(line)
+            yield _item(entry.get("path"), entry.get("output"), entry.get("priority"))
+
+
+_READERS = {"text": _iter_text, "csv": _iter_csv, "jsonl": _iter_jsonl}
+
+
+def iter_manifest(source: Union[str, os.PathLike, IO[str]], manifest_format: Optional[str] = None) -> Iterator[InputItem]:
+    """Lazily yield the InputItems of a manifest file, of an open text stream, or of stdin for '-'."""
+    if manifest_format is not None and manifest_format not in MANIFEST_FORMATS:
+        raise ValueError(f"Unknown manifest format '{manifest_format}', must be one of {', '.join(MANIFEST_FORMATS)}")
+
+    if isinstance(source, io.TextIOBase) or hasattr(source, "readline"):
+        stream, close = source, False
+    elif str(source) == "-":
+        stream, close = sys.stdin, False
+    else:
+        stream, close = open(source, "r", encoding="utf-8", newline=""), True
+        manifest_format = manifest_format or manifest_format_for(source)
+
+    try:
+        lines = iter(stream)
+        if manifest_format is None:
+            # Sniff the format of streams from their first line
+            first = next(lines, "")
+            manifest_format = "jsonl" if first.lstrip().startswith("{") else "text"
+            lines = itertools.chain([first], lines)
+        yield from _READERS[manifest_format](lines)
+    finally:
+        if close:
+            stream.close()
+
+
+def iter_input_items(inputs: Iterable) -> Iterator[InputItem]:
+    """Normalize an iterable of paths, (path, output[, priority]) tuples, dicts or InputItems."""
+    for entry in inputs:
+        if isinstance(entry, InputItem):
+            yield entry
+        elif isinstance(entry, (str, os.PathLike)):
+            yield InputItem(os.fspath(entry))
+        elif isinstance(entry, dict):
+            yield _item(entry.get("path"), entry.get("output"), entry.get("priority"))
+        else:
+            yield _item(*entry)
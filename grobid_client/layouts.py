@@ -0,0 +1,77 @@
+"""
+Layouts of the output directory of GrobidClient.process.
+
+The layout gives the path of each result relative to the output directory:
+
+- flat (default): results are named after the input file name, directly in the output
+  directory. Inputs with the same name in different subdirectories overwrite each other.
+- mirror: the tree of the input directory is reproduced in the output directory
+  (`in/2024/a.pdf` gives `out/2024/a.grobid.tei.xml`). Inputs listed by a manifest or an
+  iterable have no common input directory, their absolute path is reproduced instead
+  (`/data/2024/a.pdf` gives `out/data/2024/a.grobid.tei.xml`).
+- sharded: results are spread over two levels of subdirectories named after a hash of the
+  input path relative to the input directory (`out/3f/a2/a.grobid.tei.xml`), so that no
+  directory holds more than a few thousand entries, even for millions of inputs.
+
+Output names given by an input manifest, and the paths of archive members, are kept as
+relative paths in the flat and mirror layouts and sharded in the sharded layout.
+
+DirectoryCache creates the parent directories of the output files once per run instead
+of calling mkdir for every written file.
+"""
+import hashlib
+import os
+import pathlib
+import threading
+from pathlib import PurePosixPath
+from typing import Optional, Union
+
+OUTPUT_LAYOUTS = ("flat", "mirror", "sharded")
+
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+
+def shard_prefix(key: str, levels: int = SHARD_LEVELS, width: int = SHARD_WIDTH) -> str:
+    """Return the sharding directories of a key, e.g. '3f/a2'."""
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return "/".join(digest[i * width:(i + 1) * width] for i in range(levels))
+
+
+def layout_name(relative_name: str, layout: str = "flat", key: Optional[str] = None) -> str:
+    """Return the output name of an input in a layout.
+
+    `relative_name` is the path of the input relative to the input directory, without extension and
+    with '/' separators. `key` identifies the input for sharding and defaults to `relative_name`.
+    """
+    if layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"Unknown output layout '{layout}', must be one of {', '.join(OUTPUT_LAYOUTS)}")
+    name = PurePosixPath(relative_name).name
+    if layout == "flat":
+        return name
+    if layout == "sharded":
+        return f"{shard_prefix(key if key is not None else relative_name)}/{name}"
+    return relative_name
+
+
+class DirectoryCache:
+    """Create directories once: the directories created or found by a run are remembered."""
+
+    def __init__(self):
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def ensure(self, directory: Union[str, os.PathLike]) -> None:
+        directory = os.fspath(directory)
+        if directory in self._known:
+            return
+        pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._known.add(directory)
+
+    def ensure_parent(self, path: Union[str, os.PathLike]) -> None:
+        self.ensure(os.path.dirname(os.fspath(path)) or ".")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._known.clear()
@@ -0,0 +1,281 @@
+"""
+Prometheus-compatible metrics of the client and of the format converters.
+
+The metrics are kept in memory by a small registry (no dependency) and exported in the
+Prometheus text exposition format, either by a local HTTP endpoint (MetricsServer, scraped
+at http://127.0.0.1:<port>/metrics) or by a file rewritten atomically every few seconds for
+the textfile collector of node-exporter (TextfileExporter, the file name must end in .prom).
+
+GrobidClient.metrics and convert_batch record into a ClientMetrics:
+
+- grobid_client_requests_total{service,server,status}: GROBID responses by status code
+  ('error' when the request failed without response)
+- grobid_client_request_retries_total{service,server,reason}: requests retried (server busy)
+- grobid_client_in_flight_requests{server}: requests waiting for their response
+- grobid_client_stage_duration_seconds{stage}: latency histograms of the stages of a document:
+  request (upload and server processing, until the response headers), download (response body),
+  write (output file) and convert (TEI to JSON/Markdown)
+- grobid_client_bytes_sent_total / grobid_client_bytes_received_total{service,server}
+- grobid_client_bytes_written_total: output files written
+- grobid_client_documents_total{outcome}: processed, failed and skipped inputs
+- grobid_client_cache_lookups_total{cache,result}: existing TEI results (cache 'tei') and
+  up-to-date conversions (cache 'conversion') found, result 'hit' or 'miss'
+- grobid_client_conversions_total{format,status} and grobid_client_converted_bytes_total{format}:
+  conversions of TEI files and size of the converted TEI
+"""
+import abc
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {', '.join(self.labelnames) or 'none'}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def _samples(self) -> Iterable[str]:
+        """Yield the sample lines of the metric, called with the lock held."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def _samples(self):
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class ClientMetrics:
+    """The metrics recorded by GrobidClient and by the batch conversion."""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        r = self.registry
+        self.requests = r.counter("grobid_client_requests_total", "GROBID responses by status code",
+                                  ("service", "server", "status"))
+        self.retries = r.counter("grobid_client_request_retries_total", "GROBID requests retried",
+                                 ("service", "server", "reason"))
+        self.in_flight = r.gauge("grobid_client_in_flight_requests", "GROBID requests waiting for their response",
+                                 ("server",))
+        self.stage_seconds = r.histogram("grobid_client_stage_duration_seconds",
+                                         "Duration of the processing stages of a document", ("stage",))
+        self.bytes_sent = r.counter("grobid_client_bytes_sent_total", "Bytes of the inputs sent to GROBID",
+                                    ("service", "server"))
+        self.bytes_received = r.counter("grobid_client_bytes_received_total", "Bytes of the GROBID responses",
+                                        ("service", "server"))
+        self.bytes_written = r.counter("grobid_client_bytes_written_total", "Bytes of the output files written")
+        self.documents = r.counter("grobid_client_documents_total", "Inputs by outcome", ("outcome",))
+        self.cache_lookups = r.counter("grobid_client_cache_lookups_total",
+                                       "Lookups of existing results (tei) and up-to-date conversions (conversion)",
+                                       ("cache", "result"))
+        self.conversions = r.counter("grobid_client_conversions_total", "TEI conversions by status",
+                                     ("format", "status"))
+        self.converted_bytes = r.counter("grobid_client_converted_bytes_total", "Bytes of the converted TEI files",
+                                         ("format",))
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class MetricsServer:
+    """Serve the metrics of a registry over HTTP from a background thread (port 0 picks a free port)."""
+
+    def __init__(self, registry, port: int = 9464, host: str = "127.0.0.1"):
+        import http.server
+        render = registry.render
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="grobid-metrics-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+def write_textfile(registry, path: str) -> None:
+    """Write the metrics to a file atomically, as expected by the node-exporter textfile collector."""
+    from .writer import atomic_write
+    atomic_write(path, registry.render().encode("utf-8"))
+
+
+class TextfileExporter:
+    """Rewrite a metrics file every `interval` seconds from a background thread, and once more on close."""
+
+    def __init__(self, registry, path: str, interval: float = 15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        write_textfile(registry, path)
+        self._thread = threading.Thread(target=self._run, name="grobid-metrics-textfile", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                write_textfile(self.registry, self.path)
+            except OSError:
+                # the next attempt may succeed, metrics must not interrupt processing
+                pass
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        write_textfile(self.registry, self.path)
+
+
+class MetricsExporters:
+    """The exporters started for a run, closed together."""
+
+    def __init__(self, registry, port: Optional[int] = None, textfile: Optional[str] = None,
+                 interval: float = 15.0):
+        self.server = MetricsServer(registry, port) if port is not None else None
+        self.textfile = TextfileExporter(registry, textfile, interval) if textfile else None
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        if self.textfile is not None:
+            self.textfile.close()
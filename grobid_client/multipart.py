@@ -0,0 +1,119 @@
+"""
+Streamed multipart/form-data request bodies.
+
+requests builds multipart bodies in memory, copying the whole uploaded file into
+the request body. MultipartStream instead exposes the form fields, the file part
+headers, the file content and the closing boundary as one file-like object of known
+length: requests sends it with a Content-Length header and http.client reads it
+block by block, so bytes inputs are sent from a memoryview without copy and file
+objects are read as they are uploaded.
+"""
+import os
+import uuid
+from typing import BinaryIO, Dict, List, Optional, Union
+
+CRLF = b"\r\n"
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", " ").replace("\n", " ")
+
+
+class MultipartStream:
+    """File-like multipart/form-data body with a single file part."""
+
+    def __init__(
+            self,
+            fields: Dict[str, Union[str, List[str]]],
+            file_field: str,
+            filename: str,
+            content: Union[bytes, bytearray, memoryview, BinaryIO],
+            content_type: str = "application/octet-stream",
+            headers: Optional[Dict[str, str]] = None
+    ):
+        self.boundary = uuid.uuid4().hex
+        boundary = self.boundary.encode("ascii")
+
+        preamble = []
+        for name, values in fields.items():
+            for value in values if isinstance(values, (list, tuple)) else [values]:
+                preamble.append(b"--" + boundary + CRLF)
+                preamble.append(f'Content-Disposition: form-data; name="{_quote(name)}"'.encode("utf-8") + CRLF + CRLF)
+                preamble.append(str(value).encode("utf-8") + CRLF)
+        preamble.append(b"--" + boundary + CRLF)
+        preamble.append(
+            f'Content-Disposition: form-data; name="{_quote(file_field)}"; filename="{_quote(filename)}"'.encode("utf-8")
+            + CRLF + f"Content-Type: {content_type}".encode("utf-8") + CRLF
+        )
+        for header, value in (headers or {}).items():
+            preamble.append(f"{header}: {value}".encode("utf-8") + CRLF)
+        preamble.append(CRLF)
+        self._head = b"".join(preamble)
+        self._tail = CRLF + b"--" + boundary + b"--" + CRLF
+
+        self._file = None
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            self._content = memoryview(content)
+            content_length = len(self._content)
+        elif is_seekable(content):
+            self._file = content
+            self._file_start = content.tell()
+            content_length = content.seek(0, os.SEEK_END) - self._file_start
+            content.seek(self._file_start)
+        else:
+            # The length of a non-seekable stream is unknown, it has to be read first
+            self._content = memoryview(content.read())
+            content_length = len(self._content)
+
+        self._length = len(self._head) + content_length + len(self._tail)
+        self.rewind()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def rewind(self) -> None:
+        """Go back to the beginning of the body, to send it again (e.g. after a 503 response)."""
+        if self._file is not None:
+            self._file.seek(self._file_start)
+        self._segment = 0
+        self._offset = 0
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        remaining = size if size is not None and size >= 0 else self._length
+        while remaining > 0 and self._segment < 3:
+            if self._segment == 1 and self._file is not None:
+                chunk = self._file.read(remaining)
+                if not chunk:
+                    self._segment += 1
+                    continue
+            else:
+                data = (self._head, None, self._tail)[self._segment] if self._segment != 1 else self._content
+                chunk = data[self._offset:self._offset + remaining]
+                if not len(chunk):
+                    self._segment += 1
+                    self._offset = 0
+                    continue
+                self._offset += len(chunk)
+            chunks.append(bytes(chunk))
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+
+def is_seekable(stream) -> bool:
+    """Return True if the position of a file-like object can be saved and restored."""
+    try:
+        return stream.seekable()
+    except AttributeError:
+        return hasattr(stream, "seek") and hasattr(stream, "tell")
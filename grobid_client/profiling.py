@@ -0,0 +1,353 @@
+"""
+Profiling of client runs and batch conversions (--profile).
+
+Profiler wraps a run with a profiler and tracemalloc, and writes at exit:
+
+- <prefix>.prof: the cProfile statistics of all the threads (pstats format, for snakeviz,
+  `python -m pstats`, gprof2dot or flameprof), or <prefix>.folded with the sampling profiler:
+  the sampled stacks in the folded format of flamegraph.pl, inferno and speedscope
+- <prefix>.txt: the top functions of each stage and the top allocation sites of tracemalloc
+
+cProfile only profiles the thread that enables it, so a profile is enabled in every thread
+started during the run (threading.setprofile) and the statistics of the threads are merged.
+The code marks its stages with `profile_stage(name)`: request (GROBID request and response),
+convert_json / convert_markdown (TEI conversions), jsonl (passage streaming) and write (output
+files) for the client, convert for the batch conversion; the rest of the run is the run stage.
+The stages are no-ops when no profiler is running.
+
+The sampling profiler (mode 'sample') records the stacks of all the threads every `interval`
+seconds instead of every call. It is cheaper on large runs and is used instead of cProfile on
+Python 3.12+, where only one cProfile profiler can be active at a time. Its samples are wall-clock
+samples: threads waiting for a response or for work are sampled too.
+
+Conversions run in worker processes are profiled in the workers with cProfile and merged in the
+convert stage.
+"""
+import atexit
+import collections
+import contextlib
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "sample")
+
+_active: Optional["Profiler"] = None
+_no_stage = contextlib.nullcontext()
+
+
+def active_profiler() -> Optional["Profiler"]:
+    """Return the profiler running in this process, if any."""
+    if _active is not None and _active.pid == os.getpid():
+        return _active
+    return None
+
+
+def profile_stage(name: str):
+    """Return a context manager attributing the enclosed code to a stage of the running profiler."""
+    profiler = active_profiler()
+    if profiler is None:
+        return _no_stage
+    return profiler.stage(name)
+
+
+def profile_call(fn: Callable, *args) -> Tuple[Any, Dict]:
+    """Run fn(*args) under cProfile in a worker process, return its result and the raw profile statistics.
+
+    A profiler inherited from the parent process by fork is detached first.
+    """
+    import cProfile
+    global _active
+    if _active is not None and _active.pid != os.getpid():
+        sys.setprofile(None)
+        threading.setprofile(None)
+        if _active.memory:
+            import tracemalloc
+            tracemalloc.stop()
+        _active = None
+    profile = cProfile.Profile()
+    result = profile.runcall(fn, *args)
+    profile.create_stats()
+    return result, profile.stats
+
+
+class _RawStats:
+    """Raw cProfile statistics (from a worker process) in the form pstats.Stats loads."""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class Profiler:
+    """Profile the run of this process, by stage, and write the reports on stop() (or at exit)."""
+
+    def __init__(
+            self,
+            prefix: str,
+            mode: str = "cprofile",
+            top: int = 25,
+            interval: float = 0.005,
+            memory: bool = True,
+            logger: Optional[logging.Logger] = None
+    ):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode}, must be one of {', '.join(PROFILE_MODES)}")
+        self.logger = logger or logging.getLogger(__name__)
+        if mode == "cprofile" and sys.version_info >= (3, 12):
+            self.logger.warning("cProfile can not profile several threads on Python 3.12+, using the sampling profiler")
+            mode = "sample"
+        self.prefix = prefix[:-len(".prof")] if prefix.endswith(".prof") else prefix
+        self.mode = mode
+        self.top = top
+        self.interval = interval
+        self.memory = memory
+        self.pid = os.getpid()
+        self.paths: List[str] = []
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: List[Tuple[str, Any]] = []
+        self._stage_calls: Dict[str, int] = collections.Counter()
+        self._stage_seconds: Dict[str, float] = collections.Counter()
+        self._thread_stages: Dict[int, List[str]] = {}
+        self._samples: Dict[Tuple[str, ...], int] = collections.Counter()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._started_tracemalloc = False
+        self._start_time = 0.0
+        self._start_cpu = 0.0
+        self._running = False
+
+    def start(self, at_exit: bool = False) -> "Profiler":
+        """Start profiling. With at_exit, the reports are written when the interpreter exits."""
+        global _active
+        if active_profiler() is not None:
+            raise RuntimeError("a profiler is already running")
+        _active = self
+        self._running = True
+        self._start_time = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if self.memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+        if self.mode == "cprofile":
+            threading.setprofile(self._thread_bootstrap)
+            self._enter("run")
+        else:
+            self._sampler = threading.Thread(target=self._sample_loop, name="grobid-profiler", daemon=True)
+            self._sampler.start()
+        if at_exit:
+            atexit.register(self.stop)
+        return self
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Attribute the enclosed code, in the current thread, to the stage `name`."""
+        start = time.perf_counter()
+        if self.mode == "cprofile":
+            self._enter(name)
+        else:
+            self._thread_stages.setdefault(threading.get_ident(), []).append(name)
+        try:
+            yield
+        finally:
+            if self.mode == "cprofile":
+                self._exit()
+            else:
+                self._thread_stages[threading.get_ident()].pop()
+            with self._lock:
+                self._stage_calls[name] += 1
+                self._stage_seconds[name] += time.perf_counter() - start
+
+    def add_stats(self, stage: str, stats: Dict) -> None:
+        """Merge the raw cProfile statistics of a worker process (see profile_call) into a stage."""
+        with self._lock:
+            self._profiles.append((stage, _RawStats(stats)))
+
+    # cProfile mode: one profile per thread and stage, switched when a thread enters or leaves a stage
+
+    def _thread_bootstrap(self, frame, event, arg) -> None:
+        sys.setprofile(None)
+        if self._running:
+            self._enter("run")
+
+    def _enter(self, name: str) -> None:
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack, local.profiles = [], {}
+        profile = local.profiles.get(name)
+        if profile is None:
+            import cProfile
+            profile = local.profiles[name] = cProfile.Profile()
+            with self._lock:
+                self._profiles.append((name, profile))
+        if local.stack:
+            local.stack[-1].disable()
+        local.stack.append(profile)
+        profile.enable()
+
+    def _exit(self) -> None:
+        stack = self._local.stack
+        stack.pop().disable()
+        if stack:
+            stack[-1].enable()
+
+    # sampling mode
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stages = self._thread_stages.get(ident)
+                stack.append(stages[-1] if stages else "run")
+                self._samples[tuple(reversed(stack))] += 1
+
+    def stop(self) -> List[str]:
+        """Stop profiling and write the reports, return their paths."""
+        global _active
+        if not self._running:
+            return self.paths
+        self._running = False
+        if self.mode == "cprofile":
+            threading.setprofile(None)
+            stack = getattr(self._local, "stack", [])
+            while stack:
+                stack.pop().disable()
+        else:
+            self._stop.set()
+            self._sampler.join()
+        wall = time.perf_counter() - self._start_time
+        cpu = time.process_time() - self._start_cpu
+        if _active is self:
+            _active = None
+        # the allocations of the reports themselves are not part of the snapshot
+        memory = self._memory_report() if self.memory else ""
+
+        report = io.StringIO()
+        report.write(f"Profile of {' '.join(sys.argv) or 'python'} ({self.mode}): "
+                     f"{wall:.2f} s wall clock, {cpu:.2f} s CPU\n")
+        with self._lock:
+            for name in sorted(self._stage_calls):
+                report.write(f"  stage {name}: {self._stage_calls[name]} calls, "
+                             f"{self._stage_seconds[name]:.2f} s (all threads)\n")
+        if self.mode == "cprofile":
+            self._write_cprofile(report)
+        else:
+            self._write_samples(report)
+        report.write(memory)
+
+        path = f"{self.prefix}.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        self.paths.append(path)
+        for path in self.paths:
+            print(f"Profile written to {path}")
+        return self.paths
+
+    def _write_cprofile(self, report: io.StringIO) -> None:
+        import pstats
+        by_stage: Dict[str, List[Any]] = collections.defaultdict(list)
+        for name, profile in self._profiles:
+            by_stage[name].append(profile)
+
+        merged = pstats.Stats(stream=report)
+        for name in sorted(by_stage):
+            stats = pstats.Stats(*by_stage[name], stream=report)
+            merged.add(stats)
+            report.write(f"\n=== Stage {name}: top {self.top} functions by own time ===\n")
+            stats.sort_stats("tottime", "cumulative").print_stats(self.top)
+
+        path = f"{self.prefix}.prof"
+        merged.dump_stats(path)
+        self.paths.append(path)
+
+    def _write_samples(self, report: io.StringIO) -> None:
+        path = f"{self.prefix}.folded"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._samples.items()):
+                f.write(f"{';'.join(stack)} {count}\n")
+        self.paths.append(path)
+
+        own = collections.defaultdict(collections.Counter)
+        total = collections.defaultdict(collections.Counter)
+        samples = collections.Counter()
+        for stack, count in self._samples.items():
+            stage = stack[0]
+            samples[stage] += count
+            own[stage][stack[-1]] += count
+            for label in set(stack[1:]):
+                total[stage][label] += count
+        for stage in sorted(samples):
+            report.write(f"\n=== Stage {stage}: top {self.top} functions of {samples[stage]} samples "
+                         f"(every {self.interval * 1000:g} ms) ===\n")
+            report.write(f"{'own':>8} {'total':>8}  function\n")
+            for label, count in own[stage].most_common(self.top):
+                report.write(f"{count / samples[stage]:8.1%} {total[stage][label] / samples[stage]:8.1%}  {label}\n")
+
+    def _memory_report(self) -> str:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return ""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        lines = [f"\n=== Memory (tracemalloc): {current / 1e6:.1f} MB allocated at exit, "
+                 f"{peak / 1e6:.1f} MB peak; top {self.top} allocation sites ===\n"]
+        lines.extend(f"{statistic}\n" for statistic in snapshot.statistics("lineno")[:self.top])
+        return "".join(lines)
+
+
+def add_profile_arguments(parser) -> None:
+    """Add the --profile options to a CLI parser."""
+    parser.add_argument(
+        "--profile",
+        default=None,
+        metavar="PREFIX",
+        help="Profile the run and write PREFIX.prof (cProfile statistics, or PREFIX.folded stacks with "
+             "--profile-mode sample) and PREFIX.txt (top functions by stage and top allocation sites) at exit"
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=PROFILE_MODES,
+        default="cprofile",
+        help="Profiler of --profile: cprofile (every call, default) or sample (stacks sampled every 5 ms, "
+             "cheaper, used on Python 3.12+)"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=25,
+        help="Number of functions and allocation sites listed per stage in the --profile report (default: 25)"
+    )
+
+
+def start_profiler_from_args(args, logger: Optional[logging.Logger] = None) -> Optional[Profiler]:
+    """Start the profiler requested by the --profile options, its reports are written at exit."""
+    if not args.profile:
+        return None
+    return Profiler(args.profile, mode=args.profile_mode, top=args.profile_top, logger=logger).start(at_exit=True)
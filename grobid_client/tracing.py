@@ -0,0 +1,113 @@
+"""
+Per-document stage tracing for GrobidClient.process.
+
+StageTracer records when each document goes through each stage of the pipeline, to tell
+apart queueing, upload, GROBID processing, download, disk writes and conversions when the
+throughput is bad. Two kinds of records are written, one JSON object per line:
+
+- marks, instants of a document: scan (input listed), queued (submitted to the thread pool),
+  tei_written (TEI file at its final path) and done (result handled, with its status)
+- spans, stages with a duration: request (from the start of the upload to the response headers,
+  i.e. the first byte of the response), download (response body), write (output files) and
+  convert_json / convert_markdown
+
+    {"doc": "pdf/a.pdf", "stage": "request", "ts": 1760781720.51, "start": 1760781718.02,
+     "duration": 2.49, "thread": "ThreadPoolExecutor-0_3", "bytes_sent": 482133}
+
+`ts` is the end of the stage (Unix time). With `chrome_trace`, the same records are also written
+as Chrome trace events (complete and instant events, one track per thread) that can be opened
+in chrome://tracing or https://ui.perfetto.dev to see the stalls of the pipeline across threads.
+The trace file is a streamed JSON array, readable even when the run was interrupted.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, IO, Optional, Union
+
+PathType = Union[str, os.PathLike]
+
+
+class StageTracer:
+    """Write the stage marks and spans of documents to a JSONL file and/or a Chrome trace. Thread-safe."""
+
+    def __init__(self, path: Optional[PathType], chrome_trace: Optional[PathType] = None):
+        self._lock = threading.Lock()
+        self._epoch = time.time() - time.perf_counter()
+        self._origin = time.perf_counter()
+        self._file: Optional[IO[str]] = open(path, "w", encoding="utf-8") if path is not None else None
+        self._chrome: Optional[IO[str]] = None
+        self._closed = False
+        self._threads = set()
+        self.records = 0
+        if chrome_trace is not None:
+            self._chrome = open(chrome_trace, "w", encoding="utf-8")
+            self._chrome.write("[\n")
+            self._chrome_event({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "grobid_client"}})
+
+    @staticmethod
+    def now() -> float:
+        """Return the current time of the tracer clock, to pass as the start of a span."""
+        return time.perf_counter()
+
+    def mark(self, doc: str, stage: str, **fields: Any) -> None:
+        """Record that a document reached a stage now."""
+        end = time.perf_counter()
+        record = {"doc": str(doc), "stage": stage, "ts": round(self._epoch + end, 6)}
+        self._write(record, fields, None, end)
+
+    def span(self, doc: str, stage: str, start: float, end: Optional[float] = None, **fields: Any) -> None:
+        """Record a stage of a document between start and end (default: now), given by the tracer clock."""
+        end = time.perf_counter() if end is None else end
+        record = {"doc": str(doc), "stage": stage, "ts": round(self._epoch + end, 6),
+                  "start": round(self._epoch + start, 6), "duration": round(end - start, 6)}
+        self._write(record, fields, start, end)
+
+    def _write(self, record: Dict[str, Any], fields: Dict[str, Any], start: Optional[float], end: float) -> None:
+        thread = threading.current_thread()
+        record["thread"] = thread.name
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._closed:
+                return
+            if self._file is not None:
+                self._file.write(line)
+            self.records += 1
+            if self._chrome is not None:
+                self._chrome_record(record, fields, thread, start, end)
+
+    def _chrome_event(self, event: Dict[str, Any]) -> None:
+        self._chrome.write(json.dumps(event, ensure_ascii=False, default=str) + ",\n")
+
+    def _chrome_record(self, record, fields, thread, start, end) -> None:
+        pid, tid = os.getpid(), thread.ident
+        if tid not in self._threads:
+            self._threads.add(tid)
+            self._chrome_event({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread.name}})
+        event = {"name": record["stage"], "cat": "document", "pid": pid, "tid": tid,
+                 "args": dict(fields, doc=record["doc"])}
+        if start is None:
+            event.update(ph="i", s="t", ts=round((end - self._origin) * 1e6, 1))
+        else:
+            event.update(ph="X", ts=round((start - self._origin) * 1e6, 1), dur=round((end - start) * 1e6, 1))
+        self._chrome_event(event)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+            if self._chrome is not None:
+                # a last event without trailing comma closes the array
+                self._chrome.write(json.dumps({"name": "trace_end", "ph": "M", "pid": os.getpid(), "args": {}}) + "\n]\n")
+                self._chrome.close()
+                self._chrome = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
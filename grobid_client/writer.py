@@ -0,0 +1,239 @@
+"""
+Atomic writes of the output files of GrobidClient.process.
+
+Output files are never opened at their final path: the content is written to a hidden
+temporary file in the same directory (`.<name>.<pid>.<n>.tmp`) and renamed over the final
+path, so that a crash never leaves a truncated result that a later run would skip as done.
+
+OutputWriter performs the writes in a dedicated I/O thread, fed through a bounded queue,
+so that writing does not hold up the handling of the next results. With group commit
+(`fsync_every` files or `fsync_interval` seconds), the temporary files of a group are
+fsynced together and only renamed once they are durable, followed by one fsync of each
+touched directory: a power failure loses at most the last uncommitted group, at the cost
+of one fsync per file every N files instead of a synchronous fsync per document.
+"""
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple, Union
+
+from .profiling import profile_stage
+
+PathType = Union[str, os.PathLike]
+
+_counter = itertools.count()
+
+
+def _temp_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.getpid()}.{next(_counter)}.tmp")
+
+
+def _write_temp(path: str, data: bytes, fsync: bool = False) -> str:
+    temp_path = _temp_path(path)
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        _remove(temp_path)
+        raise
+    return temp_path
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _fsync_directory(directory: str) -> None:
+    # Directories can not be opened on Windows, renames are durable there without it
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: PathType, data: bytes, fsync: bool = False) -> None:
+    """Write data to path through a temporary file renamed over it, optionally fsynced."""
+    path = os.fspath(path)
+    temp_path = _write_temp(path, data, fsync)
+    try:
+        os.replace(temp_path, path)
+    except BaseException:
+        _remove(temp_path)
+        raise
+    if fsync:
+        _fsync_directory(os.path.dirname(path))
+
+
+_CLOSE = object()
+
+
+class OutputWriter:
+    """Write output files atomically in a dedicated I/O thread.
+
+    write() queues the content of a file, blocking only when `max_pending` writes are queued.
+    `on_written` is called in the I/O thread once the file is at its final path, `on_write` after each
+    file write with its duration in seconds and its size. Write errors, and errors raised by the callbacks,
+    are logged and counted in `errors`, they do not stop the writer. flush() waits for the queued writes and commits them, close() flushes
+    and stops the thread.
+
+    Without group commit the files are renamed as soon as they are written, without fsync.
+    """
+
+    def __init__(
+            self,
+            fsync_every: Optional[int] = None,
+            fsync_interval: Optional[float] = None,
+            max_pending: int = 256,
+            logger: Optional[logging.Logger] = None,
+            on_write: Optional[Callable[[float, int], None]] = None
+    ):
+        if fsync_every is not None and fsync_every < 1:
+            raise ValueError("fsync_every must be at least 1")
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.group_commit = fsync_every is not None or fsync_interval is not None
+        self.logger = logger or logging.getLogger(__name__)
+        self.on_write = on_write
+        self.files = 0
+        self.bytes = 0
+        self.commits = 0
+        self.errors = 0
+        self._pending: List[Tuple[str, str, Optional[Callable[[], None]]]] = []
+        self._last_commit = time.monotonic()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="grobid-output-writer", daemon=True)
+        self._closed = False
+        self._thread.start()
+
+    def write(self, path: PathType, data: bytes, on_written: Optional[Callable[[], None]] = None) -> None:
+        if self._closed:
+            raise ValueError("write to a closed OutputWriter")
+        self._queue.put((os.fspath(path), data, on_written))
+
+    def flush(self) -> None:
+        """Wait until the queued writes are at their final paths."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            timeout = None
+            if self._pending and self.fsync_interval is not None:
+                timeout = max(0.0, self._last_commit + self.fsync_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._commit()
+                continue
+
+            # An unexpected error fails the item, never the thread: flush() and close() would wait forever
+            try:
+                if item is _CLOSE or isinstance(item, threading.Event):
+                    try:
+                        self._commit()
+                    finally:
+                        if item is not _CLOSE:
+                            item.set()
+                else:
+                    with profile_stage("write"):
+                        self._write(*item)
+                        if self._pending and (
+                                (self.fsync_every is not None and len(self._pending) >= self.fsync_every) or
+                                (self.fsync_interval is not None and
+                                 time.monotonic() - self._last_commit >= self.fsync_interval)):
+                            self._commit()
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Output writer error: {str(e)}")
+            finally:
+                self._queue.task_done()
+            if item is _CLOSE:
+                return
+
+    def _write(self, path: str, data: bytes, on_written: Optional[Callable[[], None]]) -> None:
+        temp_path = None
+        try:
+            start = time.perf_counter()
+            temp_path = _write_temp(path, data)
+            self.bytes += len(data)
+            if self.on_write is not None:
+                self.on_write(time.perf_counter() - start, len(data))
+            if self.group_commit:
+                self._pending.append((temp_path, path, on_written))
+                return
+            os.replace(temp_path, path)
+        except Exception as e:
+            if temp_path is not None:
+                _remove(temp_path)
+            self.errors += 1
+            self.logger.error(f"Failed to write {path}: {str(e)}")
+            return
+        self.files += 1
+        self._written(path, on_written)
+
+    def _commit(self) -> None:
+        """fsync the temporary files of the group, rename them, then fsync their directories."""
+        pending, self._pending = self._pending, []
+        self._last_commit = time.monotonic()
+        if not pending:
+            return
+
+        committed = []
+        for temp_path, path, on_written in pending:
+            try:
+                fd = os.open(temp_path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                os.replace(temp_path, path)
+                committed.append((path, on_written))
+            except OSError as e:
+                self.errors += 1
+                self.logger.error(f"Failed to write {path}: {str(e)}")
+                _remove(temp_path)
+
+        for directory in {os.path.dirname(path) for path, _ in committed}:
+            _fsync_directory(directory)
+        self.commits += 1
+        self.files += len(committed)
+        for path, on_written in committed:
+            self._written(path, on_written)
+
+    def _written(self, path: str, on_written: Optional[Callable[[], None]]) -> None:
+        if on_written is None:
+            return
+        try:
+            on_written()
+        except Exception as e:
+            self.logger.error(f"Failed to record {path}: {str(e)}")
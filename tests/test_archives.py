@@ -0,0 +1,108 @@
+"""
+Unit tests for archives as input sources (grobid_client.archives).
+"""
+import io
+import os
+import tarfile
+import tempfile
+import zipfile
+from unittest.mock import Mock, patch
+
+import pytest
+
+from grobid_client.archives import ArchiveReader, is_archive, iter_archive_members
+from grobid_client.grobid_client import GrobidClient
+
+MEMBERS = {'papers/a.pdf': b'%PDF a', 'papers/2024/b.PDF': b'%PDF b', 'papers/notes.txt': b'notes'}
+
+
+def _write_tar(path, members=MEMBERS):
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+
+def _write_zip(path, members=MEMBERS):
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('papers/', '')
+        for name, content in members.items():
+            archive.writestr(name, content)
+
+
+def _is_pdf(name):
+    return name.lower().endswith('.pdf')
+
+
+class TestArchives:
+    """Test cases for archive reading."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tar_path = os.path.join(self.temp_dir.name, 'dump.tar.gz')
+        self.zip_path = os.path.join(self.temp_dir.name, 'dump.zip')
+        _write_tar(self.tar_path)
+        _write_zip(self.zip_path)
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def test_is_archive(self):
+        assert is_archive('dump.tar.gz') and is_archive('DUMP.ZIP') and is_archive('a.tgz')
+        assert not is_archive('doc.pdf')
+
+    @pytest.mark.parametrize('archive', ['tar_path', 'zip_path'])
+    def test_iter_archive_members_filtered(self, archive):
+        """Test that regular members are read with their paths, filtered on their file names."""
+        members = dict(iter_archive_members(getattr(self, archive), accept=_is_pdf))
+        assert members == {'papers/a.pdf': b'%PDF a', 'papers/2024/b.PDF': b'%PDF b'}
+
+    def test_reader_bounded_and_closed_early(self):
+        """Test that the producer reads a bounded number of members ahead and stops on close."""
+        many = os.path.join(self.temp_dir.name, 'many.tar')
+        _write_tar(many, {f'doc{i}.pdf': b'x' for i in range(50)})
+
+        reader = ArchiveReader(many, max_buffered=4)
+        iterator = iter(reader)
+        assert next(iterator) == ('doc0.pdf', b'x')
+        reader.close()
+        assert not reader._thread.is_alive()
+        assert reader.members < 50
+
+    def test_reader_raises_producer_errors(self):
+        """Test that an unreadable archive fails the iteration instead of ending it silently."""
+        broken = os.path.join(self.temp_dir.name, 'broken.zip')
+        with open(broken, 'wb') as f:
+            f.write(b'not a zip')
+        with ArchiveReader(broken) as reader:
+            with pytest.raises(zipfile.BadZipFile):
+                list(reader)
+
+    @patch('builtins.print')
+    def test_process_archive(self, mock_print):
+        """Test that process() sends the eligible members and names the results after the member paths."""
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False)
+        client.logger = Mock()
+        sent = {}
+
+        def fake_process_pdf(service, pdf_file, *args):
+            name, content = pdf_file
+            sent[name] = content
+            return name, 200, '<TEI/>'
+
+        output = os.path.join(self.temp_dir.name, 'out')
+        with patch.object(client, 'process_pdf', side_effect=fake_process_pdf):
+            client.process('processFulltextDocument', self.tar_path, output=output, n=2)
+
+        assert sent == {'papers/a.pdf': b'%PDF a', 'papers/2024/b.PDF': b'%PDF b'}
+        assert os.path.isfile(os.path.join(output, 'papers', 'a.grobid.tei.xml'))
+        assert os.path.isfile(os.path.join(output, 'papers', '2024', 'b.grobid.tei.xml'))
+
+        # Existing results are skipped without sending the members again
+        sent.clear()
+        with patch.object(client, 'process_pdf', side_effect=fake_process_pdf):
+            client.process('processFulltextDocument', self.zip_path, output=output, force=False)
+        assert sent == {}
@@ -0,0 +1,149 @@
+"""
+Smoke tests of the benchmark harness (benchmarks/) and its mock GROBID server.
+"""
+import glob
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from benchmarks.converters import check_regressions, format_results, load_baseline, run_converter_benchmarks, \
+    update_baseline
+from benchmarks.mock_server import MockGrobidServer, parse_distribution
+from benchmarks.throughput import make_corpus, run_benchmark
+from benchmarks.tei_generator import generate_tei
+from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+from grobid_client.format.TEI2Markdown import TEI2MarkdownConverter
+from grobid_client.format.validate_json_refs import JSONReferenceValidator
+from grobid_client.grobid_client import GrobidClient
+
+
+class TestBenchmarks:
+    """Test cases for the mock server and the throughput benchmark."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _client(self, server, **kwargs):
+        client = GrobidClient(grobid_server=server.url, sleep_time=0.01, **kwargs)
+        client.logger.setLevel('CRITICAL')
+        return client
+
+    def test_parse_distribution(self):
+        rng = random.Random(1)
+        assert parse_distribution('0.5')(rng) == 0.5
+        assert parse_distribution(2)(rng) == 2
+        assert 1 <= parse_distribution('uniform:1,2')(rng) <= 2
+        assert parse_distribution('normal:-5,0.1')(rng) == 0
+        assert parse_distribution('lognormal:0.1,0.5')(rng) > 0
+        for spec in ['uniform:1', 'gamma:1,2', 'fixed:a']:
+            with pytest.raises(ValueError):
+                parse_distribution(spec)
+
+    @patch('builtins.print')
+    def test_process_with_busy_server(self, mock_print):
+        corpus = make_corpus(os.path.join(self.temp_dir, 'corpus'), 12, size=1000, per_directory=5)
+        output = os.path.join(self.temp_dir, 'out')
+        with MockGrobidServer(busy_rate=0.3, response_size=3000, seed=4) as server:
+            assert requests.get(server.url + '/api/isalive').text == 'true'
+            client = self._client(server)
+            client.process('processFulltextDocument', str(corpus), output=output, n=4, output_layout='mirror')
+
+            assert server.count('processFulltextDocument', 200) == 12
+            assert server.count(status=503) > 0
+        results = glob.glob(os.path.join(output, '*', '*.grobid.tei.xml'))
+        assert len(results) == 12
+        with open(results[0], encoding='utf-8') as f:
+            assert f.read().startswith('<?xml')
+        assert client.metrics.documents.value(outcome='processed') == 12
+
+    @patch('builtins.print')
+    def test_timeouts_and_citation_lists(self, mock_print):
+        corpus = make_corpus(os.path.join(self.temp_dir, 'corpus'), 2, size=300, kind='txt')
+        output = os.path.join(self.temp_dir, 'out')
+        with MockGrobidServer() as server:
+            self._client(server).process('processCitationList', str(corpus), output=output)
+        with open(glob.glob(os.path.join(output, '*.grobid.tei.xml'))[0], encoding='utf-8') as f:
+            assert f.read().count('<biblStruct') == 3
+
+        corpus = make_corpus(os.path.join(self.temp_dir, 'pdf'), 2, size=300)
+        with MockGrobidServer(timeout_rate=1.0, timeout_delay=5) as server:
+            client = self._client(server, timeout=0.2)
+            client.process('processFulltextDocument', str(corpus), output=output)
+        assert client.metrics.documents.value(outcome='failed') == 2
+        assert len(glob.glob(os.path.join(output, '*_408.txt'))) == 2
+
+    @patch('builtins.print')
+    def test_run_benchmark(self, mock_print):
+        corpus = make_corpus(os.path.join(self.temp_dir, 'corpus'), 20, size=500)
+        marker_mtime = os.path.getmtime(os.path.join(corpus, '.benchmark-corpus.json'))
+        assert make_corpus(corpus, 20, size=500) == corpus
+        assert os.path.getmtime(os.path.join(corpus, '.benchmark-corpus.json')) == marker_mtime
+
+        with MockGrobidServer(latency='exp:0.001') as server:
+            result = run_benchmark(corpus, os.path.join(self.temp_dir, 'out'), server.url, concurrency=4,
+                                   monitor_interval=0.05, markdown_output=True)
+        assert result['documents'] == result['processed'] == 20
+        assert result['docs_per_second'] > 0 and result['cpu_seconds'] > 0
+        assert result['peak_rss_mb'] is None or result['peak_rss_mb'] > 0
+        assert len(glob.glob(os.path.join(self.temp_dir, 'out', '*', '*.md'))) == 20
+
+
+class TestConverterBenchmarks:
+    """Test cases for the synthetic TEI generator and the converter benchmarks."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_generated_tei_converts_with_valid_refs(self):
+        tei = generate_tei(paragraphs=20, references=30, tables=1, table_rows=5, sentences=True,
+                           refs_per_sentence=2.0, seed=3)
+        assert tei == generate_tei(paragraphs=20, references=30, tables=1, table_rows=5, sentences=True,
+                                   refs_per_sentence=2.0, seed=3)
+        assert tei.count('<biblStruct') == 31 and tei.count('<row>') == 5
+
+        document = TEI2LossyJSONConverter().convert_tei_file(io.BytesIO(tei.encode()))
+        assert len(document['references']) == 30
+        assert len(document['body_text']) > 20
+        assert document['body_text'][0]['coords']
+        markdown = TEI2MarkdownConverter().convert_tei_file(io.BytesIO(tei.encode()))
+        assert '## References' in markdown and '**[30]**' in markdown
+
+        json_path = os.path.join(self.temp_dir, 'doc.json')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+        results = JSONReferenceValidator().validate_directory(json_path)
+        assert results['total_refs'] > 40
+        assert results['valid_refs'] == results['total_refs']
+
+    def test_benchmarks_and_baselines(self):
+        run = run_converter_benchmarks(['article'], repeat=1)
+        assert set(run['results']) == {'article/lossy_json', 'article/markdown', 'article/validator'}
+        result = run['results']['article/lossy_json']
+        assert result['seconds_per_mb'] > 0 and result['peak_memory_mb'] > 0
+
+        baseline_path = os.path.join(self.temp_dir, 'baselines.json')
+        update_baseline(run, baseline_path)
+        baselines = load_baseline(baseline_path)
+        assert check_regressions(run, baselines) == []
+        assert 'article/validator' in format_results(run, baselines)
+
+        result['seconds_per_mb'] *= 3
+        result['peak_memory_mb'] *= 2
+        regressions = check_regressions(run, baselines)
+        assert len(regressions) == 2 and all(r.startswith('article/lossy_json') for r in regressions)
+        # slower machine, same code
+        run['calibration_seconds'] *= 3
+        assert len(check_regressions(run, baselines)) == 1
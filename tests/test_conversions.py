@@ -1,10 +1,14 @@
 """
 Unit tests for TEI to JSON and TEI to Markdown conversion functionality.
 """
+import json
 import os
 import tempfile
 from unittest.mock import Mock, patch
 
+import pytest
+from bs4 import BeautifulSoup
+
 from grobid_client.grobid_client import GrobidClient
 from tests.resources import TEST_DATA_PATH
 
@@ -949,3 +953,239 @@ class TestTEIConversions:
             assert stream_p.get('text') == non_stream_p.get('text'), \
                 f"Passage {i} text mismatch between stream and non-stream modes"
 
+
+    def _make_tei_tree(self, root, count=4):
+        """Copy the sample TEI document into a nested directory tree and return the TEI paths."""
+        import shutil
+        source = os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml')
+        paths = []
+        for i in range(count):
+            subdir = os.path.join(root, f"part{i % 2}")
+            os.makedirs(subdir, exist_ok=True)
+            path = os.path.join(subdir, f"doc{i}.grobid.tei.xml")
+            shutil.copy(source, path)
+            paths.append(path)
+        return paths
+
+    def test_process_directory_writes_outputs_sequentially(self):
+        """Test process_directory with output_dir: outputs mirror the tree, only status records are returned."""
+        import json
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+            self._make_tei_tree(input_dir)
+
+            converter = TEI2LossyJSONConverter()
+            records = list(converter.process_directory(input_dir, output_dir=output_dir, parallel=False))
+
+            assert len(records) == 4
+            for record in records:
+                assert record['status'] == 'ok'
+                assert 'document' not in record
+                assert os.path.isfile(record['output'])
+
+            expected = os.path.join(output_dir, 'part1', 'doc1.json')
+            with open(expected, encoding='utf-8') as f:
+                document = json.load(f)
+            assert 'Multi-contact functional electrical stimulation' in document['biblio']['title']
+
+    def test_process_directory_parallel_bounded_ordered(self):
+        """Test the parallel bounded mode with recycled workers and ordered yielding."""
+        from pathlib import Path
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+            self._make_tei_tree(input_dir, count=5)
+            discovery_order = list(Path(input_dir).rglob("*.tei.xml"))
+
+            converter = TEI2LossyJSONConverter()
+            records = list(converter.process_directory(
+                input_dir,
+                output_dir=output_dir,
+                workers=2,
+                max_in_flight=2,
+                max_tasks_per_child=2,
+                ordered=True
+            ))
+
+            assert [record['path'] for record in records] == discovery_order
+            assert all(record['status'] == 'ok' for record in records)
+            assert len(list(Path(output_dir).rglob("*.json"))) == 5
+
+    def test_process_directory_without_output_returns_documents(self):
+        """Test that process_directory still yields full documents when no output_dir is given."""
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        with tempfile.TemporaryDirectory() as input_dir:
+            self._make_tei_tree(input_dir, count=2)
+
+            converter = TEI2LossyJSONConverter()
+            records = list(converter.process_directory(input_dir, workers=2))
+
+            assert len(records) == 2
+            for record in records:
+                assert record['document'] is not None
+                assert record['document']['body_text']
+
+    @patch('grobid_client.grobid_client.GrobidClient._test_server_connection')
+    @patch('grobid_client.grobid_client.GrobidClient._configure_logging')
+    def test_process_batch_regenerates_only_stale_json(self, mock_configure_logging, mock_test_server):
+        """Test that the skip path of process_batch regenerates JSON only when the TEI content changed."""
+        import shutil
+
+        client = GrobidClient(check_server=False)
+        client.logger = Mock()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_file = os.path.join(temp_dir, 'doc.pdf')
+            open(pdf_file, 'wb').close()
+            tei_file = os.path.join(temp_dir, 'doc.grobid.tei.xml')
+            shutil.copy(os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml'), tei_file)
+            json_file = os.path.join(temp_dir, 'doc.json')
+
+            def run():
+                return client.process_batch(
+                    'processFulltextDocument', [pdf_file], temp_dir, None, 1,
+                    False, False, False, False, False, False, False,
+                    force=False, json_output=True
+                )
+
+            assert run() == (0, 0, 1)
+            assert os.path.isfile(json_file)
+
+            # Unchanged TEI: the JSON file is not rewritten
+            with open(json_file, 'w') as f:
+                f.write('{"marker": true}')
+            run()
+            with open(json_file) as f:
+                assert f.read() == '{"marker": true}'
+
+            # Updated TEI: the stale JSON file is regenerated
+            with open(tei_file, 'a', encoding='utf-8') as f:
+                f.write("\n")
+            run()
+            with open(json_file) as f:
+                assert 'Multi-contact functional electrical stimulation' in f.read()
+
+    @patch('grobid_client.grobid_client.GrobidClient._test_server_connection')
+    @patch('grobid_client.grobid_client.GrobidClient._configure_logging')
+    def test_process_batch_json_format_change_regenerates_json(self, mock_configure_logging, mock_test_server):
+        """Test that a JSON file written with another --json-format is regenerated in the requested format."""
+        import shutil
+
+        client = GrobidClient(check_server=False)
+        client.logger = Mock()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_file = os.path.join(temp_dir, 'doc.pdf')
+            open(pdf_file, 'wb').close()
+            tei_file = os.path.join(temp_dir, 'doc.grobid.tei.xml')
+            shutil.copy(os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml'), tei_file)
+            json_file = os.path.join(temp_dir, 'doc.json')
+
+            def run(json_format):
+                client.process_batch(
+                    'processFulltextDocument', [pdf_file], temp_dir, None, 1,
+                    False, False, False, False, False, False, False,
+                    force=False, json_output=True, json_format=json_format
+                )
+                with open(json_file, encoding='utf-8') as f:
+                    return f.read()
+
+            assert '\n  "biblio"' in run(None)
+            compact = run('compact')
+            assert '\n' not in compact
+            assert json.loads(compact)['biblio']['title']
+
+    def test_stable_ids_are_deterministic(self):
+        """Test that stable_ids gives identical, unique passage IDs across conversions."""
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        tei_file = os.path.join(TEST_DATA_PATH, 'refs_offsets', '10.1038_s41598-023-32039-z.grobid.tei.xml')
+        converter = TEI2LossyJSONConverter(stable_ids=True)
+
+        first = converter.convert_tei_file(tei_file, stream=False)
+        second = TEI2LossyJSONConverter(stable_ids=True).convert_tei_file(tei_file, stream=False)
+        assert json.dumps(first) == json.dumps(second)
+
+        paragraph_ids = [p['id'] for p in first['body_text'] if p.get('type') != 'formula']
+        assert all(pid.startswith('p_') for pid in paragraph_ids)
+        assert len(set(paragraph_ids)) == len(paragraph_ids)
+
+        # Random IDs remain the default
+        random_ids = [p['id'] for p in TEI2LossyJSONConverter().convert_tei_file(tei_file)['body_text']]
+        assert random_ids != [p['id'] for p in first['body_text']]
+
+    def test_stable_ids_use_xml_id(self):
+        """Test that the GROBID xml:id of a paragraph is used as its stable ID."""
+        from io import BytesIO
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        tei = self.sample_tei_content.replace('<p>', '<p xml:id="_p1">', 1)
+        document = TEI2LossyJSONConverter(stable_ids=True).convert_tei_file(BytesIO(tei.encode('utf-8')))
+
+        assert document['body_text'][0]['id'] == '_p1'
+
+    def test_normalize_sections(self):
+        """Test that normalized output lists each section once and passages reference it by index."""
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        tei_file = os.path.join(TEST_DATA_PATH, 'refs_offsets', '10.1038_s41598-023-32039-z.grobid.tei.xml')
+        full = TEI2LossyJSONConverter(stable_ids=True).convert_tei_file(tei_file)
+        normalized = TEI2LossyJSONConverter(stable_ids=True, normalize_sections=True).convert_tei_file(tei_file)
+
+        sections = normalized['sections']
+        assert len(sections) == len({json.dumps(s, sort_keys=True) for s in sections})
+        assert all('head_section' not in p and 'head_paragraph' not in p for p in normalized['body_text'])
+
+        # Rehydrating the section references gives back the full passages
+        for passage, expected in zip(normalized['body_text'], full['body_text']):
+            passage = dict(passage)
+            index = passage.pop('section', None)
+            if index is not None:
+                passage.update(sections[index])
+            assert passage == expected
+
+        assert len(json.dumps(normalized)) < len(json.dumps(full))
+
+    def test_convert_selected_sections(self):
+        """Test that only the selected sections are computed, and that biblio alone skips the text."""
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        tei_file = os.path.join(TEST_DATA_PATH, 'refs_offsets', '10.1038_s41598-023-32039-z.grobid.tei.xml')
+        converter = TEI2LossyJSONConverter()
+        full = converter.convert_tei_file(tei_file)
+
+        document = converter.convert_tei_file(tei_file, sections=['biblio', 'references'])
+        assert list(document) == ['level', 'biblio', 'references']
+        assert document['references'] == full['references']
+
+        from grobid_client.format import TEI2LossyJSON
+        with patch('grobid_client.format.TEI2LossyJSON.BeautifulSoup', wraps=BeautifulSoup) as mock_soup, \
+                patch.object(TEI2LossyJSON, '_S_TAG', Mock(wraps=TEI2LossyJSON._S_TAG)) as s_tag:
+            header_only = converter.convert_tei_file(tei_file, sections=['biblio'])
+        assert list(header_only) == ['level', 'biblio']
+        assert header_only['level'] == full['level']
+        assert header_only['biblio'] == full['biblio']
+        parsed = mock_soup.call_args[0][0]
+        assert parsed.endswith('</teiHeader></TEI>') and '<body>' not in parsed
+        # the text is not scanned either
+        assert all('<body>' not in call[0][0] for call in s_tag.findall.call_args_list)
+
+        with pytest.raises(ValueError):
+            converter.convert_tei_file(tei_file, sections=['body'])
+
+    def test_lazy_document(self):
+        """Test that the parts of a LazyDocument are only computed when accessed."""
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+
+        tei_file = os.path.join(TEST_DATA_PATH, 'refs_offsets', '10.1038_s41598-023-32039-z.grobid.tei.xml')
+        converter = TEI2LossyJSONConverter(stable_ids=True)
+        document = converter.load_document(tei_file)
+
+        with patch.object(converter, '_extract_references', side_effect=AssertionError("not lazy")):
+            assert document['biblio']['title']
+            assert document['body_text']
+
+        assert list(document) == ['level', 'biblio', 'body_text', 'figures_and_tables', 'references']
+        assert json.dumps(document.to_dict()) == json.dumps(converter.convert_tei_file(tei_file))
@@ -0,0 +1,199 @@
+"""
+Unit tests for batch conversion of TEI files (grobid_client.format.batch).
+"""
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from grobid_client.format.batch import convert_batch, convert_file, iter_inputs, output_path_for
+from tests.resources import TEST_DATA_PATH
+
+SAMPLE_TEI = os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml')
+
+
+class TestBatchConversion:
+    """Test cases for the batch mode of the format converters."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.temp_dir, 'tei')
+        for relative in ['a/doc1.grobid.tei.xml', 'a/b/doc2.grobid.tei.xml', 'doc3.tei.xml']:
+            path = os.path.join(self.input_dir, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copy(SAMPLE_TEI, path)
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_iter_inputs_directory_glob_and_list(self):
+        """Test that directories, glob patterns and file lists are all expanded."""
+        from_dir = list(iter_inputs([self.input_dir]))
+        assert len(from_dir) == 3
+        assert all(base == Path(self.input_dir) for _, base in from_dir)
+
+        from_glob = list(iter_inputs([os.path.join(self.input_dir, 'a', '**', '*.tei.xml')]))
+        assert len(from_glob) == 2
+        assert all(base == Path(self.input_dir, 'a') for _, base in from_glob)
+
+        list_file = os.path.join(self.temp_dir, 'files.txt')
+        with open(list_file, 'w') as f:
+            f.write(os.path.join(self.input_dir, 'doc3.tei.xml') + "\n\n# comment\n")
+        from_list = list(iter_inputs([], input_list=list_file))
+        assert from_list == [(Path(self.input_dir, 'doc3.tei.xml'), Path(self.input_dir))]
+
+    @patch('builtins.print')
+    def test_compressed_variant_of_a_plain_file_is_converted_once(self, mock_print):
+        """Test that a TEI file stored plain and compressed is converted once, from the plain file."""
+        plain = os.path.join(self.input_dir, 'a', 'doc1.grobid.tei.xml')
+        with open(plain, 'rb') as src, gzip.open(plain + '.gz', 'wb') as dst:
+            dst.write(src.read())
+
+        found = [tei_file for tei_file, _ in iter_inputs([self.input_dir])]
+        assert len(found) == 3 and Path(plain) in found
+        assert [tei_file for tei_file, _ in iter_inputs([os.path.join(self.input_dir, 'a', '*.xml*')])] == \
+            [Path(plain)]
+
+        output_dir = os.path.join(self.temp_dir, 'json')
+        assert convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)['processed'] == 3
+        stats = convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)
+        assert stats['found'] == 3 and stats['skipped'] == 3
+
+    def test_output_path_mirrors_structure(self):
+        """Test that the output path mirrors the input tree and replaces the TEI suffix."""
+        tei_file = Path(self.input_dir, 'a', 'b', 'doc2.grobid.tei.xml')
+
+        assert output_path_for(tei_file, Path(self.input_dir), '/out', '.json') == Path('/out/a/b/doc2.json')
+        assert output_path_for(tei_file, Path(self.input_dir), None, '.md') == tei_file.parent / 'doc2.md'
+
+    def test_convert_file_writes_atomically(self):
+        """Test that a conversion failing while writing keeps the previous output and leaves no partial file."""
+        tei_file = os.path.join(self.input_dir, 'doc3.tei.xml')
+        output_dir = os.path.join(self.temp_dir, 'out')
+        for output_format, name in [('json', 'doc3.json'), ('markdown', 'doc3.md')]:
+            output_file = os.path.join(output_dir, name)
+            assert convert_file(output_format, tei_file, output_file)['status'] == 'ok'
+            with open(output_file, 'rb') as f:
+                previous = f.read()
+
+            with patch('grobid_client.writer.os.replace', side_effect=OSError('disk full')):
+                record = convert_file(output_format, tei_file, output_file)
+            assert record['status'] == 'error' and record['output'] is None
+            with open(output_file, 'rb') as f:
+                assert f.read() == previous
+        assert sorted(os.listdir(output_dir)) == ['doc3.json', 'doc3.md']
+
+    @patch('builtins.print')
+    def test_fresh_conversions_read_the_tei_once(self, mock_print):
+        """Test that the manifest digests of fresh conversions come from the TEI read for the conversion."""
+        with open(SAMPLE_TEI, 'rb') as src, gzip.open(os.path.join(self.input_dir, 'doc4.tei.xml.gz'), 'wb') as dst:
+            dst.write(src.read())
+        output_dir = os.path.join(self.temp_dir, 'json')
+        with patch('grobid_client.format.manifest.file_sha256') as file_sha256:
+            assert convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)['processed'] == 4
+        file_sha256.assert_not_called()
+
+        with open(os.path.join(output_dir, 'doc4.json'), encoding='utf-8') as f:
+            assert json.load(f)['biblio']
+        stats = convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)
+        assert stats['skipped'] == 4
+
+    @patch('builtins.print')
+    def test_convert_batch_skips_up_to_date_outputs(self, mock_print):
+        """Test that a second run only reconverts outputs whose TEI content changed."""
+        output_dir = os.path.join(self.temp_dir, 'json')
+
+        stats = convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)
+        assert stats['processed'] == 3
+        assert os.path.isfile(os.path.join(output_dir, 'a', 'b', 'doc2.json'))
+
+        stats = convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)
+        assert stats['processed'] == 0
+        assert stats['skipped'] == 3
+
+        # Touching a TEI file without changing it does not trigger a conversion
+        tei_file = os.path.join(self.input_dir, 'doc3.tei.xml')
+        os.utime(tei_file, (0, 0))
+        stats = convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)
+        assert stats['skipped'] == 3
+
+        # Changing the TEI content does
+        with open(tei_file, 'a', encoding='utf-8') as f:
+            f.write("\n")
+        stats = convert_batch('json', [self.input_dir], output_root=output_dir, workers=1)
+        assert stats['processed'] == 1
+        assert stats['skipped'] == 2
+
+        # Markdown outputs have their own fingerprints
+        stats = convert_batch('markdown', [self.input_dir], output_root=output_dir, workers=1)
+        assert stats['processed'] == 3
+
+    @patch('builtins.print')
+    def test_cli_batch_mode_with_workers(self, mock_print):
+        """Test the TEI2LossyJSON CLI in batch mode with a process pool."""
+        from grobid_client.format.TEI2LossyJSON_cli import main
+
+        output_dir = os.path.join(self.temp_dir, 'json')
+        argv = ['TEI2LossyJSON', '--input', self.input_dir, '--output', output_dir, '--workers', '2']
+        with patch.object(sys, 'argv', argv):
+            try:
+                main()
+            except SystemExit as e:
+                assert e.code == 0
+
+        assert len(list(Path(output_dir).rglob('*.json'))) == 3
+
+
+class TestConversionManifest:
+    """Test cases for the conversion manifest."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.tei_file = os.path.join(self.temp_dir, 'doc.grobid.tei.xml')
+        self.output_file = os.path.join(self.temp_dir, 'doc.json')
+        shutil.copy(SAMPLE_TEI, self.tei_file)
+        with open(self.output_file, 'w') as f:
+            f.write('{}')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_manifest_roundtrip(self):
+        """Test that recorded fingerprints survive a save/load cycle."""
+        from grobid_client.format.manifest import ConversionManifest, MANIFEST_FILENAME
+
+        manifest = ConversionManifest()
+        assert not manifest.is_current(self.output_file, self.tei_file, 'json')
+        manifest.record(self.output_file, self.tei_file, 'json')
+        manifest.save()
+
+        assert os.path.isfile(os.path.join(self.temp_dir, MANIFEST_FILENAME))
+        reloaded = ConversionManifest()
+        assert reloaded.is_current(self.output_file, self.tei_file, 'json')
+        assert not reloaded.is_current(self.output_file, self.tei_file, 'json', options={'ids': 'stable'})
+        assert not reloaded.is_current(self.output_file, self.tei_file, 'markdown')
+
+    def test_converter_version_change_invalidates(self):
+        """Test that bumping the converter version makes outputs stale."""
+        from grobid_client.format import manifest as manifest_module
+
+        manifest = manifest_module.ConversionManifest()
+        manifest.record(self.output_file, self.tei_file, 'json')
+        assert manifest.is_current(self.output_file, self.tei_file, 'json')
+
+        with patch.dict(manifest_module.CONVERTER_VERSIONS, {'json': 999}):
+            assert not manifest.is_current(self.output_file, self.tei_file, 'json')
+
+    def test_missing_output_is_not_current(self):
+        """Test that an output deleted after recording is regenerated."""
+        from grobid_client.format.manifest import ConversionManifest
+
+        manifest = ConversionManifest()
+        manifest.record(self.output_file, self.tei_file, 'json')
+        os.unlink(self.output_file)
+
+        assert not manifest.is_current(self.output_file, self.tei_file, 'json')
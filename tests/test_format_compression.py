@@ -0,0 +1,108 @@
+"""
+Unit tests for compressed TEI files and outputs (grobid_client.format.compression).
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from grobid_client.format.batch import iter_tei_files, output_path_for
+from grobid_client.format.compression import (existing_variant, open_file, read_text, strip_compression,
+                                              with_compression)
+from grobid_client.grobid_client import GrobidClient
+from tests.resources import TEST_DATA_PATH
+
+SAMPLE_TEI = os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml')
+
+
+class TestCompression:
+    """Test cases for transparent compression."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.tei_gz = os.path.join(self.temp_dir, 'doc.grobid.tei.xml.gz')
+        with open(SAMPLE_TEI, 'rb') as src, gzip.open(self.tei_gz, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_names(self):
+        assert with_compression('a.tei.xml', 'gzip') == 'a.tei.xml.gz'
+        assert with_compression('a.tei.xml', None) == 'a.tei.xml'
+        assert strip_compression('a.tei.xml.zst') == 'a.tei.xml'
+        with pytest.raises(ValueError):
+            with_compression('a.tei.xml', 'bz2')
+
+    def test_gzip_roundtrip_is_deterministic(self):
+        """Test that gzip files are read back as text and always written with the same bytes."""
+        path = os.path.join(self.temp_dir, 'out.json.gz')
+        contents = []
+        for _ in range(2):
+            with open_file(path, 'wt', encoding='utf-8') as f:
+                f.write('{"é": 1}')
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+        assert contents[0] == contents[1]
+        assert read_text(path) == '{"é": 1}'
+
+    def test_existing_variant(self):
+        plain = os.path.join(self.temp_dir, 'doc.grobid.tei.xml')
+        assert existing_variant(plain) == self.tei_gz
+        assert existing_variant(os.path.join(self.temp_dir, 'other.grobid.tei.xml')) is None
+
+    def test_converters_read_compressed_tei(self):
+        """Test that the JSON and Markdown converters read a gzip TEI file like the plain one."""
+        from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+        from grobid_client.format.TEI2Markdown import TEI2MarkdownConverter
+
+        converter = TEI2LossyJSONConverter()
+        compressed = converter.convert_tei_file(Path(self.tei_gz))
+        plain = converter.convert_tei_file(Path(SAMPLE_TEI))
+        assert [p['text'] for p in compressed['body_text']] == [p['text'] for p in plain['body_text']]
+        markdown = TEI2MarkdownConverter()
+        assert markdown.convert_tei_file(Path(self.tei_gz)) == markdown.convert_tei_file(Path(SAMPLE_TEI))
+
+    def test_batch_discovers_compressed_tei(self):
+        """Test that batch conversion finds compressed TEI files and names their outputs without .gz."""
+        assert list(iter_tei_files(Path(self.temp_dir))) == [Path(self.tei_gz)]
+        assert output_path_for(Path(self.tei_gz), Path(self.temp_dir), '/out', '.json') == Path('/out/doc.json')
+
+    def test_validator_reads_compressed_json(self):
+        from grobid_client.format.validate_json_refs import JSONReferenceValidator
+
+        with open_file(os.path.join(self.temp_dir, 'doc.json.gz'), 'wt', encoding='utf-8') as f:
+            json.dump({'body_text': []}, f)
+        results = JSONReferenceValidator().validate_directory(self.temp_dir)
+        assert results['total_files'] == 1
+
+    @patch('builtins.print')
+    def test_process_writes_and_skips_compressed_outputs(self, mock_print):
+        """Test that process() stores compressed TEI and JSON files and skips them on the next run."""
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False)
+        client.logger = Mock()
+        input_dir = os.path.join(self.temp_dir, 'pdf')
+        output_dir = os.path.join(self.temp_dir, 'out')
+        os.makedirs(input_dir)
+        with open(os.path.join(input_dir, 'paper.pdf'), 'wb') as f:
+            f.write(b'%PDF')
+        with open(SAMPLE_TEI, encoding='utf-8') as f:
+            tei = f.read()
+
+        process_pdf = Mock(side_effect=lambda service, pdf_file, *args: (pdf_file, 200, tei))
+        with patch.object(client, 'process_pdf', process_pdf):
+            client.process('processFulltextDocument', input_dir, output=output_dir, json_output=True,
+                           compression='gzip')
+            assert read_text(os.path.join(output_dir, 'paper.grobid.tei.xml.gz')) == tei
+            assert json.loads(read_text(os.path.join(output_dir, 'paper.json.gz')))
+
+            client.process('processFulltextDocument', input_dir, output=output_dir, force=False)
+        assert process_pdf.call_count == 1
+        assert not os.path.exists(os.path.join(output_dir, 'paper.grobid.tei.xml'))
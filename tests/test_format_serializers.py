@@ -0,0 +1,112 @@
+"""
+Unit tests for the JSON output serializers (grobid_client.format.serializers).
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from grobid_client.format.serializers import JSON_FORMATS, Serializer, get_serializer, iter_document_members, \
+    load_document
+from grobid_client.format.validate_json_refs import JSONReferenceValidator
+from tests.resources import TEST_DATA_PATH
+
+SAMPLE_TEI = os.path.join(TEST_DATA_PATH, 'refs_offsets', '10.1038_s41598-023-32039-z.grobid.tei.xml')
+
+DOCUMENT = {"level": "paragraph", "biblio": {"title": "Étude"}, "body_text": [{"id": "p_1", "coords": [{"x": 1.5}]}]}
+
+
+def _available(json_format):
+    try:
+        Serializer(json_format)
+    except ImportError:
+        return False
+    return True
+
+
+class TestSerializers:
+    """Test cases for the pluggable serializers."""
+
+    @pytest.mark.parametrize("json_format", JSON_FORMATS)
+    def test_roundtrip(self, json_format):
+        """Test that every format reads back the document it wrote."""
+        if not _available(json_format):
+            pytest.skip(f"{json_format} is not installed")
+        serializer = get_serializer(json_format)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, f"doc{serializer.extension}")
+            serializer.dump(DOCUMENT, path)
+            assert load_document(path) == DOCUMENT
+
+    def test_formats(self):
+        """Test the defaults, the output size and the manifest options of the formats."""
+        pretty = get_serializer()
+        compact = get_serializer("compact")
+
+        assert pretty.json_format == "pretty" and pretty.extension == ".json" and pretty.options == {}
+        assert compact.options == {"json_format": "compact"}
+        assert len(compact.dumps(DOCUMENT)) < len(pretty.dumps(DOCUMENT))
+        assert "Étude" in compact.dumps(DOCUMENT).decode("utf-8")
+        assert compact.dumps_line(DOCUMENT).endswith(b"}\n")
+
+        with pytest.raises(ValueError):
+            get_serializer("yaml")
+
+    def test_iter_document_members(self):
+        """Test that documents read member by member, across small chunks, equal the loaded documents."""
+        document = {"level": "sentence", "biblio": {"title": "Étude", "abstract": []}, "n": -12345, "f": 1.25e-7,
+                    "body_text": [{"text": "x" * i, "refs": [{"offset_start": i, "v": 2.5e+300}]} for i in range(5)],
+                    "notes": [], "ok": True, "none": None}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name, indent in (("doc.json", 2), ("doc.json.gz", None)):
+                path = os.path.join(temp_dir, name)
+                get_serializer("pretty" if indent else "compact").dump(document, path)
+                with patch("grobid_client.format.serializers._StreamingDecoder.__init__.__defaults__", (3,)):
+                    members = {key: list(value) if key in ("body_text", "notes") else value
+                               for key, value in iter_document_members(path, ("body_text", "notes"))}
+                    assert members == document
+                    # items not consumed are skipped
+                    assert [key for key, _ in iter_document_members(path, ("body_text",))] == list(document)
+
+            path = os.path.join(temp_dir, "broken.json")
+            for content in ('{"a": [1, 2}', '{"a": 1', '[1]', '{"a": 1,}'):
+                with open(path, "w") as f:
+                    f.write(content)
+                with pytest.raises(json.JSONDecodeError):
+                    for _, value in iter_document_members(path, ("a",)):
+                        list(value) if not isinstance(value, int) else value
+
+    def test_missing_optional_dependency(self):
+        """Test that a missing optional dependency is reported when the serializer is created."""
+        with patch.dict(sys.modules, {"msgpack": None}):
+            with pytest.raises(ImportError, match="pip install msgpack"):
+                get_serializer("msgpack")
+
+    def test_convert_cli_and_validator(self):
+        """Test the --json-format option of the JSON CLI and that the validator reads its output."""
+        from grobid_client.format import TEI2LossyJSON_cli
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shutil.copy(SAMPLE_TEI, temp_dir)
+            output_dir = os.path.join(temp_dir, 'json')
+            argv = ['TEI2LossyJSON', '--input', temp_dir, '--output', output_dir, '--workers', '1',
+                    '--json-format', 'compact']
+            with patch.object(sys, 'argv', argv):
+                with pytest.raises(SystemExit) as exit_info:
+                    TEI2LossyJSON_cli.main()
+            assert exit_info.value.code == 0
+
+            output_file = os.path.join(output_dir, '10.1038_s41598-023-32039-z.json')
+            with open(output_file, encoding='utf-8') as f:
+                content = f.read()
+            assert '\n' not in content.strip()
+            assert json.loads(content)['body_text']
+
+            results = JSONReferenceValidator().validate_directory(output_dir)
+            assert results['total_files'] == 1
+            assert results['total_refs'] > 0
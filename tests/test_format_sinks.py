@@ -0,0 +1,223 @@
+"""
+Unit tests for the streaming JSONL output sink (grobid_client.format.sinks).
+"""
+import json
+import os
+import tarfile
+import tempfile
+import zipfile
+from unittest.mock import Mock, patch
+
+import pytest
+
+from grobid_client.format.sinks import ArchiveSink, JSONLSink, iter_archive_index, read_archive_member
+from grobid_client.format.TEI2LossyJSON import TEI2LossyJSONConverter
+from grobid_client.grobid_client import GrobidClient
+from tests.resources import TEST_DATA_PATH
+
+SAMPLE_TEI = os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml')
+
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestJSONLSink:
+    """Test cases for JSONLSink."""
+
+    def test_stream_document_matches_full_conversion(self):
+        """Test that stream_document yields the same passages and metadata as the full conversion."""
+        converter = TEI2LossyJSONConverter()
+        with patch('grobid_client.format.TEI2LossyJSON.get_random_id', side_effect=lambda prefix='': prefix):
+            document = converter.convert_tei_file(SAMPLE_TEI, stream=False)
+            metadata, passages = converter.stream_document(SAMPLE_TEI)
+            passages = list(passages)
+
+        assert metadata['body_text'] == []
+        assert passages == document['body_text']
+        assert metadata['biblio'] == document['biblio']
+        assert metadata['references'] == document['references']
+
+    def test_write_tei_passages_and_documents(self):
+        """Test that passages and document metadata go to separate shards, tagged with the document id."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with JSONLSink(temp_dir) as sink:
+                count = sink.write_tei('a/doc1', SAMPLE_TEI)
+                sink.write_tei('doc2', SAMPLE_TEI)
+
+            passages = _read_jsonl(os.path.join(temp_dir, 'passages-00000.jsonl'))
+            documents = _read_jsonl(os.path.join(temp_dir, 'documents-00000.jsonl'))
+
+            assert count > 0
+            assert len(passages) == 2 * count
+            assert passages[0]['doc_id'] == 'a/doc1' and 'text' in passages[0]
+            assert passages[-1]['doc_id'] == 'doc2'
+            assert [d['doc_id'] for d in documents] == ['a/doc1', 'doc2']
+            assert documents[0]['passage_count'] == count
+            assert 'body_text' not in documents[0]
+            assert 'Multi-contact functional electrical stimulation' in documents[0]['biblio']['title']
+
+            # Compact serialization
+            with open(os.path.join(temp_dir, 'documents-00000.jsonl'), encoding='utf-8') as f:
+                assert '", "' not in f.readline()
+
+    def test_shard_rotation_and_continuation(self):
+        """Test that shards rotate between documents and a new sink does not overwrite existing shards."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with JSONLSink(temp_dir, max_shard_documents=2) as sink:
+                for i in range(3):
+                    sink.write_document(f'doc{i}', {'level': 'paragraph'}, [{'id': 'p1', 'text': 'x'}])
+
+            with JSONLSink(temp_dir) as sink:
+                sink.write_document('doc3', {'level': 'paragraph'}, [])
+
+            assert sorted(os.listdir(temp_dir)) == [
+                'documents-00000.jsonl', 'documents-00001.jsonl', 'documents-00002.jsonl',
+                'passages-00000.jsonl', 'passages-00001.jsonl', 'passages-00002.jsonl'
+            ]
+            assert len(_read_jsonl(os.path.join(temp_dir, 'passages-00000.jsonl'))) == 2
+            assert _read_jsonl(os.path.join(temp_dir, 'documents-00002.jsonl'))[0]['passage_count'] == 0
+
+    @patch('grobid_client.grobid_client.GrobidClient._test_server_connection')
+    @patch('grobid_client.grobid_client.GrobidClient._configure_logging')
+    def test_process_batch_streams_to_sink(self, mock_configure_logging, mock_test_server):
+        """Test that process_batch streams each written TEI result into the sink."""
+        with open(SAMPLE_TEI, encoding='utf-8') as f:
+            tei_content = f.read()
+
+        client = GrobidClient(check_server=False)
+        client.logger = Mock()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = os.path.join(temp_dir, 'pdf')
+            os.makedirs(os.path.join(input_dir, 'sub'))
+            pdf_file = os.path.join(input_dir, 'sub', 'doc.pdf')
+            open(pdf_file, 'wb').close()
+            jsonl_dir = os.path.join(temp_dir, 'jsonl')
+
+            with patch.object(client, 'process_pdf', return_value=(pdf_file, 200, tei_content)):
+                with JSONLSink(jsonl_dir) as sink:
+                    result = client.process_batch(
+                        'processFulltextDocument', [pdf_file], input_dir, None, 1,
+                        False, False, False, False, False, False, False,
+                        force=True, jsonl_sink=sink
+                    )
+
+            assert result == (1, 0, 0)
+            documents = _read_jsonl(os.path.join(jsonl_dir, 'documents-00000.jsonl'))
+            assert [d['doc_id'] for d in documents] == ['sub/doc']
+
+
+class TestArchiveSink:
+    """Test cases for ArchiveSink."""
+
+    @staticmethod
+    def _write(sink, count, start=0):
+        for i in range(start, start + count):
+            sink.write_document(f'a/doc{i}', {
+                f'a/doc{i}.grobid.tei.xml': f'<TEI>{i}</TEI>'.encode() * 50,
+                f'a/doc{i}.md': f'# Document {i} é'.encode('utf-8')
+            })
+
+    @pytest.mark.parametrize('archive_format,compression', [('tar', None), ('zip', None), ('zip', 'deflate')])
+    def test_shards_index_and_random_access(self, archive_format, compression):
+        """Test that shards rotate between documents, are valid archives and that the index gives the members."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with ArchiveSink(temp_dir, archive_format, compression, max_shard_documents=2) as sink:
+                self._write(sink, 3)
+                assert sink.read_member('a/doc2', 'a/doc2.md') == '# Document 2 é'.encode('utf-8')
+                assert 'a/doc0.grobid.tei.xml' in sink and 'a/doc9.grobid.tei.xml' not in sink
+
+            shards = sorted(name for name in os.listdir(temp_dir) if name != 'grobid-index.jsonl')
+            assert shards == [f'grobid-00000.{archive_format}', f'grobid-00001.{archive_format}']
+
+            first = os.path.join(temp_dir, shards[0])
+            if archive_format == 'tar':
+                with tarfile.open(first) as archive:
+                    names = archive.getnames()
+            else:
+                with zipfile.ZipFile(first) as archive:
+                    assert archive.testzip() is None
+                    names = archive.namelist()
+            assert names == ['a/doc0.grobid.tei.xml', 'a/doc0.md', 'a/doc1.grobid.tei.xml', 'a/doc1.md']
+
+            entries = list(iter_archive_index(temp_dir))
+            assert len(entries) == 6
+            assert read_archive_member(temp_dir, entries[2]) == b'<TEI>1</TEI>' * 50
+
+            # A new sink knows the packed members and continues the shard numbering
+            with ArchiveSink(temp_dir, archive_format, compression) as sink:
+                assert 'a/doc1.md' in sink
+                self._write(sink, 1, start=3)
+            assert os.path.isfile(os.path.join(temp_dir, f'grobid-00002.{archive_format}'))
+            assert len(list(iter_archive_index(temp_dir))) == 8
+
+    @pytest.mark.parametrize('archive_format', ['tar', 'zip'])
+    def test_index_is_readable_before_close(self, archive_format):
+        """Test that the members of a written document can be read through the index while the sink is open."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with ArchiveSink(temp_dir, archive_format) as sink:
+                self._write(sink, 2)
+                entries = list(iter_archive_index(temp_dir))
+                assert [entry['name'] for entry in entries] == ['a/doc0.grobid.tei.xml', 'a/doc0.md',
+                                                                'a/doc1.grobid.tei.xml', 'a/doc1.md']
+                assert read_archive_member(temp_dir, entries[3]) == '# Document 1 é'.encode('utf-8')
+
+    def test_zstd_tar_shards(self):
+        """Test that zstd shards are valid .tar.zst streams with independently readable members."""
+        zstandard = pytest.importorskip('zstandard')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with ArchiveSink(temp_dir, 'tar', 'zstd') as sink:
+                self._write(sink, 2)
+            entries = list(iter_archive_index(temp_dir))
+            assert read_archive_member(temp_dir, entries[3]) == '# Document 1 é'.encode('utf-8')
+
+            with open(os.path.join(temp_dir, 'grobid-00000.tar.zst'), 'rb') as f:
+                reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+                with tarfile.open(fileobj=reader, mode='r|') as archive:
+                    assert [member.name for member in archive] == [entry['name'] for entry in entries]
+
+    def test_invalid_options(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with pytest.raises(ValueError):
+                ArchiveSink(temp_dir, 'zip', 'zstd')
+            with pytest.raises(ValueError):
+                ArchiveSink(temp_dir, '7z')
+
+    @patch('grobid_client.grobid_client.GrobidClient._test_server_connection')
+    @patch('grobid_client.grobid_client.GrobidClient._configure_logging')
+    def test_process_packs_results(self, mock_configure_logging, mock_test_server):
+        """Test that process() packs TEI, JSON and error outputs, and skips packed documents."""
+        with open(SAMPLE_TEI, encoding='utf-8') as f:
+            tei_content = f.read()
+
+        client = GrobidClient(check_server=False)
+        client.logger = Mock()
+
+        def fake_process_pdf(service, pdf_file, *args):
+            if 'bad' in pdf_file:
+                return pdf_file, 500, 'error'
+            return pdf_file, 200, tei_content
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = os.path.join(temp_dir, 'pdf')
+            os.makedirs(input_dir)
+            for name in ['doc.pdf', 'bad.pdf']:
+                open(os.path.join(input_dir, name), 'wb').close()
+            output = os.path.join(temp_dir, 'out')
+
+            with patch.object(client, 'process_pdf', side_effect=fake_process_pdf) as mock_process:
+                with patch('builtins.print'):
+                    client.process('processFulltextDocument', input_dir, output=output, json_output=True,
+                                   archive_output='tar')
+                    assert sorted(os.listdir(output)) == ['grobid-00000.tar', 'grobid-index.jsonl']
+                    names = sorted(entry['name'] for entry in iter_archive_index(output))
+                    assert names == ['bad_500.txt', 'doc.grobid.tei.xml', 'doc.json']
+                    document = json.loads(read_archive_member(
+                        output, next(e for e in iter_archive_index(output) if e['name'] == 'doc.json')))
+                    assert 'Multi-contact functional electrical stimulation' in document['biblio']['title']
+
+                    mock_process.reset_mock()
+                    client.process('processFulltextDocument', input_dir, output=output, archive_output='tar', force=False)
+                    assert [call[0][1] for call in mock_process.call_args_list] == [os.path.join(input_dir, 'bad.pdf')]
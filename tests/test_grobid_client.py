@@ -1,6 +1,7 @@
 """
 Unit tests for the GROBID client main functionality.
 """
+import io
 import json
 import os
 import tempfile
@@ -9,6 +10,7 @@ from unittest.mock import Mock, patch, mock_open
 import pytest
 import requests
 
+from grobid_client.format.compression import read_text
 from grobid_client.grobid_client import GrobidClient, ServerUnavailableException
 
 
@@ -593,9 +595,10 @@ class TestEdgeCases:
                     tei_coordinates=False,
                     segment_sentences=False
                 )
+                assert result[1] == 408
+                assert 'Request timeout' in result[2]
 
-                # The ReadTimeout is being caught by the file open exception first. Let's fix this
-                # by ensuring the mock_open doesn't interfere with the timeout
+                # A file that can not be opened is still reported as such
                 with patch('builtins.open', side_effect=OSError("File open error")):
                     result = client.process_pdf(
                         'processFulltextDocument',
@@ -671,3 +674,277 @@ class TestEdgeCases:
         result = client.get_server_url(service)
         expected = 'http://localhost:8070/api/processCitationPatentST36'
         assert result == expected
+
+
+class TestIterProcess:
+    """Test cases for the in-memory iterator API."""
+
+    def setup_method(self):
+        from tests.resources import TEST_DATA_PATH
+        with open(os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml'), encoding='utf-8') as f:
+            self.tei_content = f.read()
+
+    def _client(self):
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False)
+        client.logger = Mock()
+        return client
+
+    def test_iter_process_yields_results_with_conversions(self):
+        """Test that results carry the TEI bytes, the conversions and the stage timings."""
+        client = self._client()
+
+        def fake_process_pdf(service, pdf_file, *args):
+            if 'bad' in pdf_file:
+                return pdf_file, 500, 'server error'
+            return pdf_file, 200, self.tei_content
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ['a.pdf', 'b.PDF', 'bad.pdf', 'notes.txt']:
+                open(os.path.join(temp_dir, name), 'wb').close()
+
+            seen = []
+            with patch.object(client, 'process_pdf', side_effect=fake_process_pdf):
+                results = list(client.iter_process(temp_dir, 'processFulltextDocument', n=2,
+                                                   json_output=True, markdown_output=True, callback=seen.append))
+
+        assert len(results) == 3
+        assert seen == results
+        by_name = {os.path.basename(r.input_path): r for r in results}
+
+        good = by_name['a.pdf']
+        assert good.ok and good.error is None
+        assert good.tei == self.tei_content.encode('utf-8')
+        assert good.json['biblio']['title'] == 'Multi-contact functional electrical stimulation for hand opening: electrophysiologically driven identification of the optimal stimulation site'
+        assert good.markdown.startswith('# ')
+        assert set(good.timings) == {'request', 'json', 'markdown', 'total'}
+
+        bad = by_name['bad.pdf']
+        assert not bad.ok
+        assert bad.status == 500 and bad.error == 'server error' and bad.json is None
+
+    def test_iter_process_bounded_buffering(self):
+        """Test that inputs are consumed lazily, at most max_in_flight ahead of the consumer."""
+        client = self._client()
+        pulled = []
+
+        def inputs():
+            for i in range(10):
+                pulled.append(i)
+                yield f'/data/doc{i}.pdf'
+
+        with patch('os.path.isfile', return_value=True):
+            with patch.object(client, 'process_pdf', side_effect=lambda service, f, *args: (f, 200, '<TEI/>')):
+                iterator = client.iter_process(inputs(), 'processFulltextDocument', n=2, max_in_flight=3)
+                first = next(iterator)
+                assert len(pulled) <= 3
+                rest = list(iterator)
+
+        assert first.ok
+        assert len(rest) == 9
+        assert len(pulled) == 10
+
+
+class TestInMemoryInputs:
+    """Test cases for bytes, file-like and (name, content) inputs."""
+
+    def _client(self):
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False, sleep_time=0)
+        client.logger = Mock()
+        return client
+
+    @staticmethod
+    def _response(status, text='<TEI/>'):
+        response = Mock()
+        response.text = text
+        return response, status
+
+    def test_process_pdf_bytes_streams_multipart_body(self):
+        """Test that bytes are sent as a streamed multipart body, named after their digest."""
+        from grobid_client.multipart import MultipartStream
+        client = self._client()
+        sent = []
+
+        def fake_post(url, data=None, headers=None, **kwargs):
+            sent.append((data.read(), headers['Content-Type']))
+            assert isinstance(data, MultipartStream) and 'files' not in kwargs
+            return self._response(200)
+
+        with patch.object(client, 'post', side_effect=fake_post):
+            name, status, text = client.process_pdf('processFulltextDocument', b'%PDF-1.4 content',
+                                                    True, True, False, False, False, False, False)
+
+        assert status == 200 and text == '<TEI/>'
+        assert name.endswith('.pdf') and len(name) == 20
+        body, content_type = sent[0]
+        assert content_type.startswith('multipart/form-data; boundary=')
+        assert b'%PDF-1.4 content' in body and f'filename="{name}"'.encode() in body
+        assert b'name="generateIDs"' in body
+
+    def test_process_pdf_file_object_retried_from_start(self):
+        """Test that a file object is sent again from its start when the server is busy."""
+        client = self._client()
+        bodies = []
+
+        def fake_post(url, data=None, headers=None, **kwargs):
+            bodies.append(data.read())
+            return self._response(503 if len(bodies) == 1 else 200)
+
+        with patch.object(client, 'post', side_effect=fake_post):
+            result = client.process_pdf('processFulltextDocument', ('paper.pdf', io.BytesIO(b'%PDF data')),
+                                        False, False, False, False, False, False, False)
+
+        assert result == ('paper.pdf', 200, '<TEI/>')
+        assert len(bodies) == 2
+        assert all(b'\r\n\r\n%PDF data\r\n' in body for body in bodies)
+
+    def test_process_txt_content(self):
+        """Test that references given as text content are sent one per line."""
+        client = self._client()
+        with patch.object(client, 'post', return_value=self._response(200)) as mock_post:
+            result = client.process_txt('processCitationList', ('refs.txt', b'Ref 1\nRef 2\n'),
+                                        False, False, False, False, False, False, False)
+
+        assert result == ('refs.txt', 200, '<TEI/>')
+        assert mock_post.call_args[1]['data']['citations'] == ['Ref 1', 'Ref 2']
+
+    def test_process_contents_writes_and_skips_existing(self):
+        """Test that results are written under the input names and existing results are skipped."""
+        client = self._client()
+        inputs = [('a.pdf', b'1'), ('sub/b.pdf', io.BytesIO(b'2')), ('bad.pdf', b'3')]
+
+        def fake_process_pdf(service, item, *args):
+            name, content = item
+            return (name, 500, 'error') if name == 'bad.pdf' else (name, 200, '<TEI/>')
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.object(client, 'process_pdf', side_effect=fake_process_pdf) as mock_process:
+                assert client.process_contents('processFulltextDocument', iter(inputs), temp_dir, n=2) == (2, 1, 0)
+                assert os.path.isfile(os.path.join(temp_dir, 'a.grobid.tei.xml'))
+                assert os.path.isfile(os.path.join(temp_dir, 'sub', 'b.grobid.tei.xml'))
+                assert os.path.isfile(os.path.join(temp_dir, 'bad_500.txt'))
+
+                mock_process.reset_mock()
+                assert client.process_contents('processFulltextDocument', inputs, temp_dir, force=False) == (0, 1, 2)
+                assert mock_process.call_count == 1
+
+    def test_process_contents_file_objects_with_the_same_file_name(self):
+        """Test that file objects opened from different directories do not share their output."""
+        client = self._client()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for directory in ['a', 'b']:
+                os.makedirs(os.path.join(temp_dir, 'in', directory))
+                with open(os.path.join(temp_dir, 'in', directory, 'x.pdf'), 'wb') as f:
+                    f.write(directory.encode())
+            output = os.path.join(temp_dir, 'out')
+
+            def fake_process_pdf(service, item, *args):
+                name, content = item
+                return name, 200, f'<TEI>{content.read().decode()}</TEI>'
+
+            with patch.object(client, 'process_pdf', side_effect=fake_process_pdf):
+                with open(os.path.join(temp_dir, 'in', 'a', 'x.pdf'), 'rb') as a, \
+                        open(os.path.join(temp_dir, 'in', 'b', 'x.pdf'), 'rb') as b:
+                    assert client.process_contents('processFulltextDocument', [a, b], output) == (2, 0, 0)
+                with open(os.path.join(temp_dir, 'in', 'b', 'x.pdf'), 'rb') as b:
+                    assert client.process_contents('processFulltextDocument', [b], output, force=False) == (0, 0, 1)
+
+            results = sorted(os.path.relpath(os.path.join(directory, name), output)
+                             for directory, _, names in os.walk(output) for name in names)
+            assert len(results) == 2 and results[0] != results[1]
+            assert [read_text(os.path.join(output, result)) for result in results] == ['<TEI>a</TEI>', '<TEI>b</TEI>']
+
+    def test_process_contents_compresses_and_skips_compressed_results(self):
+        """Test that process_contents stores compressed results, skips them and records the skips."""
+        client = self._client()
+        inputs = [('a.pdf', b'1'), ('b.pdf', b'2')]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.object(client, 'process_pdf', side_effect=lambda service, item, *args: (item[0], 200, '<TEI/>')) \
+                    as mock_process:
+                assert client.process_contents('processFulltextDocument', inputs, temp_dir,
+                                               compression='gzip') == (2, 0, 0)
+                assert read_text(os.path.join(temp_dir, 'a.grobid.tei.xml.gz')) == '<TEI/>'
+                assert not os.path.exists(os.path.join(temp_dir, 'a.grobid.tei.xml'))
+
+                mock_process.reset_mock()
+                assert client.process_contents('processFulltextDocument', inputs, temp_dir, force=False) == (0, 0, 2)
+                mock_process.assert_not_called()
+        assert client.metrics.documents.value(outcome="processed") == 2
+        assert client.metrics.documents.value(outcome="skipped") == 2
+
+    def test_iter_process_in_memory_inputs(self):
+        """Test that iter_process accepts in-memory inputs next to paths."""
+        client = self._client()
+        with patch.object(client, 'post', return_value=self._response(200)):
+            results = list(client.iter_process([('x.pdf', b'1'), b'2'], 'processFulltextDocument', n=2))
+
+        assert sorted(r.input_path for r in results)[-1] == 'x.pdf'
+        assert all(r.ok for r in results)
+
+
+class TestListedInputs:
+    """Test cases for process() with input manifests and iterables."""
+
+    def _client(self, batch_size=10):
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False, batch_size=batch_size)
+        client.logger = Mock()
+        return client
+
+    @patch('builtins.print')
+    def test_process_manifest_output_names_and_priorities(self, mock_print):
+        """Test that manifest inputs are written under their output names, higher priorities first."""
+        client = self._client()
+        sent = []
+
+        def fake_process_pdf(service, pdf_file, *args):
+            sent.append(os.path.basename(pdf_file))
+            return pdf_file, 200, '<TEI/>'
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manifest = os.path.join(temp_dir, 'inputs.jsonl')
+            with open(manifest, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'path': os.path.join(temp_dir, 'in', 'a.pdf')}) + '\n')
+                f.write(json.dumps({'path': os.path.join(temp_dir, 'in', 'b.pdf'), 'output': '2024/b-1',
+                                    'priority': 10}) + '\n')
+            output = os.path.join(temp_dir, 'out')
+
+            with patch.object(client, 'process_pdf', side_effect=fake_process_pdf):
+                client.process('processFulltextDocument', None, output=output, n=1, input_manifest=manifest)
+
+            assert sent == ['b.pdf', 'a.pdf']
+            assert os.path.isfile(os.path.join(output, 'a.grobid.tei.xml'))
+            assert os.path.isfile(os.path.join(output, '2024', 'b-1.grobid.tei.xml'))
+
+        printed = [call[0][0] for call in mock_print.call_args_list]
+        assert 'Processing completed: 2 out of 2 files processed' in printed
+
+    def test_process_iterable_consumed_in_batches(self):
+        """Test that an iterable of paths is consumed one batch at a time."""
+        client = self._client(batch_size=2)
+        pulled = []
+
+        def inputs():
+            for i in range(5):
+                pulled.append(i)
+                yield f'/data/doc{i}.pdf'
+
+        batches = []
+
+        def fake_process_batch(service, input_files, *args, **kwargs):
+            batches.append((list(input_files), len(pulled)))
+            return len(input_files), 0, 0
+
+        with patch.object(client, 'process_batch', side_effect=fake_process_batch):
+            with patch('builtins.print'):
+                client.process('processFulltextDocument', inputs(), output='/out')
+
+        assert [files for files, _ in batches] == [
+            ['/data/doc0.pdf', '/data/doc1.pdf'], ['/data/doc2.pdf', '/data/doc3.pdf'], ['/data/doc4.pdf']
+        ]
+        assert [count for _, count in batches] == [2, 4, 5]
@@ -0,0 +1,71 @@
+"""
+Import time budget tests.
+
+The client is often started in short-lived workers, so importing it must not pull
+the format converters (BeautifulSoup, lxml, dateparser) until a conversion is requested.
+The budget can be adjusted with the GROBID_CLIENT_IMPORT_BUDGET_MS environment variable.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time budget for grobid_client.grobid_client, in milliseconds
+IMPORT_BUDGET_MS = int(os.environ.get("GROBID_CLIENT_IMPORT_BUDGET_MS", "250"))
+
+HEAVY_MODULES = ["bs4", "lxml", "dateparser"]
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def _importtime(module):
+    """Import a module in a fresh interpreter with -X importtime and return {module: cumulative_us}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # format: "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+class TestImportTime:
+    """Test cases for lazy loading of the conversion dependencies."""
+
+    @pytest.mark.parametrize("module", [
+        "grobid_client.grobid_client",
+        "grobid_client.format.__main__",
+        "grobid_client.format.TEI2LossyJSON_cli",
+        "grobid_client.format.TEI2Markdown_cli",
+    ])
+    def test_heavy_dependencies_not_imported(self, module):
+        """Importing the client or the CLIs must not load the converter dependencies."""
+        timings = _importtime(module)
+
+        assert module in timings
+        for heavy in HEAVY_MODULES:
+            assert heavy not in timings, f"{heavy} should be imported lazily by {module}"
+
+    def test_converter_does_not_import_dateparser(self):
+        """dateparser is only needed when a publication date is parsed."""
+        timings = _importtime("grobid_client.format.TEI2LossyJSON")
+
+        assert "bs4" in timings
+        assert "dateparser" not in timings
+
+    def test_client_import_time_budget(self):
+        """The client import must stay under the configured budget."""
+        timings = _importtime("grobid_client.grobid_client")
+
+        cumulative_ms = timings["grobid_client.grobid_client"] / 1000
+        assert cumulative_ms < IMPORT_BUDGET_MS, \
+            f"Importing grobid_client took {cumulative_ms:.1f}ms (budget {IMPORT_BUDGET_MS}ms)"
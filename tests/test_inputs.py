@@ -0,0 +1,68 @@
+"""
+Unit tests for the input manifests of GrobidClient.process (grobid_client.inputs).
+"""
+import io
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from grobid_client.inputs import InputItem, iter_input_items, iter_manifest
+
+
+class TestInputManifests:
+    """Test cases for manifest reading."""
+
+    def test_text_manifest(self):
+        """Test paths with optional tab-separated output names and priorities, comments and blank lines."""
+        text = "# inputs\n/data/a.pdf\n\n/data/b.pdf\t2024/b\n/data/c.pdf\t\t5\n"
+        items = list(iter_manifest(io.StringIO(text), "text"))
+        assert items == [
+            InputItem('/data/a.pdf'),
+            InputItem('/data/b.pdf', '2024/b'),
+            InputItem('/data/c.pdf', None, 5.0)
+        ]
+
+    def test_csv_and_jsonl_manifests_by_extension(self):
+        """Test that the format of manifest files is given by their extension."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'inputs.csv')
+            with open(csv_path, 'w', encoding='utf-8') as f:
+                f.write('priority,path,output\n1,/data/a.pdf,\n,"/data/b, c.pdf",out/b\n')
+            jsonl_path = os.path.join(temp_dir, 'inputs.jsonl')
+            with open(jsonl_path, 'w', encoding='utf-8') as f:
+                f.write('{"path": "/data/a.pdf", "priority": 2}\n\n{"path": "/data/b.pdf", "output": "b"}\n')
+
+            assert list(iter_manifest(csv_path)) == [
+                InputItem('/data/a.pdf', None, 1.0), InputItem('/data/b, c.pdf', 'out/b')
+            ]
+            assert list(iter_manifest(jsonl_path)) == [
+                InputItem('/data/a.pdf', None, 2.0), InputItem('/data/b.pdf', 'b')
+            ]
+
+    def test_stdin_manifest_format_sniffing(self):
+        """Test that a stdin manifest is read as JSONL when its first line is a JSON object."""
+        with patch('sys.stdin', io.StringIO('{"path": "/data/a.pdf"}\n')):
+            assert list(iter_manifest('-')) == [InputItem('/data/a.pdf')]
+        with patch('sys.stdin', io.StringIO('/data/a.pdf\n/data/b.pdf\n')):
+            assert [item.path for item in iter_manifest('-')] == ['/data/a.pdf', '/data/b.pdf']
+
+    def test_invalid_entries(self):
+        """Test that unknown formats and entries without path are rejected."""
+        with pytest.raises(ValueError):
+            list(iter_manifest(io.StringIO(''), 'xml'))
+        with pytest.raises(ValueError):
+            list(iter_manifest(io.StringIO('{"output": "a"}\n')))
+
+    def test_iter_input_items(self):
+        """Test the normalization of the entries of input iterables."""
+        items = list(iter_input_items([
+            '/data/a.pdf', Path('/data/b.pdf'), ('/data/c.pdf', 'c'), ('/data/d.pdf', None, 3),
+            {'path': '/data/e.pdf', 'output': 'e'}, InputItem('/data/f.pdf')
+        ]))
+        assert items == [
+            InputItem('/data/a.pdf'), InputItem(str(Path('/data/b.pdf'))), InputItem('/data/c.pdf', 'c'),
+            InputItem('/data/d.pdf', None, 3.0), InputItem('/data/e.pdf', 'e'), InputItem('/data/f.pdf')
+        ]
@@ -0,0 +1,101 @@
+"""
+Unit tests for the output directory layouts (grobid_client.layouts).
+"""
+import os
+import re
+import tempfile
+from unittest.mock import Mock, patch
+
+import pytest
+
+from grobid_client.grobid_client import GrobidClient
+from grobid_client.layouts import DirectoryCache, layout_name, shard_prefix
+
+
+class TestLayouts:
+    """Test cases for the output layouts."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.temp_dir.name, 'pdf')
+        self.output_dir = os.path.join(self.temp_dir.name, 'out')
+        for relative in ['2023/paper.pdf', '2024/paper.pdf', 'other.pdf']:
+            path = os.path.join(self.input_dir, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'%PDF')
+
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                self.client = GrobidClient(check_server=False)
+        self.client.logger = Mock()
+        self.process_pdf = Mock(side_effect=lambda service, pdf_file, *args: (pdf_file, 200, f'<TEI>{pdf_file}</TEI>'))
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def _results(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.output_dir).replace(os.sep, '/')
+                      for root, _, files in os.walk(self.output_dir) for name in files)
+
+    def test_layout_name(self):
+        assert layout_name('2024/paper', 'flat') == 'paper'
+        assert layout_name('2024/paper', 'mirror') == '2024/paper'
+        assert re.fullmatch(r'[0-9a-f]{2}/[0-9a-f]{2}/paper', layout_name('2024/paper', 'sharded'))
+        assert layout_name('2024/paper', 'sharded') != layout_name('2023/paper', 'sharded')
+        assert layout_name('paper', 'sharded', key='/abs/paper.pdf') == f"{shard_prefix('/abs/paper.pdf')}/paper"
+        with pytest.raises(ValueError):
+            layout_name('paper', 'nested')
+
+    def test_directory_cache_creates_once(self):
+        cache = DirectoryCache()
+        directory = os.path.join(self.temp_dir.name, 'a', 'b')
+        with patch('pathlib.Path.mkdir') as mkdir:
+            for name in ['x', 'y', 'z']:
+                cache.ensure_parent(os.path.join(directory, name))
+        assert mkdir.call_count == 1
+
+    @patch('builtins.print')
+    def test_mirror_layout_keeps_inputs_with_the_same_name(self, mock_print):
+        with patch.object(self.client, 'process_pdf', self.process_pdf):
+            self.client.process('processFulltextDocument', self.input_dir, output=self.output_dir,
+                                output_layout='mirror')
+        assert self._results() == ['2023/paper.grobid.tei.xml', '2024/paper.grobid.tei.xml', 'other.grobid.tei.xml']
+
+    @patch('builtins.print')
+    def test_sharded_layout_is_resumed(self, mock_print):
+        """Test that the sharded results are found again by a later run with the same layout."""
+        with patch.object(self.client, 'process_pdf', self.process_pdf):
+            self.client.process('processFulltextDocument', self.input_dir, output=self.output_dir,
+                                output_layout='sharded')
+            results = self._results()
+            assert len(results) == 3
+            assert all(re.fullmatch(r'[0-9a-f]{2}/[0-9a-f]{2}/\w+\.grobid\.tei\.xml', name) for name in results)
+
+            self.client.process('processFulltextDocument', self.input_dir, output=self.output_dir,
+                                output_layout='sharded', force=False)
+        assert self.process_pdf.call_count == 3
+        assert self._results() == results
+
+    @pytest.mark.parametrize('output_layout,results', [('flat', 1), ('mirror', 2), ('sharded', 2)])
+    @patch('builtins.print')
+    def test_listed_inputs_with_the_same_name(self, mock_print, output_layout, results):
+        """Test that listed inputs with the same name in different directories only collide in the flat layout."""
+        inputs = [os.path.join(self.input_dir, '2023', 'paper.pdf'), os.path.join(self.input_dir, '2024', 'paper.pdf')]
+        with patch.object(self.client, 'process_pdf', self.process_pdf):
+            self.client.process('processFulltextDocument', inputs, output=self.output_dir, output_layout=output_layout)
+            assert len(self._results()) == results
+            if output_layout == 'mirror':
+                input_dir = os.path.realpath(self.input_dir).lstrip(os.sep).replace(os.sep, '/')
+                assert self._results() == [f'{input_dir}/2023/paper.grobid.tei.xml',
+                                           f'{input_dir}/2024/paper.grobid.tei.xml']
+
+            # The results are found again by a later run with the same layout
+            self.client.process('processFulltextDocument', inputs, output=self.output_dir, output_layout=output_layout,
+                                force=False)
+        assert self.process_pdf.call_count == 2
+
+    def test_unknown_layout(self):
+        with pytest.raises(ValueError):
+            self.client.process('processFulltextDocument', self.input_dir, output=self.output_dir,
+                                output_layout='nested')
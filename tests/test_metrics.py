@@ -0,0 +1,135 @@
+"""
+Unit tests for the Prometheus-compatible metrics (grobid_client.metrics).
+"""
+import datetime
+import os
+import shutil
+import tempfile
+import urllib.request
+from unittest.mock import Mock, patch
+
+import pytest
+
+from grobid_client.format.batch import convert_batch
+from grobid_client.grobid_client import GrobidClient
+from grobid_client.metrics import ClientMetrics, MetricsRegistry, MetricsServer, TextfileExporter
+from tests.resources import TEST_DATA_PATH
+
+SAMPLE_TEI = os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml')
+
+
+class TestMetrics:
+    """Test cases for the metrics registry and exporters."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_text_exposition_format(self):
+        registry = MetricsRegistry()
+        requests = registry.counter('requests_total', 'Requests', ('server', 'status'))
+        in_flight = registry.gauge('in_flight', 'In flight')
+        latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        requests.inc(server='http://a"b', status=200)
+        requests.inc(2, server='http://a"b', status=200)
+        in_flight.inc()
+        in_flight.dec()
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+
+        assert registry.render().splitlines() == [
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{server="http://a\\"b",status="200"} 3',
+            '# HELP in_flight In flight',
+            '# TYPE in_flight gauge',
+            'in_flight 0',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            'latency_seconds_sum 5.55',
+            'latency_seconds_count 3',
+        ]
+        with pytest.raises(ValueError):
+            requests.inc(server='a')
+
+    def test_http_endpoint_and_textfile(self):
+        metrics = ClientMetrics()
+        metrics.documents.inc(outcome='processed')
+
+        server = MetricsServer(metrics.registry, port=0)
+        try:
+            with urllib.request.urlopen(server.url) as response:
+                assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+                assert 'grobid_client_documents_total{outcome="processed"} 1' in response.read().decode()
+        finally:
+            server.close()
+
+        path = os.path.join(self.temp_dir, 'grobid.prom')
+        exporter = TextfileExporter(metrics.registry, path, interval=60)
+        metrics.documents.inc(outcome='failed')
+        exporter.close()
+        with open(path) as f:
+            assert 'grobid_client_documents_total{outcome="failed"} 1' in f.read()
+        assert os.listdir(self.temp_dir) == ['grobid.prom']
+
+    @patch('builtins.print')
+    def test_process_records_requests_and_stages(self, mock_print):
+        """Test that process() counts the responses, retries, bytes, skips and stage latencies."""
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False, sleep_time=0)
+        client.logger = Mock()
+        input_dir = os.path.join(self.temp_dir, 'pdf')
+        os.makedirs(input_dir)
+        for name in ['a.pdf', 'b.pdf']:
+            with open(os.path.join(input_dir, name), 'wb') as f:
+                f.write(b'%PDF-1.4')
+
+        def response(status):
+            res = Mock(text='<TEI/>', content=b'<TEI/>', elapsed=datetime.timedelta(seconds=0))
+            return res, status
+        post = Mock(side_effect=[response(503), response(200), response(200)])
+        textfile = os.path.join(self.temp_dir, 'grobid.prom')
+        server = client.config['grobid_server']
+        with patch.object(client, 'post', post):
+            client.process('processFulltextDocument', input_dir, output=os.path.join(self.temp_dir, 'out'), n=1,
+                           json_output=False, metrics_textfile=textfile)
+            client.process('processFulltextDocument', input_dir, output=os.path.join(self.temp_dir, 'out'),
+                           force=False)
+
+        metrics = client.metrics
+        labels = {'service': 'processFulltextDocument', 'server': server}
+        assert metrics.requests.value(status=200, **labels) == 2
+        assert metrics.requests.value(status=503, **labels) == 1
+        assert metrics.retries.value(reason='busy', **labels) == 1
+        assert metrics.bytes_sent.value(**labels) == 3 * 8
+        assert metrics.bytes_received.value(**labels) == 3 * 6
+        assert metrics.in_flight.value(server=server) == 0
+        assert metrics.documents.value(outcome='processed') == 2
+        assert metrics.documents.value(outcome='skipped') == 2
+        assert metrics.cache_lookups.value(cache='tei', result='hit') == 2
+        assert metrics.stage_seconds.count(stage='request') == 3
+        assert metrics.stage_seconds.count(stage='write') == 2
+        assert metrics.bytes_written.value() == 2 * 6
+        with open(textfile) as f:
+            assert 'grobid_client_documents_total{outcome="processed"} 2' in f.read()
+
+    @patch('builtins.print')
+    def test_convert_batch_records_conversions(self, mock_print):
+        tei_dir = os.path.join(self.temp_dir, 'tei')
+        os.makedirs(tei_dir)
+        shutil.copy(SAMPLE_TEI, os.path.join(tei_dir, 'doc.grobid.tei.xml'))
+        metrics = ClientMetrics()
+
+        convert_batch('markdown', [tei_dir], workers=1, metrics=metrics)
+        convert_batch('markdown', [tei_dir], workers=1, metrics=metrics)
+
+        assert metrics.conversions.value(format='markdown', status='ok') == 1
+        assert metrics.converted_bytes.value(format='markdown') == os.path.getsize(SAMPLE_TEI)
+        assert metrics.stage_seconds.count(stage='convert') == 1
+        assert metrics.cache_lookups.value(cache='conversion', result='hit') == 1
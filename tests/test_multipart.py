@@ -0,0 +1,107 @@
+"""
+Unit tests for the streamed multipart/form-data bodies (grobid_client.multipart).
+"""
+import io
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+from grobid_client.multipart import MultipartStream
+
+
+def _parse(body, content_type):
+    """Parse a multipart body with the email package, return {field name: (filename, payload)}."""
+    message = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+    return {
+        part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+        for part in message.iter_parts()
+    }
+
+
+class TestMultipartStream:
+    """Test cases for MultipartStream."""
+
+    def test_body_from_bytes(self):
+        """Test that fields, repeated fields and the file part are encoded, with the announced length."""
+        content = b"%PDF-1.4 fake content\r\n--not a boundary"
+        body = MultipartStream({"consolidateHeader": "1", "teiCoordinates": ["p", "s"]}, "input", "doc.pdf",
+                               content, "application/pdf", {"Expires": "0"})
+        data = body.read()
+
+        assert len(data) == len(body)
+        assert body.read() == b""
+        parts = _parse(data, body.content_type)
+        assert parts["input"] == ("doc.pdf", content)
+        assert parts["consolidateHeader"] == (None, b"1")
+        assert data.count(b'name="teiCoordinates"') == 2
+        assert b"Expires: 0\r\n" in data
+
+    def test_chunked_reads_and_rewind(self):
+        """Test that small reads from a file object give the same body, and that rewind restarts it."""
+        content = bytes(range(256)) * 50
+        stream = io.BytesIO(b"skipped" + content)
+        stream.seek(7)
+        body = MultipartStream({"a": "b"}, "input", "doc.pdf", stream)
+
+        chunks = []
+        for chunk in iter(lambda: body.read(1000), b""):
+            assert len(chunk) <= 1000
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        assert len(data) == len(body)
+        assert _parse(data, body.content_type)["input"][1] == content
+
+        body.rewind()
+        assert b"".join(body) == data
+
+    def test_non_seekable_stream(self):
+        """Test that a stream without seek is read once to know its length."""
+        class Unseekable(io.RawIOBase):
+            def __init__(self, data):
+                self._data = io.BytesIO(data)
+
+            def readable(self):
+                return True
+
+            def readinto(self, buffer):
+                return self._data.readinto(buffer)
+
+        body = MultipartStream({}, "input", "doc.pdf", Unseekable(b"abc"))
+        assert _parse(body.read(), body.content_type)["input"] == ("doc.pdf", b"abc")
+
+    def test_sent_by_requests(self):
+        """Test that requests streams the body with a Content-Length header."""
+        received = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                received["content_type"] = self.headers["Content-Type"]
+                received["transfer_encoding"] = self.headers.get("Transfer-Encoding")
+                received["body"] = self.rfile.read(length)
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        try:
+            content = b"x" * 300000
+            body = MultipartStream({"generateIDs": "1"}, "input", "doc.pdf", memoryview(content), "application/pdf")
+            response = requests.post(f"http://127.0.0.1:{server.server_port}/api/processFulltextDocument",
+                                     data=body, headers={"Content-Type": body.content_type}, timeout=10)
+        finally:
+            thread.join(10)
+            server.server_close()
+
+        assert response.status_code == 200
+        assert received["transfer_encoding"] is None
+        assert received["content_type"] == body.content_type
+        assert _parse(received["body"], received["content_type"])["input"] == ("doc.pdf", content)
@@ -0,0 +1,101 @@
+"""
+Unit tests for the profiling mode (grobid_client.profiling).
+"""
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from grobid_client.format.batch import convert_batch
+from grobid_client.profiling import Profiler, active_profiler, profile_call, profile_stage
+from tests.resources import TEST_DATA_PATH
+
+SAMPLE_TEI = os.path.join(TEST_DATA_PATH, '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml')
+
+
+def busy_loop(n):
+    return sum(i * i for i in range(n))
+
+
+def work(n):
+    with profile_stage('convert_json'):
+        return busy_loop(n)
+
+
+class TestProfiler:
+    """Test cases for the profiler and its reports."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.temp_dir, 'run')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_stage_is_noop_without_profiler(self):
+        assert active_profiler() is None
+        with profile_stage('request'):
+            pass
+
+    @pytest.mark.skipif(sys.version_info >= (3, 12), reason="cProfile can not profile several threads on 3.12+")
+    def test_cprofile_profiles_worker_threads_by_stage(self):
+        profiler = Profiler(self.prefix + '.prof', top=10).start()
+        assert active_profiler() is profiler
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(work, [20000] * 4))
+        paths = profiler.stop()
+
+        assert active_profiler() is None
+        assert paths == [self.prefix + '.prof', self.prefix + '.txt']
+        functions = {function for _, _, function in pstats.Stats(paths[0]).stats}
+        assert 'busy_loop' in functions
+        with open(paths[1]) as f:
+            report = f.read()
+        assert 'stage convert_json: 4 calls' in report
+        stage_report = report.split('=== Stage convert_json')[1].split('=== Stage run')[0]
+        assert 'busy_loop' in stage_report
+        assert '=== Memory (tracemalloc)' in report
+
+    def test_sampling_writes_folded_stacks(self):
+        profiler = Profiler(self.prefix, mode='sample', interval=0.001, memory=False).start()
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(work, [300000] * 4))
+        paths = profiler.stop()
+
+        assert paths == [self.prefix + '.folded', self.prefix + '.txt']
+        with open(paths[0]) as f:
+            lines = f.read().splitlines()
+        stacks = [line.rsplit(' ', 1) for line in lines]
+        assert all(count.isdigit() for _, count in stacks)
+        assert any(stack.startswith('convert_json;') and 'busy_loop (test_profiling.py' in stack
+                   for stack, _ in stacks)
+        with open(paths[1]) as f:
+            assert '=== Stage convert_json: top 25 functions of' in f.read()
+
+    def test_profile_call_returns_raw_stats(self):
+        result, stats = profile_call(busy_loop, 1000)
+        assert result == busy_loop(1000)
+        assert any(function == 'busy_loop' for _, _, function in stats)
+
+    @pytest.mark.skipif(sys.version_info >= (3, 12), reason="cProfile can not profile several threads on 3.12+")
+    def test_convert_batch_merges_worker_profiles(self):
+        tei_dir = os.path.join(self.temp_dir, 'tei')
+        os.makedirs(tei_dir)
+        for name in ['a', 'b']:
+            shutil.copy(SAMPLE_TEI, os.path.join(tei_dir, f'{name}.grobid.tei.xml'))
+
+        profiler = Profiler(self.prefix, top=5, memory=False).start()
+        try:
+            stats = convert_batch('markdown', [tei_dir], workers=2)
+        finally:
+            paths = profiler.stop()
+
+        assert stats['processed'] == 2
+        functions = {function for _, _, function in pstats.Stats(paths[0]).stats}
+        assert 'convert_tei_file' in functions
+        with open(paths[1]) as f:
+            assert '=== Stage convert: top 5 functions' in f.read()
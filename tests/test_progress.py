@@ -0,0 +1,122 @@
+"""
+Unit tests for the progress reporter (grobid_client.progress).
+"""
+import io
+import os
+import tempfile
+import threading
+from unittest.mock import Mock, patch
+
+from grobid_client.grobid_client import GrobidClient
+from grobid_client.progress import ProgressReporter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProgressReporter:
+    """Test cases for the progress reporter."""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.stream = io.StringIO()
+
+    def _reporter(self, **kwargs):
+        return ProgressReporter(stream=self.stream, clock=self.clock, **kwargs)
+
+    def test_rolling_rates_and_eta(self):
+        """Test that each window only counts the documents done within it."""
+        reporter = self._reporter(total=1000)
+        # 10 docs/s during 10 minutes, then 1 doc/s during 1 minute
+        for _ in range(600):
+            self.clock.now += 1
+            reporter.add_completed(1000000)
+            for _ in range(9):
+                reporter.add_completed()
+            reporter.sample()
+        for _ in range(60):
+            self.clock.now += 1
+            reporter.add_completed()
+            reporter.sample()
+
+        docs_1m, _ = reporter.rates(60)
+        docs_5m, _ = reporter.rates(300)
+        docs_15m, bytes_15m = reporter.rates(900)
+        assert docs_1m == 1.0
+        assert docs_5m == (240 * 10 + 60) / 300
+        assert docs_15m == 6060 / 660
+        assert bytes_15m == 600 * 1000000 / 660
+        assert reporter.eta() == 0.0
+
+        reporter.set_total(8060)
+        assert reporter.eta() == 2000 / docs_5m
+
+    def test_render_counts_and_in_flight(self):
+        reporter = self._reporter()
+        reporter.add_completed()
+        reporter.add_failed()
+        reporter.add_skipped()
+        started, release = threading.Event(), threading.Event()
+
+        def request():
+            started.set()
+            release.wait()
+        tracked = reporter.track(request, 'http://localhost:8070')
+        thread = threading.Thread(target=tracked)
+        thread.start()
+        started.wait()
+        self.clock.now += 1
+        reporter.sample()
+
+        line = reporter.render()
+        assert line.startswith('3 done ok 1 err 1 skip 1')
+        assert 'in flight http://localhost:8070=1' in line
+        assert 'ETA' not in line
+        release.set()
+        thread.join()
+        assert 'in flight 0' in reporter.render()
+
+    def test_tty_bar_and_log_lines(self):
+        """Test that a terminal gets a bar redrawn in place and other streams periodic lines."""
+        bar = self._reporter(total=4, tty=True)
+        bar.add_completed()
+        self.clock.now += 1
+        bar.report()
+        bar.report(final=True)
+        output = self.stream.getvalue()
+        assert output.startswith('\r[#####...............]  25.0% 1/4')
+        assert output.count('\r') == 2 and output.endswith('\n')
+
+        self.stream = io.StringIO()
+        lines = self._reporter(total=4, tty=False, log_interval=60)
+        self.clock.now += 30
+        lines.report()
+        assert self.stream.getvalue() == ''
+        self.clock.now += 30
+        lines.report()
+        lines.report(final=True)
+        assert self.stream.getvalue().count(' progress: ') == 2
+
+    @patch('builtins.print')
+    def test_process_reports_progress(self, mock_print):
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False)
+        client.logger = Mock()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ['a.pdf', 'b.pdf', 'c.pdf']:
+                with open(os.path.join(temp_dir, name), 'wb') as f:
+                    f.write(b'%PDF-1.4')
+            process_pdf = Mock(side_effect=lambda service, pdf_file, *args: (
+                pdf_file, 500 if pdf_file.endswith('c.pdf') else 200, '<TEI/>'))
+            stderr = io.StringIO()
+            with patch.object(client, 'process_pdf', process_pdf), patch('sys.stderr', stderr):
+                client.process('processFulltextDocument', temp_dir, output=os.path.join(temp_dir, 'out'), progress=True)
+
+        assert client._progress is None
+        assert 'progress: [####################] 100.0% 3/3 ok 2 err 1 skip 0' in stderr.getvalue()
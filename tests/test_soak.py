@@ -0,0 +1,59 @@
+"""
+Tests of the memory soak harness (benchmarks/soak.py).
+"""
+import os
+import shutil
+import tempfile
+
+from benchmarks.mock_server import MockGrobidServer
+from benchmarks.soak import client_step, converters_step, memory_slope, run_soak
+from benchmarks.throughput import make_corpus
+
+
+class TestSoak:
+    """Test cases for the soak tests of the client and of the converters."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_memory_slope(self):
+        assert memory_slope([(0, 100), (10, 200), (20, 300)]) == 10
+        assert memory_slope([(0, 100), (10, 100), (20, 100)]) == 0
+        assert memory_slope([(0, 100)]) is None
+        assert memory_slope([(5, 100), (5, 200)]) is None
+
+    def test_leak_is_detected(self):
+        leaked = []
+
+        def leaking_step():
+            leaked.extend(bytearray(2000) for _ in range(100))
+            return 100
+
+        result = run_soak(leaking_step, 2000, max_slope_kb=100, noise_mb=1, trace=True)
+        assert not result['passed']
+        assert result['traced_slope_kb_per_1000'] > 1500
+        assert any('traced memory grows' in failure for failure in result['failures'])
+        assert 'test_soak.py' in result['top_growth'][0]
+
+        result = run_soak(lambda: 100, 2000, max_slope_kb=100, noise_mb=1, trace=True)
+        assert result['passed'] and result['samples'] == 21
+        assert result['traced_slope_kb_per_1000'] < 100
+
+    def test_soak_client_and_converters(self):
+        corpus = make_corpus(os.path.join(self.temp_dir, 'corpus'), 10, size=500)
+        samples = []
+        with MockGrobidServer(response_size=2000) as server:
+            step = client_step(server.url, str(corpus), os.path.join(self.temp_dir, 'out'), concurrency=4,
+                               json_output=True)
+            result = run_soak(step, 30, on_sample=samples.append)
+        assert result['documents'] == 30 and result['passed']
+        assert [sample[1] for sample in samples] == [0, 10, 20, 30]
+        assert server.count('processFulltextDocument', 200) == 30
+
+        step = converters_step(chunk=5, variants=3, paragraphs=3, references=5, malformed_every=4)
+        result = run_soak(step, 10, trace=True)
+        assert result['documents'] == 10 and result['passed']
+        assert result['traced_end_mb'] is not None
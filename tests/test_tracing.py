@@ -0,0 +1,86 @@
+"""
+Unit tests for the per-document stage tracer (grobid_client.tracing).
+"""
+import datetime
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import Mock, patch
+
+from grobid_client.grobid_client import GrobidClient
+from grobid_client.tracing import StageTracer
+
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestStageTracer:
+    """Test cases for the stage tracer."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.trace = os.path.join(self.temp_dir.name, 'trace.jsonl')
+        self.chrome = os.path.join(self.temp_dir.name, 'trace.json')
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def test_marks_and_spans(self):
+        """Test that marks and spans are written as JSONL records and as Chrome trace events."""
+        with StageTracer(self.trace, self.chrome) as tracer:
+            tracer.mark('a.pdf', 'queued', bytes=10)
+            start = tracer.now()
+            worker = threading.Thread(target=lambda: tracer.span('a.pdf', 'request', start, bytes_sent=10),
+                                      name='worker-1')
+            worker.start()
+            worker.join()
+        tracer.mark('a.pdf', 'late')
+
+        queued, request = _read_jsonl(self.trace)
+        assert queued['doc'] == 'a.pdf' and queued['stage'] == 'queued' and queued['bytes'] == 10
+        assert 'duration' not in queued
+        assert request['thread'] == 'worker-1' and request['bytes_sent'] == 10
+        assert request['start'] <= request['ts'] and request['duration'] >= 0
+
+        with open(self.chrome, encoding='utf-8') as f:
+            events = json.load(f)
+        phases = {event['name']: event['ph'] for event in events}
+        assert phases['queued'] == 'i' and phases['request'] == 'X'
+        assert {'name': 'worker-1'} in [event['args'] for event in events if event['name'] == 'thread_name']
+
+    @patch('builtins.print')
+    def test_process_traces_each_document(self, mock_print):
+        with patch('grobid_client.grobid_client.GrobidClient._test_server_connection'):
+            with patch('grobid_client.grobid_client.GrobidClient._configure_logging'):
+                client = GrobidClient(check_server=False)
+        client.logger = Mock()
+        input_dir = os.path.join(self.temp_dir.name, 'pdf')
+        os.makedirs(input_dir)
+        pdf = os.path.join(input_dir, 'a.pdf')
+        with open(pdf, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        with open(os.path.join(os.path.dirname(__file__), 'resources',
+                               '0046d83a-edd6-4631-b57c-755cdcce8b7f.tei.xml'), encoding='utf-8') as f:
+            tei = f.read()
+
+        response = Mock(text=tei, content=tei.encode('utf-8'), elapsed=datetime.timedelta(seconds=0))
+        with patch.object(client, 'post', return_value=(response, 200)):
+            client.process('processFulltextDocument', input_dir, output=os.path.join(self.temp_dir.name, 'out'),
+                           markdown_output=True, trace=self.trace)
+
+        records = _read_jsonl(self.trace)
+        stages = [record['stage'] for record in records]
+        for stage in ['scan', 'queued', 'request', 'download', 'convert_markdown', 'tei_written', 'write', 'done']:
+            assert stage in stages
+        assert stages.index('scan') < stages.index('queued') < stages.index('request') < stages.index('done')
+        request = records[stages.index('request')]
+        assert request['doc'] == pdf and request['bytes_sent'] == 8
+        # every stage of the document, down to the writes of its outputs, is keyed by the input
+        assert {record['doc'] for record in records} == {pdf}
+        writes = [record['path'] for record in records if record['stage'] == 'write']
+        assert sorted(os.path.basename(path) for path in writes) == ['a.grobid.tei.xml', 'a.md']
+        assert records[stages.index('tei_written')]['bytes'] == len(tei.encode('utf-8'))
+        assert client._tracer is None
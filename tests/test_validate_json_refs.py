@@ -0,0 +1,114 @@
+"""
+Unit tests for the JSON reference validator (grobid_client.format.validate_json_refs).
+"""
+import glob
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from grobid_client.format import validate_json_refs
+from grobid_client.format.compression import open_file
+from grobid_client.format.validate_json_refs import JSONReferenceValidator, iter_report
+from tests.resources import TEST_DATA_PATH
+
+SUMMARY_KEYS = ('total_files', 'valid_files', 'invalid_files', 'total_refs', 'valid_refs', 'invalid_refs',
+                'error_count')
+
+BROKEN_DOCUMENT = {
+    "biblio": {"abstract": [{"text": "See [1].", "refs": [
+        {"type": "bibr", "target": "#b0", "text": "[1]", "offset_start": 4, "offset_end": 7}]}]},
+    "body_text": [{"text": "As shown in [2].", "refs": [
+        {"type": "bibr", "target": "#b1", "text": "[2]", "offset_start": 0, "offset_end": 3},
+        {"type": "bibr", "target": "#b1", "text": "[2]", "offset_start": 12, "offset_end": 15}]}]
+}
+
+
+def _summary(results):
+    return {key: results[key] for key in SUMMARY_KEYS}
+
+
+class TestJSONReferenceValidator:
+    """Test cases for the discovery, the streaming, the process pool and the JSONL report of the validator."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # the converted samples, in a tree, one of them compressed
+        for i, path in enumerate(sorted(glob.glob(os.path.join(TEST_DATA_PATH, 'refs_offsets', '*.json')))):
+            directory = os.path.join(self.temp_dir, 'tree', str(i % 2), str(i))
+            os.makedirs(directory)
+            if i == 0:
+                with open(path, 'rb') as source, open_file(os.path.join(directory, 'doc.json.gz'), 'wb') as f:
+                    f.write(source.read())
+            else:
+                shutil.copy(path, directory)
+        with open(os.path.join(self.temp_dir, 'tree', 'broken.json'), 'w', encoding='utf-8') as f:
+            json.dump(BROKEN_DOCUMENT, f)
+        with open(os.path.join(self.temp_dir, 'tree', 'truncated.json'), 'w', encoding='utf-8') as f:
+            f.write('{"body_text": [{"text": "a", "refs": []}')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_recursive_discovery_and_invalid_files(self):
+        tree = os.path.join(self.temp_dir, 'tree')
+        results = JSONReferenceValidator().validate_directory(tree)
+        assert results['total_files'] == 7
+        assert results['valid_files'] == 5 and results['invalid_files'] == 2
+        assert results['invalid_refs'] == 1 and results['valid_refs'] == results['total_refs'] - 1
+        assert any('body_text[0].refs[0]: Text mismatch' in error for error in results['errors'])
+        assert any(error.startswith('Invalid JSON in') for error in results['errors'])
+        assert len(results['file_details']) == 7
+
+        top_level = JSONReferenceValidator().validate_directory(tree, recursive=False)
+        assert top_level['total_files'] == 2
+
+    @patch('builtins.print')
+    def test_files_with_invalid_references_are_invalid(self, mock_print):
+        """Test that a readable file with invalid references counts as invalid in the totals and the summary."""
+        broken_dir = os.path.join(self.temp_dir, 'broken')
+        os.makedirs(broken_dir)
+        shutil.copy(os.path.join(self.temp_dir, 'tree', 'broken.json'), broken_dir)
+        results = JSONReferenceValidator().validate_directory(broken_dir)
+        assert (results['valid_files'], results['invalid_files'], results['invalid_refs']) == (0, 1, 1)
+        assert results['errors'] == [error for detail in results['file_details'] for error in detail['errors']]
+
+        assert validate_json_refs.main([os.path.join(self.temp_dir, 'tree')]) == 1
+        printed = [call.args[0] for call in mock_print.call_args_list if call.args]
+        assert '  Files: 5/7 valid' in printed
+
+    def test_streaming_matches_loading(self):
+        tree = os.path.join(self.temp_dir, 'tree')
+        loaded = JSONReferenceValidator().validate_directory(tree)
+        with patch('grobid_client.format.serializers._StreamingDecoder.__init__.__defaults__', (64,)):
+            streamed = JSONReferenceValidator(stream_threshold=0).validate_directory(tree)
+        assert _summary(streamed) == _summary(loaded)
+        # the decoding errors are worded differently
+        for results in (loaded, streamed):
+            assert sum(error.startswith('Invalid JSON in') for error in results['errors']) == 1
+        assert sorted(e for e in streamed['errors'] if 'Invalid JSON' not in e) == \
+            sorted(e for e in loaded['errors'] if 'Invalid JSON' not in e)
+
+    @patch('builtins.print')
+    def test_workers_and_report(self, mock_print):
+        tree = os.path.join(self.temp_dir, 'tree')
+        report = os.path.join(self.temp_dir, 'report.jsonl')
+        serial = JSONReferenceValidator().validate_directory(tree)
+        with patch.object(validate_json_refs, 'FILES_PER_TASK', 2), \
+                patch.object(validate_json_refs, 'MAX_KEPT_ERRORS', 1):
+            validator = JSONReferenceValidator(workers=2, report_path=report, stream_threshold=0)
+            results = validator.validate_directory(tree)
+        assert _summary(results) == _summary(serial)
+        assert results['file_details'] == [] and len(results['errors']) == 1
+        assert 'more errors' in validator.generate_report()
+
+        details = list(iter_report(report))
+        assert sorted(detail['file'] for detail in details) == \
+            sorted(detail['file'] for detail in serial['file_details'])
+        assert sum(detail['total_refs'] for detail in details) == serial['total_refs']
+
+        assert validate_json_refs.main([tree, '--workers', '2', '--report', report, '--list-errors']) == 1
+        printed = [call.args[0] for call in mock_print.call_args_list if call.args]
+        assert os.path.join(tree, 'broken.json') in printed
+        assert os.path.join(tree, 'truncated.json') not in printed
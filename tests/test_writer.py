@@ -0,0 +1,107 @@
+"""
+Unit tests for the atomic output writer (grobid_client.writer).
+"""
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from grobid_client.writer import OutputWriter, atomic_write
+
+
+class TestWriter:
+    """Test cases for atomic and group-committed writes."""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'doc.grobid.tei.xml')
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_atomic_write(self):
+        atomic_write(self.path, b'<TEI/>', fsync=True)
+        assert self._read(self.path) == b'<TEI/>'
+        assert os.listdir(self.temp_dir.name) == ['doc.grobid.tei.xml']
+
+    def test_failed_write_keeps_previous_file(self):
+        """Test that a write interrupted before the rename leaves the previous content and no temporary file."""
+        atomic_write(self.path, b'old')
+        with patch('grobid_client.writer.os.replace', side_effect=OSError('disk full')):
+            with pytest.raises(OSError):
+                atomic_write(self.path, b'new')
+        assert self._read(self.path) == b'old'
+        assert os.listdir(self.temp_dir.name) == ['doc.grobid.tei.xml']
+
+    def test_writer_renames_in_order(self):
+        written = []
+        with OutputWriter() as writer:
+            for i in range(5):
+                path = os.path.join(self.temp_dir.name, f'{i}.json')
+                writer.write(path, str(i).encode(), on_written=lambda path=path: written.append(path))
+        assert written == [os.path.join(self.temp_dir.name, f'{i}.json') for i in range(5)]
+        assert writer.files == 5 and writer.commits == 0
+
+    def test_group_commit_every_n_files(self):
+        """Test that files only appear at their final paths once their group is fsynced."""
+        writer = OutputWriter(fsync_every=3)
+        paths = [os.path.join(self.temp_dir.name, f'{i}.json') for i in range(4)]
+        with patch('grobid_client.writer.os.fsync', wraps=os.fsync) as fsync:
+            for path in paths[:2]:
+                writer.write(path, b'{}')
+            time.sleep(0.1)
+            assert not any(os.path.exists(path) for path in paths)
+
+            writer.write(paths[2], b'{}')
+            writer.write(paths[3], b'{}')
+            deadline = time.monotonic() + 2
+            while writer.commits < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            assert all(os.path.exists(path) for path in paths[:3]) and not os.path.exists(paths[3])
+            assert writer.commits == 1 and fsync.call_count == 4  # 3 files and their directory
+
+            writer.close()
+        assert os.path.exists(paths[3]) and writer.commits == 2
+
+    def test_group_commit_interval(self):
+        writer = OutputWriter(fsync_interval=0.05)
+        writer.write(self.path, b'<TEI/>')
+        deadline = time.monotonic() + 2
+        while not os.path.exists(self.path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert os.path.exists(self.path)
+        writer.close()
+
+    def test_errors_are_logged_and_counted(self):
+        logger = Mock()
+        with OutputWriter(logger=logger) as writer:
+            writer.write(os.path.join(self.temp_dir.name, 'missing', 'doc.json'), b'{}')
+            writer.write(self.path, b'<TEI/>')
+        assert writer.errors == 1 and writer.files == 1
+        logger.error.assert_called_once()
+        with pytest.raises(ValueError):
+            writer.write(self.path, b'<TEI/>')
+
+    def test_callback_errors_do_not_stop_the_writer(self):
+        """Test that an exception raised by the metrics callback fails the write but not flush() and close()."""
+        logger = Mock()
+        on_write = Mock(side_effect=[RuntimeError('metrics down'), None])
+        writer = OutputWriter(logger=logger, on_write=on_write)
+        failed = os.path.join(self.temp_dir.name, 'failed.json')
+        writer.write(failed, b'{}')
+        writer.write(self.path, b'<TEI/>')
+        closing = threading.Thread(target=lambda: (writer.flush(), writer.close()), daemon=True)
+        closing.start()
+        closing.join(timeout=5)
+        assert not closing.is_alive()
+        assert writer.errors == 1 and writer.files == 1
+        assert os.listdir(self.temp_dir.name) == ['doc.grobid.tei.xml']
+        logger.error.assert_called_once()